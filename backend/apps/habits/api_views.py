@@ -5,10 +5,15 @@ from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import OrderingFilter
 from django.shortcuts import get_object_or_404
-from datetime import date
 from .models import Habit
-from .serializers import HabitSerializer
-from apps.stats.services import HabitProgressService
+from .serializers import HabitBulkCheckInSerializer, HabitSerializer
+from apps.stats.services import (
+    HISTORY_DEFAULT_DAYS,
+    HISTORY_MAX_DAYS,
+    HabitProgressService,
+    HeatmapService,
+    StatsService,
+)
 
 
 class HabitListCreateView(generics.ListCreateAPIView):
@@ -60,7 +65,34 @@ def mark_habit_completed(request, pk):
             'id': progress.id,
             'date': progress.date.isoformat(),
             'completed': progress.completed,
-            'actual_value': progress.actual_value,
+            'actual_value': progress.value,
+        }
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def bulk_check_in(request):
+    """Record many (habit_id, date, value, completed) check-ins at once"""
+    serializer = HabitBulkCheckInSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    
+    try:
+        count = HabitProgressService.bulk_check_in(
+            request.user, serializer.validated_data['check_ins']
+        )
+    except Habit.DoesNotExist as e:
+        return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
+    
+    stats = StatsService.get_user_stats(request.user)
+    return Response({
+        'success': True,
+        'message': f'{count} check-ins recorded',
+        'count': count,
+        'stats': {
+            'total_habits_completed': stats.total_habits_completed,
+            'current_streak': stats.active_streak,
+            'longest_streak': stats.longest_streak,
         }
     }, status=status.HTTP_200_OK)
 
@@ -87,7 +119,7 @@ def mark_habit_incomplete(request, pk):
                 'id': progress.id,
                 'date': progress.date.isoformat(),
                 'completed': progress.completed,
-                'actual_value': progress.actual_value,
+                'actual_value': progress.value,
             }
         }, status=status.HTTP_200_OK)
     else:
@@ -100,33 +132,17 @@ def mark_habit_incomplete(request, pk):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_habit_progress(request, pk):
-    """Get habit progress"""
+    """Get habit progress for the last `days` days (default 30, max 366)"""
     habit = get_object_or_404(Habit, pk=pk, user=request.user)
     
-    # Calculate completion rate
-    completion_rate = HabitProgressService.get_habit_completion_rate(habit)
-    
-    # Get progress from last 30 days
-    from datetime import timedelta
-    today = date.today()
-    start_date = today - timedelta(days=30)
-    
-    progress_data = []
-    for i in range(30):
-        check_date = start_date + timedelta(days=i)
-        try:
-            progress = habit.progress.get(date=check_date)
-            progress_data.append({
-                'date': check_date.isoformat(),
-                'completed': progress.completed,
-                'actual_value': progress.actual_value,
-            })
-        except:
-            progress_data.append({
-                'date': check_date.isoformat(),
-                'completed': False,
-                'actual_value': 0,
-            })
+    try:
+        days = int(request.query_params.get('days', HISTORY_DEFAULT_DAYS))
+        history = HabitProgressService.get_habit_history(habit, days)
+    except ValueError:
+        return Response(
+            {'error': f'days must be an integer between 1 and {HISTORY_MAX_DAYS}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
     return Response({
         'habit': {
@@ -136,6 +152,33 @@ def get_habit_progress(request, pk):
             'target_value': habit.target_value,
             'color_hex': habit.color_hex,
         },
-        'completion_rate': completion_rate,
-        'progress_data': progress_data,
+        'completion_rate': history['completion_rate'],
+        **HabitProgressService.get_habit_streaks(habit),
+        'progress_data': history['progress_data'],
     }, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_habit_heatmap(request, pk):
+    """Get the year heatmap (?year=, ?encoding=base64|rle)"""
+    from datetime import date
+    habit = get_object_or_404(Habit, pk=pk, user=request.user)
+    
+    try:
+        year = int(request.query_params.get('year', date.today().year))
+        if not 1 <= year <= 9999:
+            raise ValueError('year out of range')
+        heatmap = HeatmapService.get_heatmap(
+            habit, year, request.query_params.get('encoding', 'base64')
+        )
+    except ValueError:
+        return Response(
+            {
+                'error': 'year must be a valid year and encoding one of '
+                         f"{', '.join(HeatmapService.ENCODINGS)}"
+            },
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    return Response(heatmap, status=status.HTTP_200_OK)
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from apps.stats.services import BULK_CHECK_IN_MAX
 from .models import Habit
 
 
@@ -13,3 +14,17 @@ class HabitSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at']
 
+
+class HabitCheckInSerializer(serializers.Serializer):
+    """Serializer para un registro de progreso del check-in masivo"""
+    habit_id = serializers.IntegerField()
+    date = serializers.DateField()
+    value = serializers.FloatField(required=False, allow_null=True, default=None)
+    completed = serializers.BooleanField(required=False, default=True)
+
+
+class HabitBulkCheckInSerializer(serializers.Serializer):
+    """Serializer para el check-in masivo de hábitos"""
+    check_ins = HabitCheckInSerializer(
+        many=True, allow_empty=False, max_length=BULK_CHECK_IN_MAX
+    )
@@ -14,6 +14,8 @@ urlpatterns = [
         api_views.HabitDetailView.as_view(),
         name='habit_detail'
     ),
+    # Check-in masivo (sincronización offline)
+    path('check-ins/', api_views.bulk_check_in, name='habit_bulk_check_in'),
     # Marcar hábitos como completados
     path(
         '<int:pk>/complete/',
@@ -30,4 +32,9 @@ urlpatterns = [
         api_views.get_habit_progress,
         name='habit_progress'
     ),
+    path(
+        '<int:pk>/heatmap/',
+        api_views.get_habit_heatmap,
+        name='habit_heatmap'
+    ),
 ]
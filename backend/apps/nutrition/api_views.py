@@ -1,15 +1,26 @@
 # nutrition/api_views.py
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import generics
+from rest_framework import generics, status
+from rest_framework.decorators import api_view, permission_classes
 from rest_framework.filters import OrderingFilter
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 
+from .enrichment import enrich_foods
 from .models import Nutrition
-from .serializers import NutritionSerializer
+from .nutrition_data import search_foods
+from .serializers import (
+    NUTRITION_BULK_MAX,
+    NutritionEnrichBatchSerializer,
+    NutritionSerializer,
+)
 
 
 class NutritionListCreateView(generics.ListCreateAPIView):
-    """Listar y crear entradas nutricionales"""
+    """
+    Listar y crear entradas nutricionales (una o una lista). Basta con
+    name y quantity: los macros que falten se completan en el servidor
+    """
 
     serializer_class = NutritionSerializer
     permission_classes = [IsAuthenticated]
@@ -21,6 +32,12 @@ class NutritionListCreateView(generics.ListCreateAPIView):
     def get_queryset(self):
         return Nutrition.objects.filter(user=self.request.user)
 
+    def get_serializer(self, *args, **kwargs):
+        # Una lista crea todas las entradas en bloque
+        if isinstance(kwargs.get("data"), list):
+            kwargs.update(many=True, allow_empty=False, max_length=NUTRITION_BULK_MAX)
+        return super().get_serializer(*args, **kwargs)
+
 
 class NutritionDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Ver, actualizar y eliminar entrada nutricional"""
@@ -30,3 +47,52 @@ class NutritionDetailView(generics.RetrieveUpdateDestroyAPIView):
 
     def get_queryset(self):
         return Nutrition.objects.filter(user=self.request.user)
+
+
+# Máximo de resultados de la búsqueda de alimentos
+FOOD_SEARCH_MAX_RESULTS = 50
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def search_foods_view(request):
+    """Buscar alimentos en la base de datos local (?q=, ?limit=, por defecto 5)"""
+    query = request.query_params.get("q", "").strip()
+    if not query:
+        return Response(
+            {"error": "q parameter required"}, status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        limit = int(request.query_params.get("limit", 5))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= FOOD_SEARCH_MAX_RESULTS:
+        return Response(
+            {"error": f"limit must be between 1 and {FOOD_SEARCH_MAX_RESULTS}"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    results = search_foods(query, limit)
+    return Response({"query": query, "count": len(results), "results": results})
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def enrich_batch_view(request):
+    """
+    Enriquecer varios alimentos a la vez ({"names": [...]}): los nombres
+    repetidos se resuelven una vez y los resultados vuelven en el orden
+    recibido con su fuente y latencia
+    """
+    serializer = NutritionEnrichBatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+
+    results = enrich_foods(serializer.validated_data["names"])
+    return Response(
+        {
+            "success": True,
+            "count": len(results),
+            "found": sum(result["found"] for result in results),
+            "results": results,
+        }
+    )
@@ -0,0 +1,260 @@
+"""
+Catálogo binario de alimentos abierto con mmap
+
+load_food_catalogue convierte una tabla de alimentos (CSV/JSON) en un
+fichero ordenado que cada proceso abre con mmap de solo lectura: los
+workers comparten las páginas del sistema operativo en lugar de tener
+cada uno una copia, y abrirlo no depende del tamaño del catálogo. Las
+búsquedas son binarias sobre las secciones ordenadas, sin estructuras en
+memoria.
+
+Formato (little endian):
+    cabecera  HEADER: MAGIC, versión, filas, entradas de tokens, bytes de cadenas
+    filas     ROW por alimento, ordenadas por nombre normalizado
+    tokens    TOKEN por (token, fila), ordenadas por token y fila
+    cadenas   nombres normalizados, nombres y tokens en UTF-8
+"""
+import contextlib
+import heapq
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+
+from .food_index import (
+    EXACT_SCORE,
+    MIN_PREFIX_LENGTH,
+    PREFIX_SCORE,
+    combine_scores,
+    tokenize,
+)
+
+MAGIC = b"FTFC"
+VERSION = 1
+HEADER = struct.Struct("<4sHIII")
+# Nombre normalizado y nombre (offset, longitud), tokens del nombre y nutrientes
+ROW = struct.Struct("<IHIHB6f")
+# Token (offset, longitud) y fila
+TOKEN = struct.Struct("<IHI")
+
+NUTRIENTS = ("calories", "protein_g", "carbs_g", "fat_g", "fiber_g", "sugar_g")
+
+# Entradas recorridas como máximo por token de la consulta
+MAX_TOKEN_MATCHES = 500
+
+# Permisos del fichero: los workers pueden ejecutarse con otro usuario
+CATALOGUE_MODE = 0o644
+
+logger = logging.getLogger(__name__)
+
+
+def write_catalogue(path, foods):
+    """
+    Escribe el catálogo de foods (dicts con name y NUTRIENTS; los que
+    falten valen 0) y devuelve las filas escritas. Los nombres que se
+    normalizan igual se guardan una vez (el primero). El fichero se
+    reemplaza de forma atómica, así que los procesos que tengan abierto el
+    anterior siguen leyéndolo sin errores.
+    """
+    rows = {}
+    for food in foods:
+        tokens = tokenize(food["name"])
+        key = " ".join(tokens)
+        if tokens and key not in rows:
+            rows[key] = (food, list(dict.fromkeys(tokens)))
+    keys = sorted(rows)
+
+    strings = bytearray()
+    offsets = {}
+
+    def intern(text):
+        encoded = text.encode("utf-8")[:0xFFFF]
+        if encoded not in offsets:
+            offsets[encoded] = len(strings)
+            strings.extend(encoded)
+        return offsets[encoded], len(encoded)
+
+    row_data = bytearray()
+    token_entries = []
+    for row, key in enumerate(keys):
+        food, tokens = rows[key]
+        row_data += ROW.pack(
+            *intern(key),
+            *intern(food["name"].strip()),
+            min(len(tokens), 0xFF),
+            *(float(food.get(field) or 0) for field in NUTRIENTS),
+        )
+        token_entries.extend((token, row) for token in tokens)
+    token_entries.sort()
+    token_data = b"".join(
+        TOKEN.pack(*intern(token), row) for token, row in token_entries
+    )
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    output = tempfile.NamedTemporaryFile(dir=directory, delete=False)
+    try:
+        with output:
+            output.write(
+                HEADER.pack(MAGIC, VERSION, len(keys), len(token_entries), len(strings))
+            )
+            output.write(row_data)
+            output.write(token_data)
+            output.write(strings)
+        # NamedTemporaryFile lo crea con 0600 y os.replace conserva el modo
+        os.chmod(output.name, CATALOGUE_MODE)
+        os.replace(output.name, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(output.name)
+        raise
+    return len(keys)
+
+
+class _Column:
+    """Secuencia de las cadenas de una sección ordenada, para bisect"""
+
+    def __init__(self, catalogue, start, record, count):
+        self.catalogue = catalogue
+        self.start = start
+        self.record = record
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        offset, length = struct.unpack_from(
+            "<IH", self.catalogue.buffer, self.start + index * self.record.size
+        )
+        return self.catalogue.string(offset, length)
+
+
+class FoodCatalogue:
+    """Catálogo de alimentos de solo lectura sobre un mmap"""
+
+    def __init__(self, path):
+        with open(path, "rb") as catalogue_file:
+            self.buffer = mmap.mmap(catalogue_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self.buffer) < HEADER.size:
+            self.buffer.close()
+            raise ValueError(f"Not a food catalogue: {path}")
+        magic, version, self.row_count, self.token_count, strings_size = (
+            HEADER.unpack_from(self.buffer)
+        )
+        self.rows_start = HEADER.size
+        self.tokens_start = self.rows_start + self.row_count * ROW.size
+        self.strings_start = self.tokens_start + self.token_count * TOKEN.size
+        if (
+            magic != MAGIC
+            or version != VERSION
+            or len(self.buffer) != self.strings_start + strings_size
+        ):
+            self.buffer.close()
+            raise ValueError(f"Not a food catalogue (version {VERSION}): {path}")
+
+        self.keys = _Column(self, self.rows_start, ROW, self.row_count)
+        self.tokens = _Column(self, self.tokens_start, TOKEN, self.token_count)
+
+    def __len__(self):
+        return self.row_count
+
+    def close(self):
+        self.buffer.close()
+
+    def string(self, offset, length):
+        start = self.strings_start + offset
+        return self.buffer[start:start + length]
+
+    def _row(self, row):
+        return ROW.unpack_from(self.buffer, self.rows_start + row * ROW.size)
+
+    def get(self, row):
+        """Datos del alimento de la fila, con las claves de NUTRITION_DATABASE"""
+        _, _, name_offset, name_length, _, *values = self._row(row)
+        return {
+            "name": self.string(name_offset, name_length).decode("utf-8"),
+            **{field: round(value, 2) for field, value in zip(NUTRIENTS, values)},
+        }
+
+    def search(self, query, limit=5):
+        """
+        Los `limit` mejores alimentos como [(puntuación, datos)], puntuados
+        como FoodIndex.search pero solo con tokens exactos o por prefijo
+        (desde MIN_PREFIX_LENGTH caracteres).
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens or limit <= 0:
+            return []
+
+        scores = {}
+        key = " ".join(tokens).encode("utf-8")
+        row = bisect_left(self.keys, key)
+        if row < self.row_count and self.keys[row] == key:
+            scores[row] = 1.0
+
+        best = defaultdict(dict)
+        for position, token in enumerate(tokens):
+            token = token.encode("utf-8")
+            start = bisect_left(self.tokens, token)
+            for entry in range(start, min(start + MAX_TOKEN_MATCHES, self.token_count)):
+                candidate = self.tokens[entry]
+                if candidate != token and (
+                    len(token) < MIN_PREFIX_LENGTH or not candidate.startswith(token)
+                ):
+                    break
+                similarity = EXACT_SCORE if candidate == token else PREFIX_SCORE
+                (row,) = struct.unpack_from(
+                    "<I", self.buffer, self.tokens_start + entry * TOKEN.size + 6
+                )
+                previous = best[row].get(position)
+                if previous is None or similarity > previous[0]:
+                    best[row][position] = (similarity, self._row(row)[4])
+
+        for row, matched in best.items():
+            if row not in scores:
+                scores[row] = combine_scores(matched, len(tokens))
+
+        top = heapq.nlargest(
+            limit, scores.items(), key=lambda item: (item[1], -item[0])
+        )
+        return [(score, self.get(row)) for row, score in top]
+
+
+_catalogue = None
+_catalogue_lock = threading.Lock()
+
+
+def get_food_catalogue():
+    """
+    Catálogo de FOOD_CATALOGUE_PATH abierto una vez por proceso, o None si
+    no existe o no se puede leer (se registra una vez por versión del
+    fichero). Se vuelve a abrir cuando load_food_catalogue lo reemplaza.
+    """
+    global _catalogue
+    path = settings.FOOD_CATALOGUE_PATH
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    signature = (str(path), stat.st_ino, stat.st_mtime_ns)
+    with _catalogue_lock:
+        if _catalogue is None or _catalogue[0] != signature:
+            previous = _catalogue[1] if _catalogue is not None else None
+            try:
+                catalogue = FoodCatalogue(path)
+            except (OSError, ValueError):
+                logger.exception("Could not open food catalogue %s", path)
+                catalogue = None
+            _catalogue = (signature, catalogue)
+            if previous is not None:
+                previous.close()
+        return _catalogue[1]
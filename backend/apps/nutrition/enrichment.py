@@ -0,0 +1,144 @@
+"""
+Enriquecimiento nutricional: caché de API Ninja y base de datos local
+
+Un alimento se resuelve, por orden, con una coincidencia exacta en la
+base de datos local, con la caché de enriquecimiento, con API Ninja (que
+guarda su respuesta en la caché) y, si no hay nada, con la mejor
+coincidencia aproximada local. En lote, los nombres repetidos se
+resuelven una vez y las consultas a API Ninja se hacen en paralelo.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from core import api_ninja, enrichment_cache
+
+from .nutrition_data import MIN_MATCH_SCORE, search_foods
+
+API_SOURCE = "API Ninja"
+LOCAL_SOURCE = "Local database"
+
+# API Ninja marca algunos valores como solo para suscriptores premium
+PREMIUM_ONLY = "Only available for premium subscribers"
+
+NUTRITION_FIELDS = ("name", "calories", "protein_g", "carbs_g", "fat_g", "sugar_g", "fiber_g")
+
+# Nombres por petición de enriquecimiento en lote
+ENRICH_BATCH_MAX = 50
+
+# Consultas simultáneas a API Ninja en un lote
+ENRICH_BATCH_WORKERS = 8
+
+
+def fetch_nutrition(food_name):
+    """Datos de API Ninja, None si no existen o son solo premium"""
+    data = api_ninja.get_client().get("nutrition", {"query": food_name})
+    if not data:
+        return None
+    enriched = data[0]
+    if PREMIUM_ONLY in (enriched.get("calories", 0), enriched.get("protein_g", 0)):
+        return None
+    return {
+        "name": enriched.get("name", food_name),
+        "calories": enriched.get("calories", 0),
+        "protein_g": enriched.get("protein_g", 0),
+        "carbs_g": enriched.get("carbohydrates_total_g", 0),
+        "fat_g": enriched.get("fat_total_g", 0),
+        "sugar_g": enriched.get("sugar_g", 0),
+        "fiber_g": enriched.get("fiber_g", 0),
+    }
+
+
+class _Lookup:
+    """Resolución en curso de un nombre"""
+
+    def __init__(self, name, min_score):
+        self.started = time.perf_counter()
+        self.name = name
+        self.min_score = min_score
+        matches = search_foods(name, 1)
+        self.local = matches[0] if matches else None
+        self.data = self.source = self.cache = None
+        self.latency_ms = None
+
+    @property
+    def local_score(self):
+        return self.local["score"] if self.local else 0.0
+
+    def fetch(self):
+        return fetch_nutrition(self.name)
+
+    def resolve(self, data, source):
+        self.data = {field: data[field] for field in NUTRITION_FIELDS}
+        self.source = source
+
+    def finish(self):
+        """Fija la latencia del nombre (sin esperar al resto del lote)"""
+        if self.data is None and self.local_score >= self.min_score:
+            self.resolve(self.local, LOCAL_SOURCE)
+        self.latency_ms = round((time.perf_counter() - self.started) * 1000, 2)
+
+    def fetch_upstream(self):
+        """API Ninja a través de la caché; los errores dejan data en None"""
+        try:
+            data, self.cache = enrichment_cache.get_or_fetch(
+                "nutrition", self.name, self.fetch
+            )
+            if data:
+                self.resolve(data, API_SOURCE)
+        except Exception:
+            pass
+        self.finish()
+
+    def result(self):
+        return {
+            "found": self.data is not None,
+            "data": self.data,
+            "source": self.source,
+            "cache": self.cache,
+            "latency_ms": self.latency_ms,
+        }
+
+
+def enrich_foods(names, min_score=MIN_MATCH_SCORE):
+    """
+    Datos nutricionales de cada nombre, en el orden recibido, como dicts
+    con query, found, data, source, cache ("hit", "stale", "miss" o None
+    si no se consultó la caché) y latency_ms. Una coincidencia local
+    aproximada solo se usa si llega a min_score.
+    """
+    lookups = {}
+    for name in names:
+        key = enrichment_cache.normalize_query(name)
+        if key not in lookups:
+            lookups[key] = _Lookup(name, min_score)
+
+    upstream = []
+    configured = api_ninja.is_configured()
+    for lookup in lookups.values():
+        if configured and lookup.local_score < 1.0:
+            cached = enrichment_cache.peek("nutrition", lookup.name, lookup.fetch)
+            if cached is None:
+                upstream.append(lookup)
+                continue
+            data, lookup.cache = cached
+            if data:
+                lookup.resolve(data, API_SOURCE)
+        lookup.finish()
+
+    if len(upstream) == 1:
+        upstream[0].fetch_upstream()
+    elif upstream:
+        workers = min(ENRICH_BATCH_WORKERS, len(upstream))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(_Lookup.fetch_upstream, upstream))
+
+    results = {key: lookup.result() for key, lookup in lookups.items()}
+    return [
+        {"query": name, **results[enrichment_cache.normalize_query(name)]}
+        for name in names
+    ]
+
+
+def enrich_food(name):
+    """Datos nutricionales de un nombre (ver enrich_foods)"""
+    return enrich_foods([name])[0]
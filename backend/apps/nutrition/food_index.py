@@ -0,0 +1,178 @@
+"""
+Índice de búsqueda del catálogo local de alimentos
+
+Los nombres se normalizan (minúsculas, sin acentos ni signos) y se parten
+en tokens. El vocabulario de tokens se indexa una sola vez por prefijo
+(lista ordenada + bisect) y por trigramas, así que la búsqueda difusa
+recorre el vocabulario, mucho menor que el catálogo, y solo después se
+expande a los alimentos que contienen cada token. Cada alimento puede
+tener varios nombres (clave, nombre y alias, p. ej. en español) y se
+puntúa con el mejor de ellos.
+"""
+import heapq
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+# Puntuación de un token de la consulta según cómo coincide
+EXACT_SCORE = 1.0
+PREFIX_SCORE = 0.9
+FUZZY_WEIGHT = 0.8
+
+# Similitud mínima (Dice sobre trigramas) de una coincidencia difusa
+MIN_SIMILARITY = 0.5
+
+# Tokens del vocabulario expandidos como máximo por prefijo
+MAX_PREFIX_MATCHES = 50
+
+# Longitud mínima de un token de la consulta para buscarlo por prefijo o
+# con errores; los más cortos solo coinciden exactamente
+MIN_PREFIX_LENGTH = 3
+
+# Palabras vacías (español e inglés) que no se indexan ni se buscan
+STOPWORDS = frozenset({
+    "a", "al", "con", "de", "del", "el", "en", "la", "las", "los", "y",
+    "and", "in", "of", "the", "with",
+})
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text):
+    """Minúsculas, sin acentos y con los signos convertidos en espacios"""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return _NON_ALNUM.sub(" ", stripped).strip()
+
+
+def tokenize(text):
+    """Tokens del texto normalizado sin palabras vacías"""
+    return [token for token in normalize(text).split() if token not in STOPWORDS]
+
+
+def trigrams(token):
+    """Trigramas del token con relleno para que cuenten inicio y final"""
+    padded = f"  {token} "
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+
+def combine_scores(matched, query_length):
+    """
+    Puntuación (0-1) de un alimento a partir de {posición del token de la
+    consulta: (similitud, tokens del nombre)}: la media de las similitudes
+    sobre la consulta pesa 0.8 y la parte cubierta del nombre 0.2.
+    """
+    query_score = sum(similarity for similarity, _ in matched.values()) / query_length
+    length = min(length for _, length in matched.values())
+    coverage = min(1.0, len(matched) / length)
+    return round(0.8 * query_score + 0.2 * coverage, 4)
+
+
+class FoodIndex:
+    """
+    Índice de alimentos para búsquedas ordenadas por puntuación.
+
+    records es una secuencia de (nombres, datos): los nombres se indexan y
+    datos es lo que se devuelve al encontrarlo.
+    """
+
+    def __init__(self, records):
+        self.records = []
+        # Nombre normalizado -> alimentos (coincidencia exacta completa)
+        self.names = defaultdict(set)
+        # Token -> {alimento: número de tokens del nombre más corto}
+        self.postings = defaultdict(dict)
+        for food_id, (names, data) in enumerate(records):
+            self.records.append(data)
+            for name in names:
+                tokens = tokenize(name)
+                if not tokens:
+                    continue
+                self.names[" ".join(tokens)].add(food_id)
+                for token in tokens:
+                    length = self.postings[token].get(food_id)
+                    if length is None or len(tokens) < length:
+                        self.postings[token][food_id] = len(tokens)
+
+        self.vocabulary = sorted(self.postings)
+        self.token_trigrams = {}
+        self.trigram_postings = defaultdict(list)
+        for token in self.vocabulary:
+            grams = trigrams(token)
+            self.token_trigrams[token] = grams
+            for gram in grams:
+                self.trigram_postings[gram].append(token)
+
+    def __len__(self):
+        return len(self.records)
+
+    def _prefix_matches(self, token):
+        start = bisect_left(self.vocabulary, token)
+        matches = []
+        for candidate in self.vocabulary[start:start + MAX_PREFIX_MATCHES]:
+            if not candidate.startswith(token):
+                break
+            matches.append(candidate)
+        return matches
+
+    def _fuzzy_matches(self, token):
+        grams = trigrams(token)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.trigram_postings.get(gram, ()))
+        matches = {}
+        for candidate, count in shared.items():
+            similarity = 2 * count / (len(grams) + len(self.token_trigrams[candidate]))
+            if similarity >= MIN_SIMILARITY:
+                matches[candidate] = similarity * FUZZY_WEIGHT
+        return matches
+
+    def match_token(self, token):
+        """
+        Tokens del vocabulario que coinciden con token y su puntuación. La
+        búsqueda difusa solo se hace si el token no está en el vocabulario,
+        y un token corto solo coincide consigo mismo.
+        """
+        if len(token) < MIN_PREFIX_LENGTH:
+            return {token: EXACT_SCORE} if token in self.postings else {}
+        matches = {} if token in self.postings else self._fuzzy_matches(token)
+        for candidate in self._prefix_matches(token):
+            matches[candidate] = EXACT_SCORE if candidate == token else PREFIX_SCORE
+        return matches
+
+    def search(self, query, limit=5):
+        """
+        Los `limit` mejores alimentos como [(puntuación, datos)], de mayor a
+        menor. La puntuación (0-1) combina lo bien que coincide cada token
+        de la consulta con qué parte del nombre del alimento cubre; un
+        nombre idéntico a la consulta puntúa 1.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens or limit <= 0:
+            return []
+
+        scores = {food_id: 1.0 for food_id in self.names.get(" ".join(tokens), ())}
+
+        # Mejor coincidencia de cada token de la consulta en cada alimento
+        best = defaultdict(dict)
+        for position, token in enumerate(tokens):
+            for candidate, similarity in self.match_token(token).items():
+                for food_id, length in self.postings[candidate].items():
+                    previous = best[food_id].get(position)
+                    if previous is None or similarity > previous[0]:
+                        best[food_id][position] = (similarity, length)
+
+        for food_id, matched in best.items():
+            if food_id not in scores:
+                scores[food_id] = combine_scores(matched, len(tokens))
+
+        top = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [(score, self.records[food_id]) for food_id, score in top]
+
+    def best(self, query, min_score=0.0):
+        """El mejor alimento para query o None si no llega a min_score"""
+        results = self.search(query, limit=1)
+        if results and results[0][0] >= min_score:
+            return results[0][1]
+        return None
@@ -0,0 +1,78 @@
+"""
+Carga una tabla de alimentos (CSV o JSON) en el catálogo binario
+"""
+import csv
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.nutrition.catalogue import NUTRIENTS, write_catalogue
+
+# Columnas con los nombres de API Ninja
+COLUMN_ALIASES = {
+    "carbohydrates_total_g": "carbs_g",
+    "fat_total_g": "fat_g",
+}
+
+
+def _read_csv(path):
+    with open(path, newline="", encoding="utf-8") as source:
+        yield from csv.DictReader(source)
+
+
+def _read_json(path):
+    """Lista de alimentos o {clave: datos} como NUTRITION_DATABASE"""
+    with open(path, encoding="utf-8") as source:
+        data = json.load(source)
+    if isinstance(data, dict):
+        return [{"name": key, **food} for key, food in data.items()]
+    return data
+
+
+class Command(BaseCommand):
+    help = "Build the binary food catalogue used by the local nutrition search"
+
+    def add_arguments(self, parser):
+        parser.add_argument("source", help="CSV or JSON food table")
+        parser.add_argument(
+            "--format",
+            choices=["csv", "json"],
+            help="Source format (default: from the file extension)",
+        )
+        parser.add_argument(
+            "--output",
+            help="Catalogue file to write (default: FOOD_CATALOGUE_PATH)",
+        )
+
+    def foods(self, rows):
+        for line, row in enumerate(rows, start=1):
+            row = {COLUMN_ALIASES.get(column, column): value for column, value in row.items()}
+            name = str(row.get("name") or "").strip()
+            if not name:
+                continue
+            try:
+                yield {
+                    "name": name,
+                    **{field: float(row.get(field) or 0) for field in NUTRIENTS},
+                }
+            except (TypeError, ValueError):
+                raise CommandError(f"Invalid nutrient value in row {line} ({name})")
+
+    def handle(self, *args, **options):
+        source = options["source"]
+        file_format = options["format"] or os.path.splitext(source)[1].lstrip(".").lower()
+        readers = {"csv": _read_csv, "json": _read_json}
+        if file_format not in readers:
+            raise CommandError("Unknown source format, use --format csv|json")
+
+        output = options["output"] or settings.FOOD_CATALOGUE_PATH
+        try:
+            written = write_catalogue(output, self.foods(readers[file_format](source)))
+        except (OSError, json.JSONDecodeError) as e:
+            raise CommandError(f"Could not build the catalogue: {e}")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Wrote {written} foods to {output}")
+        )
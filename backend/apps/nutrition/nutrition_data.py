@@ -1,6 +1,9 @@
 """
 Base de datos nutricional local para alimentos comunes
 """
+from .catalogue import get_food_catalogue
+from .food_index import FoodIndex, normalize
+
 NUTRITION_DATABASE = {
     "apple": {
         "name": "Apple",
@@ -94,19 +97,70 @@ NUTRITION_DATABASE = {
     }
 }
 
+# Otros nombres de cada alimento (p. ej. en español) para la búsqueda
+FOOD_ALIASES = {
+    "apple": ["manzana"],
+    "banana": ["plátano", "guineo", "banano"],
+    "chicken breast": ["pechuga de pollo", "pollo"],
+    "salmon": ["salmón"],
+    "broccoli": ["brócoli", "brécol"],
+    "rice": ["arroz blanco", "arroz"],
+    "eggs": ["huevos", "huevo", "egg"],
+    "milk": ["leche"],
+    "bread": ["pan integral", "pan"],
+    "avocado": ["aguacate", "palta"],
+}
+
+# Puntuación mínima para dar por encontrado un alimento
+MIN_MATCH_SCORE = 0.5
+
+
+def build_food_index(database=NUTRITION_DATABASE, aliases=FOOD_ALIASES):
+    """Índice de búsqueda de un catálogo {clave: datos}"""
+    return FoodIndex(
+        ([key, data["name"], *aliases.get(key, [])], data)
+        for key, data in database.items()
+    )
+
+
+FOOD_INDEX = build_food_index()
+
+
+def _ranked_foods(query, limit):
+    """
+    Mejores resultados del índice integrado y del catálogo binario
+    (si se ha cargado con load_food_catalogue), sin repetir nombres
+    """
+    results = FOOD_INDEX.search(query, limit)
+    catalogue = get_food_catalogue()
+    if catalogue is not None:
+        try:
+            results += catalogue.search(query, limit)
+        except ValueError:
+            # Otro hilo lo ha reemplazado y cerrado durante la búsqueda
+            pass
+
+    ranked, seen = [], set()
+    for score, data in sorted(results, key=lambda result: -result[0]):
+        name = normalize(data["name"])
+        if name not in seen:
+            seen.add(name)
+            ranked.append((score, data))
+    return ranked[:limit]
+
+
+def search_foods(query, limit=5):
+    """Los mejores alimentos para query con su puntuación (0-1)"""
+    return [{**data, "score": score} for score, data in _ranked_foods(query, limit)]
+
+
 def search_nutrition_data(food_name):
     """
-    Buscar datos nutricionales en la base de datos local
+    Buscar datos nutricionales en la base de datos local: el alimento con
+    mejor puntuación, ignorando mayúsculas y acentos y tolerando errores
+    de escritura, o None si ninguno llega a MIN_MATCH_SCORE
     """
-    food_name_lower = food_name.lower().strip()
-    
-    # Búsqueda exacta
-    if food_name_lower in NUTRITION_DATABASE:
-        return NUTRITION_DATABASE[food_name_lower]
-    
-    # Búsqueda parcial
-    for key, data in NUTRITION_DATABASE.items():
-        if food_name_lower in key or key in food_name_lower:
-            return data
-    
+    results = _ranked_foods(food_name, 1)
+    if results and results[0][0] >= MIN_MATCH_SCORE:
+        return results[0][1]
     return None
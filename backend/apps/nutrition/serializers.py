@@ -1,14 +1,114 @@
 # nutrition/serializers.py
+from decimal import Decimal
+
+from django.db import connection, transaction
 from rest_framework import serializers
 
+from apps.stats import cache as stats_cache
+from apps.stats.services import RollupService
+
+from .enrichment import ENRICH_BATCH_MAX, enrich_foods
 from .models import Nutrition
 
+# Entradas por petición en la creación en bloque
+NUTRITION_BULK_MAX = 100
+
+# Campos que se completan con enriquecimiento si faltan
+MACRO_FIELDS = ("calories", "protein_g", "carbs_g", "fat_g")
+
+# Puntuación local mínima para completar macros al guardar: el nombre o un
+# alias completo, no un prefijo ni una coincidencia con errores
+AUTOFILL_MIN_SCORE = 0.95
+
+# Máximo de los DecimalField de macros (max_digits=6, decimal_places=2)
+MAX_MACRO_GRAMS = Decimal("9999.99")
+
+
+def fill_macros(entries):
+    """
+    Completa los macros que falten en cada entrada con los datos de
+    enriquecimiento de su nombre (una sola llamada para todas) escalados
+    por quantity, y quita quantity. Devuelve los errores de cada entrada
+    ({} si no hay).
+    """
+    missing = [
+        index for index, entry in enumerate(entries)
+        if any(entry.get(field) is None for field in MACRO_FIELDS)
+    ]
+    names = [entries[index]["name"] for index in missing]
+    results = enrich_foods(names, min_score=AUTOFILL_MIN_SCORE) if missing else []
+
+    errors = [{} for _ in entries]
+    for index, result in zip(missing, results):
+        entry = entries[index]
+        if not result["found"]:
+            errors[index] = {"name": [f"No nutritional data found for: {entry['name']}"]}
+            continue
+        quantity = entry.get("quantity", Decimal("1"))
+        data = result["data"]
+        if entry.get("calories") is None:
+            entry["calories"] = int(
+                (Decimal(str(data["calories"])) * quantity).to_integral_value()
+            )
+        for field in ("protein_g", "carbs_g", "fat_g"):
+            if entry.get(field) is None:
+                entry[field] = (Decimal(str(data[field])) * quantity).quantize(Decimal("0.01"))
+                if entry[field] > MAX_MACRO_GRAMS:
+                    errors[index] = {"quantity": ["Quantity too large for this food"]}
+
+    for entry in entries:
+        entry.pop("quantity", None)
+    return errors
+
+
+class NutritionListSerializer(serializers.ListSerializer):
+    """Creación en bloque: un enriquecimiento y un bulk_create por petición"""
+
+    def to_internal_value(self, data):
+        # Aquí y no en validate() para que los errores sigan por entrada
+        entries = super().to_internal_value(data)
+        errors = fill_macros(entries)
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return entries
+
+    def create(self, validated_data):
+        user = self.context["request"].user
+        entries = [Nutrition(user=user, **data) for data in validated_data]
+        if not connection.features.can_return_rows_from_bulk_insert:
+            # MySQL no devuelve los ids de un bulk_create y la respuesta los
+            # necesita: se crean una a una y las señales actualizan las
+            # tablas diarias y la caché
+            with transaction.atomic():
+                for entry in entries:
+                    entry.save()
+            return entries
+
+        with transaction.atomic():
+            # bulk_create no dispara las señales de las tablas diarias
+            Nutrition.objects.bulk_create(entries)
+            RollupService.add_nutrition_entries(entries)
+        stats_cache.invalidate(user.pk)
+        return entries
+
 
 class NutritionSerializer(serializers.ModelSerializer):
-    """Serializer para el modelo Nutrition"""
+    """
+    Serializer para el modelo Nutrition. Al crear, basta con name (y
+    opcionalmente quantity, raciones): los macros que falten se completan
+    en el servidor con el enriquecimiento nutricional.
+    """
 
     user = serializers.StringRelatedField(read_only=True)
     total_macros = serializers.ReadOnlyField()
+    quantity = serializers.DecimalField(
+        max_digits=6,
+        decimal_places=2,
+        min_value=Decimal("0.01"),
+        max_value=Decimal("100"),
+        default=Decimal("1"),
+        write_only=True,
+    )
 
     class Meta:
         model = Nutrition
@@ -22,11 +122,37 @@ class NutritionSerializer(serializers.ModelSerializer):
             "carbs_g",
             "fat_g",
             "total_macros",
+            "quantity",
             "created_at",
             "updated_at",
         ]
         read_only_fields = ["id", "created_at", "updated_at"]
+        extra_kwargs = {field: {"required": False} for field in MACRO_FIELDS}
+        list_serializer_class = NutritionListSerializer
+
+    def validate(self, attrs):
+        if self.instance is not None:
+            # Al actualizar no se enriquece
+            attrs.pop("quantity", None)
+            return attrs
+        if isinstance(self.parent, serializers.ListSerializer):
+            # En bloque, NutritionListSerializer enriquece todas las entradas
+            return attrs
+        errors = fill_macros([attrs])[0]
+        if errors:
+            raise serializers.ValidationError(errors)
+        return attrs
 
     def create(self, validated_data):
         validated_data["user"] = self.context["request"].user
         return super().create(validated_data)
+
+
+class NutritionEnrichBatchSerializer(serializers.Serializer):
+    """Serializer para el enriquecimiento nutricional en lote"""
+
+    names = serializers.ListField(
+        child=serializers.CharField(max_length=200),
+        allow_empty=False,
+        max_length=ENRICH_BATCH_MAX,
+    )
@@ -16,4 +16,8 @@ urlpatterns = [
         api_views.NutritionDetailView.as_view(),
         name="nutrition_detail",
     ),
+    # Enriquecimiento en lote
+    path("enrich/batch/", api_views.enrich_batch_view, name="enrich_batch"),
+    # Búsqueda en la base de datos local de alimentos
+    path("foods/search/", api_views.search_foods_view, name="food_search"),
 ]
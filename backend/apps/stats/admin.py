@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import HabitProgress, NutritionStats, UserStats, WorkoutStats
+from .models import HabitProgress, NutritionStats, StatsJob, UserStats, WorkoutStats
 
 
 @admin.register(UserStats)
@@ -47,3 +47,10 @@ class NutritionStatsAdmin(admin.ModelAdmin):
     search_fields = ("user__username", "user__email")
     date_hierarchy = "date"
     readonly_fields = ("created_at",)
+
+
+@admin.register(StatsJob)
+class StatsJobAdmin(admin.ModelAdmin):
+    list_display = ("user", "requested_at", "available_at", "attempts")
+    search_fields = ("user__username", "user__email", "last_error")
+    readonly_fields = ("requested_at", "attempts", "last_error")
@@ -0,0 +1,203 @@
+"""
+Analítica de hábitos de un usuario con una matriz hábito × día
+
+El progreso de todos los hábitos se carga con una consulta en matrices
+hábito × día (días registrados, días cumplidos) y todas las métricas se
+calculan sobre ellas con operaciones vectorizadas de NumPy, así que el
+coste no crece con el número de hábitos más allá de la propia matriz.
+Un día cuenta como cumplido según el tipo del hábito (periods.is_met) y
+tasas y rachas se miden en los periodos de su tipo.
+"""
+from datetime import date, timedelta
+
+import numpy as np
+
+from apps.habits.models import Habit
+
+from .models import HabitProgress
+from .periods import VALUE_KINDS, period_of, period_start
+from .services import HISTORY_DEFAULT_DAYS, HISTORY_MAX_DAYS
+
+# Ventanas de las tasas móviles (días)
+ROLLING_WINDOWS = (7, 30)
+
+
+def _rates(completed, recorded):
+    """Porcentaje completado sobre registrado (0 donde no hay registros)"""
+    completed = np.asarray(completed, dtype=float)
+    recorded = np.asarray(recorded, dtype=float)
+    rates = np.divide(
+        completed * 100, recorded, out=np.zeros_like(completed), where=recorded > 0
+    )
+    return np.round(rates, 2)
+
+
+def _rolling_sums(matrix, window, days):
+    """Sumas móviles de `window` días para los últimos `days` días"""
+    cumulative = np.cumsum(matrix, axis=1, dtype=np.int32)
+    cumulative = np.pad(cumulative, ((0, 0), (1, 0)))
+    return cumulative[:, -days:] - cumulative[:, -days - window:-window]
+
+
+def _trailing_runs(matrix):
+    """Columnas cumplidas seguidas al final de cada fila"""
+    missed = ~matrix[:, ::-1]
+    return np.where(missed.any(axis=1), missed.argmax(axis=1), matrix.shape[1])
+
+
+def _streaks(matrix):
+    """
+    Racha actual y racha más larga de cada fila. La última columna es el
+    periodo en curso: si aún no se ha cumplido, la racha actual es la que
+    termina en la columna anterior.
+    """
+    current = np.where(
+        matrix[:, -1], _trailing_runs(matrix), _trailing_runs(matrix[:, :-1])
+    )
+
+    # +1 donde empieza una racha y -1 donde termina
+    edges = np.diff(np.pad(matrix.astype(np.int8), ((0, 0), (1, 1))), axis=1)
+    starts = np.argwhere(edges == 1)
+    ends = np.argwhere(edges == -1)
+    longest = np.zeros(matrix.shape[0], dtype=np.int64)
+    np.maximum.at(longest, starts[:, 0], ends[:, 1] - starts[:, 1])
+    return current, longest
+
+
+def _bucket_columns(period, load_start, loaded_days):
+    """Índices de columna donde empieza cada periodo de los días cargados"""
+    buckets = [
+        period_start(period, load_start + timedelta(days=offset))
+        for offset in range(loaded_days)
+    ]
+    return np.array(
+        [0]
+        + [
+            offset
+            for offset in range(1, loaded_days)
+            if buckets[offset] != buckets[offset - 1]
+        ]
+    )
+
+
+def habits_overview(user, days=HISTORY_DEFAULT_DAYS, today=None):
+    """
+    Resumen de todos los hábitos del usuario en los últimos N días.
+
+    Por hábito: tasa de completación en periodos de su tipo (cumplidos
+    sobre registrados, como get_habit_completion_rate), tasas móviles de 7
+    y 30 días para cada día de la ventana, tasas por día de la semana
+    (lunes primero) y rachas actual y más larga en periodos. Se cargan 29
+    días más para que las tasas móviles estén completas desde el primer
+    día; las rachas se miden sobre todo lo cargado. Lanza ValueError si
+    days está fuera de rango.
+    """
+    if not 1 <= days <= HISTORY_MAX_DAYS:
+        raise ValueError(f"days must be between 1 and {HISTORY_MAX_DAYS}")
+
+    if today is None:
+        today = date.today()
+    start_date = today - timedelta(days=days - 1)
+    lookback = max(ROLLING_WINDOWS) - 1
+    load_start = start_date - timedelta(days=lookback)
+    loaded_days = days + lookback
+
+    habits = list(
+        Habit.objects.filter(user=user)
+        .order_by("id")
+        .values("id", "title", "kind", "target_value")
+    )
+    rows = {habit["id"]: index for index, habit in enumerate(habits)}
+
+    recorded = np.zeros((len(habits), loaded_days), dtype=bool)
+    completed = np.zeros((len(habits), loaded_days), dtype=bool)
+    values = np.zeros((len(habits), loaded_days))
+    progress = [
+        (rows[habit_id], (day - load_start).days, done, value)
+        for habit_id, day, done, value in HabitProgress.objects.filter(
+            user=user, date__range=[load_start, today]
+        ).values_list("habit_id", "date", "completed", "value")
+        if habit_id in rows
+    ]
+    if progress:
+        row, column, done, value = map(np.array, zip(*progress))
+        recorded[row, column] = True
+        completed[row, column] = done
+        values[row, column] = value
+
+    # Counter y timer se cumplen cuando value alcanza target_value
+    targets = np.array([habit["target_value"] for habit in habits], dtype=float)
+    by_value = np.array(
+        [habit["kind"] in VALUE_KINDS for habit in habits], dtype=bool
+    ) & (targets > 0)
+    met = np.where(by_value[:, None], recorded & (values >= targets[:, None]), completed)
+
+    window_recorded = recorded[:, -days:]
+    window_met = met[:, -days:]
+    completed_days = window_met.sum(axis=1)
+    recorded_days = window_recorded.sum(axis=1)
+
+    rolling = {
+        window: _rates(
+            _rolling_sums(met, window, days),
+            _rolling_sums(recorded, window, days),
+        )
+        for window in ROLLING_WINDOWS
+    }
+
+    # Columnas agrupadas por día de la semana (0 = lunes)
+    weekdays = (start_date.weekday() + np.arange(days)) % 7
+    weekday_met = np.stack(
+        [window_met[:, weekdays == weekday].sum(axis=1) for weekday in range(7)],
+        axis=1,
+    )
+    weekday_recorded = np.stack(
+        [window_recorded[:, weekdays == weekday].sum(axis=1) for weekday in range(7)],
+        axis=1,
+    )
+    weekday_rates = _rates(weekday_met, weekday_recorded)
+
+    # Tasas y rachas por periodos, agrupando hábitos del mismo periodo
+    periods = np.array([period_of(habit["kind"]) for habit in habits])
+    completed_periods = np.zeros(len(habits), dtype=np.int64)
+    recorded_periods = np.zeros(len(habits), dtype=np.int64)
+    current_streaks = np.zeros(len(habits), dtype=np.int64)
+    longest_streaks = np.zeros(len(habits), dtype=np.int64)
+    for period in set(periods.tolist()):
+        selected = periods == period
+        columns = _bucket_columns(period, load_start, loaded_days)
+        period_met = np.add.reduceat(met[selected], columns, axis=1) > 0
+        period_recorded = np.add.reduceat(recorded[selected], columns, axis=1) > 0
+        # Periodos que tocan la ventana
+        first = np.searchsorted(columns, lookback, side="right") - 1
+        completed_periods[selected] = period_met[:, first:].sum(axis=1)
+        recorded_periods[selected] = period_recorded[:, first:].sum(axis=1)
+        current_streaks[selected], longest_streaks[selected] = _streaks(period_met)
+    completion_rates = _rates(completed_periods, recorded_periods)
+
+    return {
+        "start_date": start_date.isoformat(),
+        "end_date": today.isoformat(),
+        "days": days,
+        "habits": [
+            {
+                "id": habit["id"],
+                "title": habit["title"],
+                "kind": habit["kind"],
+                "period": str(periods[index]),
+                "completed_days": int(completed_days[index]),
+                "recorded_days": int(recorded_days[index]),
+                "completed_periods": int(completed_periods[index]),
+                "recorded_periods": int(recorded_periods[index]),
+                "completion_rate": float(completion_rates[index]),
+                **{
+                    f"rolling_{window}d": rolling[window][index].tolist()
+                    for window in ROLLING_WINDOWS
+                },
+                "weekday_rates": weekday_rates[index].tolist(),
+                "current_streak": int(current_streaks[index]),
+                "longest_streak": int(longest_streaks[index]),
+            }
+            for index, habit in enumerate(habits)
+        ],
+    }
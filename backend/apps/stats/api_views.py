@@ -1,15 +1,13 @@
-from datetime import timedelta
-
-from django.db.models import Count, Q, Sum
 from django.utils import timezone
 from rest_framework import generics
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from django.db import connection
 from django.conf import settings
 
+from . import cache as stats_cache
 from .models import HabitProgress, NutritionStats, UserStats, WorkoutStats
 from .serializers import (
     HabitProgressSerializer,
@@ -39,7 +37,7 @@ class HabitProgressListCreateView(generics.ListCreateAPIView):
 
     def get_queryset(self):
         return HabitProgress.objects.filter(
-            habit__user=self.request.user
+            user=self.request.user
         ).select_related("habit")
 
     def perform_create(self, serializer):
@@ -54,7 +52,7 @@ class HabitProgressDetailView(generics.RetrieveUpdateDestroyAPIView):
 
     def get_queryset(self):
         return HabitProgress.objects.filter(
-            habit__user=self.request.user
+            user=self.request.user
         ).select_related("habit")
 
 
@@ -108,162 +106,73 @@ class NutritionStatsDetailView(generics.RetrieveUpdateDestroyAPIView):
 @permission_classes([IsAuthenticated])
 def stats_summary(request):
     """Obtener resumen de estadísticas del usuario"""
+    from .services import StatsService
+
     user = request.user
     today = timezone.now().date()
 
-    # Obtener estadísticas generales
-    user_stats, created = UserStats.objects.get_or_create(user=user)
-
-    # Calcular progreso semanal
-    week_start = today - timedelta(days=today.weekday())
-    week_end = week_start + timedelta(days=6)
-
-    weekly_workouts = WorkoutStats.objects.filter(
-        user=user, date__range=[week_start, week_end]
-    ).aggregate(
-        total_duration=Sum("total_duration"),
-        total_calories=Sum("total_calories_burned"),
-        workout_count=Sum("workout_count"),
-    )
-
-    weekly_nutrition = NutritionStats.objects.filter(
-        user=user, date__range=[week_start, week_end]
-    ).aggregate(
-        total_calories=Sum("total_calories"),
-        total_protein=Sum("total_protein"),
-        total_carbs=Sum("total_carbs"),
-        total_fat=Sum("total_fat"),
-    )
-
-    weekly_habits = HabitProgress.objects.filter(
-        habit__user=user, date__range=[week_start, week_end]
-    ).aggregate(
-        completed_count=Count("id", filter=Q(completed=True)), total_count=Count("id")
-    )
-
-    # Calcular progreso mensual
-    month_start = today.replace(day=1)
-    next_month = month_start.replace(day=28) + timedelta(days=4)
-    month_end = next_month - timedelta(days=next_month.day)
-
-    monthly_workouts = WorkoutStats.objects.filter(
-        user=user, date__range=[month_start, month_end]
-    ).aggregate(
-        total_duration=Sum("total_duration"),
-        total_calories=Sum("total_calories_burned"),
-        workout_count=Sum("workout_count"),
-    )
-
-    monthly_nutrition = NutritionStats.objects.filter(
-        user=user, date__range=[month_start, month_end]
-    ).aggregate(
-        total_calories=Sum("total_calories"),
-        total_protein=Sum("total_protein"),
-        total_carbs=Sum("total_carbs"),
-        total_fat=Sum("total_fat"),
-    )
-
-    monthly_habits = HabitProgress.objects.filter(
-        habit__user=user, date__range=[month_start, month_end]
-    ).aggregate(
-        completed_count=Count("id", filter=Q(completed=True)), total_count=Count("id")
+    summary_data = stats_cache.get_or_compute(
+        user.pk,
+        "summary",
+        lambda: dict(
+            StatsSummarySerializer(StatsService.get_stats_summary(user, today)).data
+        ),
+        today=today,
     )
+    return Response(summary_data)
 
-    summary_data = {
-        "total_workouts": user_stats.total_workouts,
-        "total_habits_completed": user_stats.total_habits_completed,
-        "total_calories_consumed": user_stats.total_calories_consumed,
-        "total_calories_burned": user_stats.total_calories_burned,
-        "current_streak": user_stats.current_streak,
-        "longest_streak": user_stats.longest_streak,
-        "weekly_progress": {
-            "workouts": weekly_workouts,
-            "nutrition": weekly_nutrition,
-            "habits": weekly_habits,
-        },
-        "monthly_progress": {
-            "workouts": monthly_workouts,
-            "nutrition": monthly_nutrition,
-            "habits": monthly_habits,
-        },
-    }
 
-    serializer = StatsSummarySerializer(summary_data)
-    return Response(serializer.data)
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def cache_metrics(request):
+    """Aciertos y fallos de la caché de estadísticas en este proceso"""
+    return Response(stats_cache.get_metrics())
 
 
 # Vistas adicionales para funcionalidades específicas
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def dashboard_view(request):
-    """Vista del dashboard principal - versión API"""
-    from .services import StatsService, NutritionStatsService
-    
-    user = request.user
-    
-    # Obtener estadísticas básicas
-    stats = StatsService.get_user_stats(user)
+    """Vista del dashboard principal (?sections=stats,weekly,nutrition)"""
+    from .dashboard import SECTIONS, build_dashboard, parse_sections
     
-    # Obtener progreso semanal
-    weekly_progress = StatsService.get_weekly_progress(user, weeks_back=4)
-    
-    # Obtener resumen nutricional de hoy
-    today_nutrition = NutritionStatsService.get_daily_nutrition_summary(user)
-    
-    dashboard_data = {
-        'user': {
-            'id': user.id,
-            'username': user.username,
-            'email': user.email,
-        },
-        'stats': {
-            'total_workouts': stats.total_workouts,
-            'total_habits_completed': stats.total_habits_completed,
-            'current_streak': stats.current_streak,
-        },
-        'weekly_progress': weekly_progress,
-        'today_nutrition': today_nutrition,
-    }
+    try:
+        sections = parse_sections(request.query_params.get('sections'))
+    except ValueError as e:
+        return Response(
+            {
+                'error': str(e),
+                'available_sections': list(SECTIONS),
+            },
+            status=400
+        )
     
+    dashboard_data = build_dashboard(
+        request.user, sections, timezone.now().date()
+    )
     return Response(dashboard_data)
 
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def habit_progress_view(request, habit_id):
-    """Vista para ver progreso de un hábito específico"""
+    """Vista para ver progreso de un hábito específico (?days=, por defecto 30)"""
     from apps.habits.models import Habit
-    from .services import HabitProgressService
-    from datetime import date, timedelta
+    from .services import HISTORY_DEFAULT_DAYS, HISTORY_MAX_DAYS, HabitProgressService
     
     try:
         habit = Habit.objects.get(id=habit_id, user=request.user)
     except Habit.DoesNotExist:
         return Response({'error': 'Hábito no encontrado'}, status=404)
     
-    # Calcular tasa de completación
-    completion_rate = HabitProgressService.get_habit_completion_rate(habit)
-    
-    # Obtener progreso de los últimos 30 días
-    today = date.today()
-    start_date = today - timedelta(days=30)
-    
-    progress_data = []
-    for i in range(30):
-        check_date = start_date + timedelta(days=i)
-        try:
-            progress = habit.progress.get(date=check_date)
-            progress_data.append({
-                'date': check_date.isoformat(),
-                'completed': progress.completed,
-                'actual_value': progress.actual_value,
-            })
-        except:
-            progress_data.append({
-                'date': check_date.isoformat(),
-                'completed': False,
-                'actual_value': 0,
-            })
+    try:
+        days = int(request.query_params.get('days', HISTORY_DEFAULT_DAYS))
+        history = HabitProgressService.get_habit_history(habit, days)
+    except ValueError:
+        return Response(
+            {'error': f'days debe ser un entero entre 1 y {HISTORY_MAX_DAYS}'},
+            status=400
+        )
     
     response_data = {
         'habit': {
@@ -273,13 +182,63 @@ def habit_progress_view(request, habit_id):
             'target_value': habit.target_value,
             'color_hex': habit.color_hex,
         },
-        'completion_rate': completion_rate,
-        'progress_data': progress_data,
+        'completion_rate': history['completion_rate'],
+        **HabitProgressService.get_habit_streaks(habit),
+        'progress_data': history['progress_data'],
     }
     
     return Response(response_data)
 
 
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def habits_overview_view(request):
+    """Analítica de todos los hábitos del usuario (?days=, por defecto 30)"""
+    from .analytics import habits_overview
+    from .services import HISTORY_DEFAULT_DAYS, HISTORY_MAX_DAYS
+    
+    try:
+        days = int(request.query_params.get('days', HISTORY_DEFAULT_DAYS))
+        overview = habits_overview(request.user, days)
+    except ValueError:
+        return Response(
+            {'error': f'days debe ser un entero entre 1 y {HISTORY_MAX_DAYS}'},
+            status=400
+        )
+    
+    return Response(overview)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def nutrition_summary_view(request):
+    """Resumen nutricional por día de un rango (?start=&end=, por defecto hoy)"""
+    from datetime import date
+    from .services import HISTORY_MAX_DAYS, NutritionStatsService
+    
+    today = timezone.now().date()
+    try:
+        start_date = date.fromisoformat(request.query_params.get('start', today.isoformat()))
+        end_date = date.fromisoformat(request.query_params.get('end', start_date.isoformat()))
+        days = NutritionStatsService.get_nutrition_summaries(
+            request.user, start_date, end_date
+        )
+    except ValueError:
+        return Response(
+            {
+                'error': 'start y end deben ser fechas YYYY-MM-DD con start <= end '
+                         f'y un rango de hasta {HISTORY_MAX_DAYS} días'
+            },
+            status=400
+        )
+    
+    return Response({
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'days': days,
+    })
+
+
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def mark_habit_completed_view(request, habit_id):
@@ -311,7 +270,7 @@ def mark_habit_completed_view(request, habit_id):
                 'id': progress.id,
                 'date': progress.date.isoformat(),
                 'completed': progress.completed,
-                'actual_value': progress.actual_value,
+                'actual_value': progress.value,
             }
         })
         
@@ -348,7 +307,7 @@ def mark_habit_incomplete_view(request, habit_id):
                     'id': progress.id,
                     'date': progress.date.isoformat(),
                     'completed': progress.completed,
-                    'actual_value': progress.actual_value,
+                    'actual_value': progress.value,
                 }
             })
         else:
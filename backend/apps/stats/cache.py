@@ -0,0 +1,120 @@
+"""
+Caché por usuario de las respuestas de estadísticas
+
+Cada usuario tiene una versión en caché que se renueva con cualquier
+escritura que afecte a sus estadísticas. Las entradas guardan la versión
+con la que se calcularon, así que una lectura es un único get_many
+(entrada + versión) y nunca se sirve un valor anterior a la última
+escritura.
+"""
+import threading
+import uuid
+from collections import defaultdict
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+_metrics_lock = threading.Lock()
+_metrics = defaultdict(lambda: {"hits": 0, "misses": 0})
+
+
+def _version_key(user_id):
+    return f"stats:version:{user_id}"
+
+
+def _entry_key(user_id, section, today):
+    return f"stats:{section}:{user_id}:{today.isoformat()}"
+
+
+def _record(section, outcome):
+    with _metrics_lock:
+        _metrics[section][outcome] += 1
+
+
+def lookup(user_id, sections, today=None, label=None):
+    """
+    Busca varias secciones del usuario en un único get_many.
+    
+    Las métricas se cuentan por sección o, si se da, por label (para
+    secciones con identificadores, que harían crecer las métricas sin
+    límite). Devuelve ({sección: datos} con los aciertos, versión). La versión se
+    pasa a store(); es None si otro proceso la creó a la vez y entonces no
+    se debe guardar nada.
+    """
+    if today is None:
+        today = date.today()
+
+    version_key = _version_key(user_id)
+    entry_keys = {section: _entry_key(user_id, section, today) for section in sections}
+    found = cache.get_many([version_key, *entry_keys.values()])
+    version = found.get(version_key)
+
+    hits = {}
+    for section, entry_key in entry_keys.items():
+        entry = found.get(entry_key)
+        if version is not None and entry is not None and entry["version"] == version:
+            _record(label or section, "hits")
+            hits[section] = entry["data"]
+        else:
+            _record(label or section, "misses")
+
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(version_key, version, timeout=None):
+            # Otro proceso acaba de crear la versión: no guardar con la nuestra
+            version = None
+    return hits, version
+
+
+def store(user_id, values, version, today=None):
+    """Guarda {sección: datos} calculados con la versión de lookup()"""
+    if version is None or not values:
+        return
+    if today is None:
+        today = date.today()
+    cache.set_many(
+        {
+            _entry_key(user_id, section, today): {"version": version, "data": data}
+            for section, data in values.items()
+        },
+        settings.STATS_CACHE_TIMEOUT,
+    )
+
+
+def get_or_compute(user_id, section, compute, today=None, label=None):
+    """Devuelve la sección cacheada del usuario o la calcula y la guarda"""
+    hits, version = lookup(user_id, [section], today, label)
+    if section in hits:
+        return hits[section]
+
+    data = compute()
+    store(user_id, {section: data}, version, today)
+    return data
+
+
+def _bump(user_ids):
+    cache.set_many(
+        {_version_key(user_id): uuid.uuid4().hex for user_id in user_ids},
+        timeout=None,
+    )
+
+
+def invalidate(*user_ids):
+    """
+    Invalida las entradas de los usuarios ahora y de nuevo al confirmar la
+    transacción, para que una lectura concurrente no guarde datos previos
+    al commit con la versión nueva.
+    """
+    user_ids = [user_id for user_id in user_ids if user_id is not None]
+    if not user_ids:
+        return
+    _bump(user_ids)
+    transaction.on_commit(lambda: _bump(user_ids))
+
+
+def get_metrics():
+    """Contadores de aciertos y fallos por sección (por proceso)"""
+    with _metrics_lock:
+        return {section: dict(counts) for section, counts in _metrics.items()}
@@ -0,0 +1,139 @@
+"""
+Composición del dashboard por secciones
+
+Cada sección es un proveedor independiente (usuario, fecha) -> datos que
+se cachea por separado. Las secciones pedidas se buscan en caché con un
+único get_many y las que fallan se calculan en paralelo en un pool de
+hilos del proceso, cada uno con su propia conexión a la base de datos
+(persistente según CONN_MAX_AGE), así que la latencia sigue a la sección
+más lenta y no a la suma de todas.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+from . import cache as stats_cache
+from .services import NutritionStatsService, StatsService
+
+
+def _stats_section(user, today):
+    stats = StatsService.get_user_stats(user)
+    return {
+        "total_workouts": stats.total_workouts,
+        "total_habits_completed": stats.total_habits_completed,
+        "current_streak": stats.active_streak,
+    }
+
+
+def _weekly_section(user, today):
+    return StatsService.get_weekly_progress(user, weeks_back=4, today=today)
+
+
+def _nutrition_section(user, today):
+    return NutritionStatsService.get_daily_nutrition_summary(user, today)
+
+
+# Nombre de la sección (?sections=) -> (clave en la respuesta, proveedor)
+SECTIONS = {
+    "stats": ("stats", _stats_section),
+    "weekly": ("weekly_progress", _weekly_section),
+    "nutrition": ("today_nutrition", _nutrition_section),
+}
+
+
+def parse_sections(value):
+    """
+    Convierte "stats,weekly" en la lista de secciones; vacío o None son
+    todas. Lanza ValueError con las secciones desconocidas.
+    """
+    if not value:
+        return list(SECTIONS)
+    sections = list(
+        dict.fromkeys(name.strip() for name in value.split(",") if name.strip())
+    )
+    if not sections:
+        raise ValueError("No se ha indicado ninguna sección")
+    unknown = [name for name in sections if name not in SECTIONS]
+    if unknown:
+        raise ValueError(f"Secciones no válidas: {', '.join(unknown)}")
+    return sections
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """Pool de hilos del proceso, creado con el primer dashboard"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.STATS_DASHBOARD_WORKERS,
+                thread_name_prefix="dashboard",
+            )
+        return _executor
+
+
+def _compute_in_thread(provider, user, today):
+    # Los hilos del pool no pasan por el ciclo de la petición: como en
+    # él, se cierran solo las conexiones caducadas o inservibles
+    close_old_connections()
+    try:
+        return provider(user, today)
+    finally:
+        close_old_connections()
+
+
+def _compute_sections(user, sections, today):
+    providers = {section: SECTIONS[section][1] for section in sections}
+    workers = min(settings.STATS_DASHBOARD_WORKERS, len(providers))
+
+    # Dentro de una transacción otras conexiones no verían sus escrituras
+    if workers <= 1 or connection.in_atomic_block:
+        return {
+            section: provider(user, today) for section, provider in providers.items()
+        }
+
+    executor = _get_executor()
+    futures = {
+        section: executor.submit(_compute_in_thread, provider, user, today)
+        for section, provider in providers.items()
+    }
+    return {section: future.result() for section, future in futures.items()}
+
+
+def build_dashboard(user, sections, today):
+    """Datos del dashboard con las secciones pedidas"""
+    hits, version = stats_cache.lookup(
+        user.pk, [f"dashboard:{section}" for section in sections], today
+    )
+    values = {
+        section: hits[f"dashboard:{section}"]
+        for section in sections
+        if f"dashboard:{section}" in hits
+    }
+
+    missing = [section for section in sections if section not in values]
+    if missing:
+        computed = _compute_sections(user, missing, today)
+        stats_cache.store(
+            user.pk,
+            {f"dashboard:{section}": data for section, data in computed.items()},
+            version,
+            today,
+        )
+        values.update(computed)
+
+    dashboard_data = {
+        "user": {
+            "id": user.id,
+            "username": user.username,
+            "email": user.email,
+        },
+    }
+    for section in sections:
+        dashboard_data[SECTIONS[section][0]] = values[section]
+    return dashboard_data
@@ -0,0 +1,95 @@
+"""
+Compara el plan y el tiempo de las consultas de estadísticas sobre
+HabitProgress filtrando por habit__user (antes) y por user (después)
+"""
+import statistics
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Q
+
+from apps.stats.models import HabitProgress
+
+
+def _stats_queries(user_filter, today):
+    """Consultas de rachas, semana y resumen con el filtro de usuario dado"""
+    progress = HabitProgress.objects.filter(**user_filter).order_by()
+    week_start = today - timedelta(days=today.weekday())
+    month_start = today.replace(day=1)
+    return {
+        "streak": progress.filter(completed=True, date__lte=today)
+        .order_by("date")
+        .values_list("date", flat=True)
+        .distinct(),
+        "weekly": progress.filter(
+            date__range=[today - timedelta(weeks=4), today], completed=True
+        )
+        .values("date")
+        .annotate(count=Count("id")),
+        "summary": progress.filter(
+            date__range=[min(week_start, month_start), today]
+        ).values("date").annotate(
+            completed_count=Count("id", filter=Q(completed=True)),
+            total_count=Count("id"),
+        ),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Show query plans and timings of the HabitProgress stats queries "
+        "filtered by habit__user (before) and by user (after)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            dest="email",
+            metavar="EMAIL",
+            help="User to benchmark (default: the one with most progress rows)",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=20,
+            help="Runs per query; the median is reported (default: 20)",
+        )
+
+    def handle(self, *args, **options):
+        if options["repeat"] < 1:
+            raise CommandError("--repeat must be positive")
+
+        users = get_user_model().objects.all()
+        if options["email"]:
+            user = users.filter(email=options["email"]).first()
+        else:
+            user = users.annotate(rows=Count("habit_progress")).order_by("-rows").first()
+        if user is None:
+            raise CommandError("No user to benchmark")
+
+        today = date.today()
+        variants = {
+            "before": _stats_queries({"habit__user": user}, today),
+            "after": _stats_queries({"user": user}, today),
+        }
+
+        self.stdout.write(f"Database: {connection.vendor}, user: {user.email}")
+        for name in variants["before"]:
+            for variant, queries in variants.items():
+                queryset = queries[name]
+                timings = []
+                for _ in range(options["repeat"]):
+                    started = time.perf_counter()
+                    list(queryset.all())
+                    timings.append((time.perf_counter() - started) * 1000)
+
+                self.stdout.write(
+                    self.style.MIGRATE_HEADING(
+                        f"\n{name} ({variant}): "
+                        f"median {statistics.median(timings):.2f} ms"
+                    )
+                )
+                self.stdout.write(queryset.explain())
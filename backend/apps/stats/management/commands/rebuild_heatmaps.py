@@ -0,0 +1,52 @@
+"""
+Reconstruye los bitsets anuales de los hábitos (HabitYearBitmap)
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.habits.models import Habit
+from apps.stats.services import HeatmapService
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-habit year heatmap bitmaps from HabitProgress"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            action="append",
+            dest="emails",
+            metavar="EMAIL",
+            help="Only rebuild heatmaps for this user's habits (repeatable)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=200,
+            help="Habits rebuilt per pass (default: 200)",
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        if chunk_size < 1:
+            raise CommandError("--chunk-size must be positive")
+
+        habits = Habit.objects.order_by("pk")
+        emails = options["emails"]
+        if emails:
+            users = list(get_user_model().objects.filter(email__in=emails))
+            missing = set(emails) - {user.email for user in users}
+            if missing:
+                raise CommandError(f"Unknown users: {', '.join(sorted(missing))}")
+            habits = habits.filter(user__in=users)
+        habit_ids = list(habits.values_list("pk", flat=True))
+
+        written = 0
+        for start in range(0, len(habit_ids), chunk_size):
+            written += HeatmapService.rebuild(habit_ids[start:start + chunk_size])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {written} year bitmaps for {len(habit_ids)} habits"
+            )
+        )
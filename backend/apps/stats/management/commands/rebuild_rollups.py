@@ -0,0 +1,44 @@
+"""
+Reconstruye las tablas diarias WorkoutStats y NutritionStats
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.stats.services import RollupService
+
+
+class Command(BaseCommand):
+    help = "Rebuild WorkoutStats and NutritionStats daily rollups from source rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            action="append",
+            dest="emails",
+            metavar="EMAIL",
+            help="Only rebuild rollups for this user (repeatable)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows per bulk insert (default: 1000)",
+        )
+
+    def handle(self, *args, **options):
+        users = None
+        emails = options["emails"]
+        if emails:
+            users = list(get_user_model().objects.filter(email__in=emails))
+            missing = set(emails) - {user.email for user in users}
+            if missing:
+                raise CommandError(f"Unknown users: {', '.join(sorted(missing))}")
+
+        created = RollupService.rebuild(users, batch_size=options["batch_size"])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {created['workout_stats']} workout and "
+                f"{created['nutrition_stats']} nutrition daily rows"
+            )
+        )
@@ -0,0 +1,85 @@
+"""
+Recalcula UserStats para toda la base de usuarios con consultas agrupadas
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+def _init_worker():
+    """Prepara Django en cada proceso y descarta conexiones heredadas"""
+    django.setup()
+    for connection in connections.all(initialized_only=True):
+        connection.close()
+
+
+def _recompute_chunk(user_ids, batch_size):
+    # Importado aquí para que el proceso hijo configure Django antes
+    from apps.stats.services import StatsService
+
+    return StatsService.recompute_user_stats(user_ids, batch_size=batch_size)
+
+
+class Command(BaseCommand):
+    help = "Recompute UserStats for all users with set-based queries"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            action="append",
+            dest="emails",
+            metavar="EMAIL",
+            help="Only recompute stats for this user (repeatable)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Users per set-based recompute (default: 500)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Processes to split user-id ranges across (default: 1)",
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        workers = options["workers"]
+        if chunk_size < 1 or workers < 1:
+            raise CommandError("--chunk-size and --workers must be positive")
+
+        users = get_user_model().objects.order_by("pk")
+        if options["emails"]:
+            users = users.filter(email__in=options["emails"])
+        user_ids = list(users.values_list("pk", flat=True))
+
+        # Rangos contiguos de ids ordenados
+        chunks = [
+            user_ids[start:start + chunk_size]
+            for start in range(0, len(user_ids), chunk_size)
+        ]
+
+        if workers == 1 or len(chunks) <= 1:
+            updated = sum(_recompute_chunk(chunk, chunk_size) for chunk in chunks)
+        else:
+            # Los hijos no deben reutilizar la conexión del proceso padre
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker
+            ) as executor:
+                updated = sum(
+                    executor.map(
+                        _recompute_chunk, chunks, [chunk_size] * len(chunks)
+                    )
+                )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Recomputed stats for {updated} users in {len(chunks)} chunks"
+            )
+        )
@@ -0,0 +1,64 @@
+"""
+Worker que procesa la cola de recálculos de estadísticas (StatsJob)
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from apps.stats.services import StatsJobService
+
+
+class Command(BaseCommand):
+    help = "Process queued stats recomputations (used with STATS_DEFERRED=True)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Users recomputed per claimed batch (default: 100)",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait when the queue is empty (default: 1.0)",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Process the jobs that are due and exit",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size must be positive")
+
+        total = 0
+        try:
+            while True:
+                close_old_connections()
+                try:
+                    processed = StatsJobService.run_pending(batch_size)
+                except Exception as e:
+                    # El trabajo queda en la cola y se reintenta al vencer
+                    self.stderr.write(f"Stats recompute failed: {e}")
+                    processed = 0
+                    if options["once"]:
+                        break
+
+                total += processed
+                if processed:
+                    self.stdout.write(f"Recomputed stats for {processed} users")
+                elif options["once"]:
+                    break
+                else:
+                    time.sleep(options["poll_interval"])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Stats worker stopped after {total} recomputes")
+        )
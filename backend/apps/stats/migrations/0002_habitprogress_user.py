@@ -0,0 +1,23 @@
+# Generated by Django 5.0.2 on 2026-10-18 21:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0002_alter_habit_color_hex_alter_habit_target_value'),
+        ('stats', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Nullable first so existing rows can be back-filled in 0003
+        migrations.AddField(
+            model_name='habitprogress',
+            name='user',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='habit_progress', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
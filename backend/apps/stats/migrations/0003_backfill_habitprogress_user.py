@@ -0,0 +1,26 @@
+# Generated by Django 5.0.2 on 2026-10-18 21:10
+
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_habitprogress_user(apps, schema_editor):
+    """Copia habit.user en habitprogress.user para los progresos existentes"""
+    HabitProgress = apps.get_model('stats', 'HabitProgress')
+    Habit = apps.get_model('habits', 'Habit')
+    HabitProgress.objects.filter(user__isnull=True).update(
+        user=Subquery(
+            Habit.objects.filter(pk=OuterRef('habit_id')).values('user_id')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stats', '0002_habitprogress_user'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_habitprogress_user, migrations.RunPython.noop),
+    ]
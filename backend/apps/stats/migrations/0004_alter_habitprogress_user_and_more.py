@@ -0,0 +1,29 @@
+# Generated by Django 5.0.2 on 2026-10-18 21:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stats', '0003_backfill_habitprogress_user'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='habitprogress',
+            name='user',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='habit_progress', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='habitprogress',
+            index=models.Index(fields=['user', 'date', 'completed'], name='stats_habit_user_id_b049a6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='habitprogress',
+            index=models.Index(fields=['user', 'completed', 'date'], name='stats_habit_user_id_9ebe59_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.2 on 2026-10-18 20:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stats', '0004_alter_habitprogress_user_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatsJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('requested_at', models.DateTimeField()),
+                ('available_at', models.DateTimeField(db_index=True)),
+                ('attempts', models.IntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats_job', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Recálculo de Estadísticas',
+                'verbose_name_plural': 'Recálculos de Estadísticas',
+                'ordering': ['available_at'],
+            },
+        ),
+    ]
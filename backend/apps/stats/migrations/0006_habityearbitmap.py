@@ -0,0 +1,29 @@
+# Generated by Django 5.0.2 on 2026-10-18 20:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0002_alter_habit_color_hex_alter_habit_target_value'),
+        ('stats', '0005_statsjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HabitYearBitmap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('bits', models.BinaryField(max_length=46)),
+                ('habit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='year_bitmaps', to='habits.habit')),
+            ],
+            options={
+                'verbose_name': 'Mapa Anual de Hábito',
+                'verbose_name_plural': 'Mapas Anuales de Hábitos',
+                'unique_together': {('habit', 'year')},
+            },
+        ),
+    ]
@@ -1,4 +1,8 @@
-from django.db import models
+from datetime import date
+
+from django.db import connections, models
+from django.db.models.constants import OnConflict
+from django.utils import timezone
 from apps.accounts.models import User
 from apps.habits.models import Habit
 
@@ -27,6 +31,100 @@ class UserStats(models.Model):
     def __str__(self):
         return f"Stats de {self.user.username}"
 
+    @property
+    def active_streak(self):
+        """
+        Racha vigente: current_streak guarda la racha que termina en
+        last_activity_date, que solo sigue activa si esa fecha es hoy
+        """
+        if self.last_activity_date == date.today():
+            return self.current_streak
+        return 0
+
+
+class HabitProgressManager(models.Manager):
+    """Manager de HabitProgress con upsert atómico por (habit, date)"""
+
+    def upsert(self, habit, day, completed=True, value=0.0):
+        """
+        Inserta o actualiza el progreso del hábito en la fecha con una sola
+        sentencia (ON DUPLICATE KEY UPDATE en MySQL, ON CONFLICT en SQLite y
+        PostgreSQL), así que dos peticiones simultáneas no chocan con la
+        restricción única. Solo se actualizan completed y value; las notas
+        se conservan.
+
+        Devuelve (progress, created). Como bulk_create, no envía señales.
+        """
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        opts = self.model._meta
+        row = {
+            'habit': habit.pk,
+            'user': habit.user_id,
+            'date': day,
+            'completed': completed,
+            'value': value,
+            'notes': '',
+            'created_at': timezone.now(),
+        }
+        fields = {name: opts.get_field(name) for name in row}
+        column = {name: qn(field.column) for name, field in fields.items()}
+        pk_column = qn(opts.pk.column)
+        params = [
+            fields[name].get_db_prep_save(field_value, connection)
+            for name, field_value in row.items()
+        ]
+        insert = (
+            f"INSERT INTO {qn(opts.db_table)} ({', '.join(column.values())}) "
+            f"VALUES ({', '.join(['%s'] * len(column))})"
+        )
+
+        with connection.cursor() as cursor:
+            if connection.vendor == 'mysql':
+                # Django genera el alias de fila (AS new) en MySQL 8.0.19+ y
+                # VALUE() en MariaDB. Con CLIENT.FOUND_ROWS, que el backend
+                # activa, rowcount es 1 también si la fila existía sin
+                # cambios: se vuelve a leer y, si created_at es el de esta
+                # sentencia, se ha insertado
+                cursor.execute(
+                    f"{insert} " + connection.ops.on_conflict_suffix_sql(
+                        list(fields.values()),
+                        OnConflict.UPDATE,
+                        [fields['completed'].column, fields['value'].column],
+                        [],
+                    ),
+                    params,
+                )
+                cursor.execute(
+                    f"SELECT {pk_column}, {column['notes']}, "
+                    f"{column['created_at']} = %s FROM {qn(opts.db_table)} "
+                    f"WHERE {column['habit']} = %s AND {column['date']} = %s "
+                    f"FOR UPDATE",
+                    [params[-1], params[0], params[2]],
+                )
+            else:
+                # Una fila actualizada conserva su created_at anterior
+                cursor.execute(
+                    f"{insert} ON CONFLICT ({column['habit']}, {column['date']}) "
+                    f"DO UPDATE SET "
+                    f"{column['completed']} = excluded.{column['completed']}, "
+                    f"{column['value']} = excluded.{column['value']} "
+                    f"RETURNING {pk_column}, {column['notes']}, "
+                    f"{column['created_at']} = %s",
+                    params + [params[-1]],
+                )
+            pk, notes, created = cursor.fetchone()
+            created = bool(created)
+
+        # El resto de campos se carga bajo demanda
+        progress = self.model.from_db(
+            self.db,
+            ['id', 'habit_id', 'user_id', 'date', 'completed', 'value', 'notes'],
+            [pk, habit.pk, habit.user_id, day, completed, value, notes],
+        )
+        progress.habit = habit
+        return progress, created
+
 
 class HabitProgress(models.Model):
     """
@@ -35,21 +133,42 @@ class HabitProgress(models.Model):
     habit = models.ForeignKey(
         Habit, on_delete=models.CASCADE, related_name='progress'
     )
+    # Copia de habit.user para filtrar por usuario sin unir Habit
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='habit_progress',
+        editable=False
+    )
     date = models.DateField()
     completed = models.BooleanField(default=False)
     value = models.FloatField(default=0.0)
     notes = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = HabitProgressManager()
+
     class Meta:
         unique_together = ['habit', 'date']
         ordering = ['-date']
         verbose_name = "Progreso de Hábito"
         verbose_name_plural = "Progresos de Hábitos"
+        indexes = [
+            # Rangos de fechas por usuario (semanas, meses, historial)
+            models.Index(fields=['user', 'date', 'completed']),
+            # Días completados por usuario (rachas, totales)
+            models.Index(fields=['user', 'completed', 'date']),
+        ]
 
     def __str__(self):
         return f"{self.habit.title} - {self.date}"
 
+    def save(self, *args, **kwargs):
+        """Mantiene el usuario sincronizado con el hábito"""
+        self.user_id = self.habit.user_id
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'habit' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'user'}
+        super().save(*args, **kwargs)
+
 
 class WorkoutStats(models.Model):
     """
@@ -98,3 +217,52 @@ class NutritionStats(models.Model):
 
     def __str__(self):
         return f"Nutrition Stats - {self.user.username} - {self.date}"
+
+
+class StatsJob(models.Model):
+    """
+    Recálculo pendiente de las estadísticas de un usuario
+
+    Hay como máximo una fila por usuario: las escrituras seguidas solo
+    actualizan requested_at, así que se agrupan en un único recálculo.
+    """
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, related_name='stats_job'
+    )
+    # Última escritura que pidió el recálculo
+    requested_at = models.DateTimeField()
+    # El worker no la toma antes; al reclamarla se alarga como concesión
+    available_at = models.DateTimeField(db_index=True)
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['available_at']
+        verbose_name = "Recálculo de Estadísticas"
+        verbose_name_plural = "Recálculos de Estadísticas"
+
+    def __str__(self):
+        return f"Stats Job - {self.user.username}"
+
+
+class HabitYearBitmap(models.Model):
+    """
+    Días cumplidos de un hábito en un año como bitset
+
+    El bit n (el bit n % 8 del byte n // 8) es el día n + 1 del año; 46
+    bytes cubren un año bisiesto. Se mantiene con cada escritura de
+    progreso y sirve el heatmap anual sin leer HabitProgress.
+    """
+    habit = models.ForeignKey(
+        Habit, on_delete=models.CASCADE, related_name='year_bitmaps'
+    )
+    year = models.PositiveSmallIntegerField()
+    bits = models.BinaryField(max_length=46)
+
+    class Meta:
+        unique_together = ['habit', 'year']
+        verbose_name = "Mapa Anual de Hábito"
+        verbose_name_plural = "Mapas Anuales de Hábitos"
+
+    def __str__(self):
+        return f"{self.habit.title} - {self.year}"
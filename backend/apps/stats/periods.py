@@ -0,0 +1,148 @@
+"""
+Calendario de periodos esperados según el tipo de hábito
+
+Un hábito diario se evalúa por días, uno semanal por semanas (de lunes a
+domingo) y uno mensual por meses. Los hábitos counter y timer son diarios,
+pero un día solo cuenta como cumplido si HabitProgress.value alcanza
+target_value. El calendario de cada hábito guarda los periodos registrados
+y cumplidos, así que tasas y rachas recorren periodos y no días.
+"""
+from datetime import date, timedelta
+
+from . import cache as stats_cache
+from .models import HabitProgress
+
+# Periodo que se espera completar según Habit.kind
+PERIODS = {
+    "daily": "day",
+    "weekly": "week",
+    "monthly": "month",
+    "counter": "day",
+    "timer": "day",
+}
+
+# Tipos que se evalúan con HabitProgress.value frente a target_value
+VALUE_KINDS = {"counter", "timer"}
+
+
+def period_of(kind):
+    """Periodo del tipo de hábito (los tipos desconocidos son diarios)"""
+    return PERIODS.get(kind, "day")
+
+
+def period_start(period, day):
+    """Primer día del periodo que contiene day"""
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return day.replace(day=1)
+    return day
+
+
+def previous_period(period, start):
+    """Primer día del periodo anterior al que empieza en start"""
+    if period == "week":
+        return start - timedelta(days=7)
+    if period == "month":
+        return (start - timedelta(days=1)).replace(day=1)
+    return start - timedelta(days=1)
+
+
+def is_met(kind, target_value, completed, value):
+    """Si un registro de progreso cumple el hábito"""
+    if kind in VALUE_KINDS and target_value > 0:
+        return value >= target_value
+    return completed
+
+
+class HabitCalendar:
+    """Periodos registrados y cumplidos de un hábito"""
+
+    def __init__(self, kind, recorded, met):
+        self.kind = kind
+        self.period = period_of(kind)
+        self.recorded = recorded
+        self.met = met
+
+    @classmethod
+    def from_rows(cls, kind, target_value, rows):
+        """Construye el calendario a partir de filas (date, completed, value)"""
+        period = period_of(kind)
+        recorded, met = set(), set()
+        for day, completed, value in rows:
+            start = period_start(period, day)
+            recorded.add(start)
+            if is_met(kind, target_value, completed, value):
+                met.add(start)
+        return cls(kind, recorded, met)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data["kind"],
+            {date.fromordinal(day) for day in data["recorded"]},
+            {date.fromordinal(day) for day in data["met"]},
+        )
+
+    def to_dict(self):
+        """Forma serializable para la caché (fechas como ordinales)"""
+        return {
+            "kind": self.kind,
+            "recorded": sorted(day.toordinal() for day in self.recorded),
+            "met": sorted(day.toordinal() for day in self.met),
+        }
+
+    def counts(self, start_date, end_date):
+        """(periodos cumplidos, periodos registrados) que tocan el rango"""
+        first = period_start(self.period, start_date)
+        return (
+            sum(1 for start in self.met if first <= start <= end_date),
+            sum(1 for start in self.recorded if first <= start <= end_date),
+        )
+
+    def streaks(self, today=None):
+        """
+        (racha actual, racha más larga) en periodos cumplidos seguidos.
+        El periodo actual sigue abierto: si aún no se ha cumplido, la racha
+        actual es la que termina en el periodo anterior.
+        """
+        if today is None:
+            today = date.today()
+        current_period = period_start(self.period, today)
+
+        longest = run = 0
+        previous = None
+        for start in sorted(start for start in self.met if start <= current_period):
+            if previous is not None and previous_period(self.period, start) == previous:
+                run += 1
+            else:
+                run = 1
+            longest = max(longest, run)
+            previous = start
+
+        if previous in (current_period, previous_period(self.period, current_period)):
+            return run, longest
+        return 0, longest
+
+
+def get_habit_calendar(habit, today=None):
+    """
+    Calendario del hábito sobre todo su historial, cacheado por hábito.
+    La caché se invalida con cualquier escritura de progreso del usuario y
+    con cada edición del hábito.
+    """
+    data = stats_cache.get_or_compute(
+        habit.user_id,
+        f"habit_calendar:{habit.pk}",
+        lambda: HabitCalendar.from_rows(
+            habit.kind,
+            habit.target_value,
+            HabitProgress.objects.filter(habit=habit)
+            .order_by()
+            .values_list("date", "completed", "value"),
+        ).to_dict(),
+        today=today,
+        # Una sola entrada de métricas para todos los hábitos
+        label="habit_calendar",
+    )
+    return HabitCalendar.from_dict(data)
@@ -4,6 +4,8 @@ from .models import UserStats, HabitProgress, WorkoutStats, NutritionStats
 
 class UserStatsSerializer(serializers.ModelSerializer):
     """Serializer para estadísticas generales del usuario"""
+    # La racha guardada solo sigue vigente si termina hoy
+    current_streak = serializers.IntegerField(source='active_streak', read_only=True)
     
     class Meta:
         model = UserStats
@@ -1,15 +1,58 @@
 """
 Services for FitTracker statistics
 """
-from datetime import date, timedelta
+import base64
+from datetime import date, datetime, timedelta
 from decimal import Decimal
-from django.db.models import Sum, Count, Avg
+from itertools import groupby
+from operator import itemgetter
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Sum, Count, F, Q
+from django.db.models.functions import TruncMonth, TruncWeek
 from django.utils import timezone
 
 from apps.habits.models import Habit
 from apps.workouts.models import Workout
 from apps.nutrition.models import Nutrition
-from apps.stats.models import UserStats, HabitProgress, WorkoutStats, NutritionStats
+from apps.stats import cache as stats_cache
+from apps.stats.periods import HabitCalendar, get_habit_calendar, is_met
+from apps.stats.models import (
+    UserStats, HabitProgress, WorkoutStats, NutritionStats, StatsJob,
+    HabitYearBitmap,
+)
+
+
+# Ventana del historial de hábitos (días); 366 cubre un año bisiesto
+HISTORY_DEFAULT_DAYS = 30
+HISTORY_MAX_DAYS = 366
+
+# Semanas máximas del promedio nutricional semanal (un año)
+NUTRITION_MAX_WEEKS = 53
+
+# Máximo de registros por check-in masivo
+BULK_CHECK_IN_MAX = 1000
+
+# Bytes del bitset anual de un hábito (366 días)
+BITMAP_BYTES = 46
+
+
+def _as_date(value):
+    """Normaliza el resultado de Trunc* (date o datetime según el backend)"""
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def _conflict_target(*fields):
+    """
+    unique_fields para bulk_create(update_conflicts=True): MySQL no admite
+    indicarlos (ON DUPLICATE KEY usa cualquier clave única) y Django lanza
+    NotSupportedError si se pasan
+    """
+    if connection.features.supports_update_conflicts_with_target:
+        return list(fields)
+    return None
 
 
 class StatsService:
@@ -24,131 +67,519 @@ class StatsService:
     @staticmethod
     def update_user_stats(user):
         """Updates user statistics"""
-        stats = StatsService.get_user_stats(user)
+        StatsService.recompute_user_stats([user.pk])
+        return StatsService.get_user_stats(user)
+    
+    @staticmethod
+    def recompute_user_stats(user_ids, today=None, batch_size=500):
+        """
+        Recomputes totals, calorie sums and streaks for many users at once.
         
-        # Calculate totals
-        stats.total_workouts = Workout.objects.filter(user=user).count()
-        stats.total_habits_completed = HabitProgress.objects.filter(
-            habit__user=user, completed=True
-        ).count()
+        Each metric is one query grouped by user over the whole id list,
+        and the results are written back with bulk_update, so the cost does
+        not grow with the number of users. Returns the number of rows written.
+        """
+        user_ids = list(user_ids)
+        if not user_ids:
+            return 0
         
-        # Calculate current streak
-        stats.current_streak = StatsService.calculate_current_streak(user)
+        if today is None:
+            today = date.today()
         
-        stats.save()
-        return stats
+        existing = set(
+            UserStats.objects.filter(user_id__in=user_ids)
+            .values_list('user_id', flat=True)
+        )
+        UserStats.objects.bulk_create(
+            [UserStats(user_id=user_id) for user_id in user_ids
+             if user_id not in existing],
+            batch_size=batch_size,
+            ignore_conflicts=True,
+        )
+        
+        workouts = {
+            row['user_id']: row
+            for row in Workout.objects.filter(user_id__in=user_ids)
+            .order_by()
+            .values('user_id')
+            .annotate(count=Count('id'), calories=Sum('calories'))
+        }
+        habits_completed = dict(
+            HabitProgress.objects.filter(
+                user_id__in=user_ids, completed=True
+            )
+            .order_by()
+            .values('user_id')
+            .annotate(count=Count('id'))
+            .values_list('user_id', 'count')
+        )
+        calories_consumed = dict(
+            Nutrition.objects.filter(user_id__in=user_ids)
+            .order_by()
+            .values('user_id')
+            .annotate(calories=Sum('calories'))
+            .values_list('user_id', 'calories')
+        )
+        completed_days = (
+            HabitProgress.objects.filter(
+                user_id__in=user_ids, completed=True, date__lte=today
+            )
+            .order_by('user_id', 'date')
+            .values_list('user_id', 'date')
+            .distinct()
+        )
+        streaks = {
+            user_id: StatsService.compute_streak_state(
+                day for _, day in rows
+            )
+            for user_id, rows in groupby(completed_days, key=itemgetter(0))
+        }
+        
+        stats_rows = list(UserStats.objects.filter(user_id__in=user_ids))
+        for stats in stats_rows:
+            workout_row = workouts.get(stats.user_id, {})
+            stats.total_workouts = workout_row.get('count', 0)
+            stats.total_calories_burned = float(workout_row.get('calories') or 0)
+            stats.total_habits_completed = habits_completed.get(stats.user_id, 0)
+            stats.total_calories_consumed = float(
+                calories_consumed.get(stats.user_id) or 0
+            )
+            (
+                stats.current_streak,
+                stats.longest_streak,
+                stats.last_activity_date,
+            ) = streaks.get(stats.user_id, (0, 0, None))
+            stats.updated_at = timezone.now()
+        
+        UserStats.objects.bulk_update(
+            stats_rows,
+            [
+                'total_workouts', 'total_habits_completed',
+                'total_calories_consumed', 'total_calories_burned',
+                'current_streak', 'longest_streak', 'last_activity_date',
+                'updated_at',
+            ],
+            batch_size=batch_size,
+        )
+        stats_cache.invalidate(*user_ids)
+        return len(stats_rows)
     
     @staticmethod
     def calculate_current_streak(user):
         """Calculates current streak of completed habits"""
-        today = date.today()
-        streak = 0
-        
-        # Check consecutive days backwards
-        for i in range(30):  # Maximum 30 days backwards
-            check_date = today - timedelta(days=i)
-            completed_today = HabitProgress.objects.filter(
-                habit__user=user,
-                date=check_date,
-                completed=True
-            ).exists()
-            
-            if completed_today:
-                streak += 1
-            else:
-                break
+        current_streak, _ = StatsService.calculate_streaks(user)
+        return current_streak
+    
+    @staticmethod
+    def get_completed_dates(user, today=None):
+        """Distinct dates with at least one completed habit, ascending"""
+        if today is None:
+            today = date.today()
         
-        return streak
+        return (
+            HabitProgress.objects.filter(
+                user=user, completed=True, date__lte=today
+            )
+            .order_by('date')
+            .values_list('date', flat=True)
+            .distinct()
+        )
     
     @staticmethod
-    def get_weekly_progress(user, weeks_back=4):
-        """Obtiene progreso semanal de los últimos N semanas"""
-        today = date.today()
-        weekly_data = []
+    def calculate_streaks(user, today=None):
+        """
+        Calculates current and longest streak of completed habits.
         
-        for week in range(weeks_back):
-            week_start = today - timedelta(weeks=week, days=today.weekday())
-            week_end = week_start + timedelta(days=6)
-            
-            # Hábitos completados en la semana
-            habits_completed = HabitProgress.objects.filter(
-                habit__user=user,
-                date__range=[week_start, week_end],
-                completed=True
-            ).count()
-            
-            # Entrenamientos en la semana
-            workouts_count = Workout.objects.filter(
-                user=user,
-                date__range=[week_start, week_end]
-            ).count()
-            
-            # Calorías quemadas en la semana
-            calories_burned = Workout.objects.filter(
-                user=user,
-                date__range=[week_start, week_end]
-            ).aggregate(total=Sum('calories'))['total'] or 0
-            
-            weekly_data.append({
-                'week': week_start.strftime('%Y-%m-%d'),
-                'habits_completed': habits_completed,
-                'workouts_count': workouts_count,
-                'calories_burned': calories_burned,
-            })
+        Fetches the distinct completed dates in a single ordered query and
+        walks them once, so there is no upper bound on streak length.
+        """
+        if today is None:
+            today = date.today()
         
-        return list(reversed(weekly_data))
+        completed_dates = StatsService.get_completed_dates(user, today)
+        return StatsService.compute_streaks(completed_dates, today)
     
     @staticmethod
-    def get_monthly_progress(user, months_back=6):
-        """Obtiene progreso mensual de los últimos N meses"""
-        today = date.today()
-        monthly_data = []
+    def compute_streaks(completed_dates, today=None):
+        """
+        Computes (current_streak, longest_streak) from ascending distinct dates.
+        
+        The current streak is the run of consecutive days ending today.
+        """
+        if today is None:
+            today = date.today()
         
-        for month in range(months_back):
-            # Calcular primer día del mes
-            if today.month - month <= 0:
-                year = today.year - 1
-                month_num = 12 + (today.month - month)
+        run, longest_streak, last_date = StatsService.compute_streak_state(
+            completed_dates
+        )
+        current_streak = run if last_date == today else 0
+        return current_streak, longest_streak
+    
+    @staticmethod
+    def compute_streak_state(completed_dates):
+        """
+        Computes (trailing_run, longest_streak, last_date) from ascending
+        distinct dates. This is the state persisted in UserStats.
+        """
+        one_day = timedelta(days=1)
+        longest_streak = 0
+        run = 0
+        previous = None
+        
+        for day in completed_dates:
+            if previous is not None and day - previous == one_day:
+                run += 1
             else:
-                year = today.year
-                month_num = today.month - month
-            
-            month_start = date(year, month_num, 1)
+                run = 1
+            longest_streak = max(longest_streak, run)
+            previous = day
+        
+        return run, longest_streak, previous
+    
+    @staticmethod
+    def refresh_streaks(stats, today=None):
+        """Recomputes the streak fields of a UserStats from full history"""
+        completed_dates = StatsService.get_completed_dates(stats.user_id, today)
+        (
+            stats.current_streak,
+            stats.longest_streak,
+            stats.last_activity_date,
+        ) = StatsService.compute_streak_state(completed_dates)
+        return stats
+    
+    @staticmethod
+    def record_progress_change(progress, was_completed, completed=None):
+        """
+        Aplica un cambio de progreso a las estadísticas en la petición o,
+        con STATS_DEFERRED, lo deja en la cola del worker. completed es el
+        estado nuevo (por defecto progress.completed; False al borrar)
+        """
+        if completed is None:
+            completed = progress.completed
+        if was_completed == completed:
+            return
+        if settings.STATS_DEFERRED:
+            StatsJobService.enqueue(progress.user_id)
+        else:
+            StatsService.apply_progress_change(progress, was_completed, completed)
+    
+    @staticmethod
+    def schedule_recompute(user_ids):
+        """
+        Recalcula las estadísticas de los usuarios ahora o, con
+        STATS_DEFERRED, encola el recálculo e invalida la caché ya
+        """
+        if settings.STATS_DEFERRED:
+            StatsJobService.enqueue(*user_ids)
+            stats_cache.invalidate(*user_ids)
+        else:
+            StatsService.recompute_user_stats(user_ids)
+    
+    @staticmethod
+    def apply_progress_change(progress, was_completed, completed=None, today=None):
+        """
+        Incrementally updates totals and streaks after a HabitProgress write.
+        
+        Only the touched date is inspected: a newly active day after the
+        current run extends it or starts a new one, and a newly inactive day
+        inside the current run splits it. Any other case (back-filled dates,
+        a change that may shrink longest_streak) falls back to
+        refresh_streaks.
+        
+        Whether the day was already active is read from the locked stats
+        row, not from other HabitProgress rows, so concurrent completions
+        of different habits on the same day are applied one after another.
+        """
+        if completed is None:
+            completed = progress.completed
+        if was_completed == completed:
+            return None
+        
+        if today is None:
+            today = date.today()
+        
+        day = progress.date
+        
+        with transaction.atomic():
+            stats, created = (
+                UserStats.objects.select_for_update()
+                .get_or_create(user_id=progress.user_id)
+            )
             
-            # Calcular último día del mes
-            if month_num == 12:
-                next_month = date(year + 1, 1, 1)
+            if completed:
+                stats.total_habits_completed += 1
+                if not StatsService._in_current_run(stats, day):
+                    StatsService._extend_streaks(stats, day, today)
             else:
-                next_month = date(year, month_num + 1, 1)
-            month_end = next_month - timedelta(days=1)
-            
-            # Hábitos completados en el mes
-            habits_completed = HabitProgress.objects.filter(
-                habit__user=user,
-                date__range=[month_start, month_end],
-                completed=True
-            ).count()
-            
-            # Entrenamientos en el mes
-            workouts_count = Workout.objects.filter(
-                user=user,
-                date__range=[month_start, month_end]
-            ).count()
+                stats.total_habits_completed = max(
+                    stats.total_habits_completed - 1, 0
+                )
+                # Other completed habits on the same day keep it active
+                day_has_other_completions = HabitProgress.objects.filter(
+                    user_id=progress.user_id, date=day, completed=True
+                ).exclude(pk=progress.pk).exists()
+                if not day_has_other_completions:
+                    StatsService._split_streaks(stats, day, today)
             
-            # Calorías quemadas en el mes
-            calories_burned = Workout.objects.filter(
-                user=user,
-                date__range=[month_start, month_end]
-            ).aggregate(total=Sum('calories'))['total'] or 0
-            
-            monthly_data.append({
-                'month': month_start.strftime('%Y-%m'),
-                'habits_completed': habits_completed,
-                'workouts_count': workouts_count,
-                'calories_burned': calories_burned,
-            })
+            stats.save()
+        
+        return stats
+    
+    @staticmethod
+    def _in_current_run(stats, day):
+        """Whether the persisted current run already covers day"""
+        last_date = stats.last_activity_date
+        return (
+            last_date is not None
+            and last_date - timedelta(days=stats.current_streak) < day <= last_date
+        )
+    
+    @staticmethod
+    def _extend_streaks(stats, day, today):
+        """Applies a newly active day to the persisted streak state"""
+        last_date = stats.last_activity_date
+        
+        if day > today or (last_date is not None and day <= last_date):
+            StatsService.refresh_streaks(stats, today)
+            return
+        
+        if last_date is not None and day - last_date == timedelta(days=1):
+            stats.current_streak += 1
+        else:
+            stats.current_streak = 1
+        stats.longest_streak = max(stats.longest_streak, stats.current_streak)
+        stats.last_activity_date = day
+    
+    @staticmethod
+    def _split_streaks(stats, day, today):
+        """Applies a newly inactive day to the persisted streak state"""
+        last_date = stats.last_activity_date
+        
+        in_current_run = StatsService._in_current_run(stats, day)
+        # The longest run may be the one being split, and the previous
+        # active day is unknown once the run is emptied
+        if (
+            day > today
+            or not in_current_run
+            or stats.longest_streak <= stats.current_streak
+            or stats.current_streak <= 1
+        ):
+            StatsService.refresh_streaks(stats, today)
+            return
+        
+        if day == last_date:
+            stats.current_streak -= 1
+            stats.last_activity_date = day - timedelta(days=1)
+        else:
+            stats.current_streak = (last_date - day).days
+    
+    @staticmethod
+    def get_stats_summary(user, today=None):
+        """
+        Resumen de estadísticas: totales y progreso de la semana y el mes.
         
-        return list(reversed(monthly_data))
+        La semana y el mes se agregan juntos con una consulta condicional
+        por tabla sobre la unión de ambos rangos.
+        """
+        if today is None:
+            today = date.today()
+        
+        # Obtener estadísticas generales
+        user_stats = StatsService.get_user_stats(user)
+        
+        week_start = today - timedelta(days=today.weekday())
+        week_end = week_start + timedelta(days=6)
+        month_start = today.replace(day=1)
+        next_month = month_start.replace(day=28) + timedelta(days=4)
+        month_end = next_month - timedelta(days=next_month.day)
+        periods = {
+            "weekly": (week_start, week_end),
+            "monthly": (month_start, month_end),
+        }
+        
+        workouts = StatsService.aggregate_by_period(
+            WorkoutStats.objects.filter(user=user),
+            periods,
+            total_duration=(Sum, "total_duration", None),
+            total_calories=(Sum, "total_calories_burned", None),
+            workout_count=(Sum, "workout_count", None),
+        )
+        nutrition = StatsService.aggregate_by_period(
+            NutritionStats.objects.filter(user=user),
+            periods,
+            total_calories=(Sum, "total_calories", None),
+            total_protein=(Sum, "total_protein", None),
+            total_carbs=(Sum, "total_carbs", None),
+            total_fat=(Sum, "total_fat", None),
+        )
+        habits = StatsService.aggregate_by_period(
+            HabitProgress.objects.filter(user=user),
+            periods,
+            completed_count=(Count, "id", Q(completed=True)),
+            total_count=(Count, "id", None),
+        )
+        
+        return {
+            "total_workouts": user_stats.total_workouts,
+            "total_habits_completed": user_stats.total_habits_completed,
+            "total_calories_consumed": user_stats.total_calories_consumed,
+            "total_calories_burned": user_stats.total_calories_burned,
+            "current_streak": user_stats.active_streak,
+            "longest_streak": user_stats.longest_streak,
+            "weekly_progress": {
+                "workouts": workouts["weekly"],
+                "nutrition": nutrition["weekly"],
+                "habits": habits["weekly"],
+            },
+            "monthly_progress": {
+                "workouts": workouts["monthly"],
+                "nutrition": nutrition["monthly"],
+                "habits": habits["monthly"],
+            },
+        }
+    
+    @staticmethod
+    def aggregate_by_period(queryset, periods, **aggregates):
+        """
+        Agrega varios periodos de fechas en una sola consulta.
+        
+        periods es {nombre: (inicio, fin)} y cada agregado es
+        (función, campo, condición extra o None). La consulta recorre la
+        unión de los rangos y filtra cada periodo con aggregate(filter=...).
+        Devuelve {periodo: {agregado: valor}}.
+        """
+        range_start = min(start for start, _ in periods.values())
+        range_end = max(end for _, end in periods.values())
+        
+        expressions = {}
+        for period, (start, end) in periods.items():
+            for name, (function, field, condition) in aggregates.items():
+                period_filter = Q(date__range=[start, end])
+                if condition is not None:
+                    period_filter &= condition
+                expressions[f"{period}_{name}"] = function(
+                    field, filter=period_filter
+                )
+        
+        result = queryset.filter(
+            date__range=[range_start, range_end]
+        ).aggregate(**expressions)
+        
+        return {
+            period: {name: result[f"{period}_{name}"] for name in aggregates}
+            for period in periods
+        }
+    
+    @staticmethod
+    def get_weekly_progress(user, weeks_back=4, today=None):
+        """Obtiene progreso semanal de los últimos N semanas"""
+        return [
+            {
+                'week': bucket['start'].strftime('%Y-%m-%d'),
+                'habits_completed': bucket['habits_completed'],
+                'workouts_count': bucket['workouts_count'],
+                'calories_burned': bucket['calories_burned'],
+            }
+            for bucket in StatsService.get_progress_series(
+                user, 'week', weeks_back, today
+            )
+        ]
+    
+    @staticmethod
+    def get_monthly_progress(user, months_back=6, today=None):
+        """Obtiene progreso mensual de los últimos N meses"""
+        return [
+            {
+                'month': bucket['start'].strftime('%Y-%m'),
+                'habits_completed': bucket['habits_completed'],
+                'workouts_count': bucket['workouts_count'],
+                'calories_burned': bucket['calories_burned'],
+            }
+            for bucket in StatsService.get_progress_series(
+                user, 'month', months_back, today
+            )
+        ]
+    
+    @staticmethod
+    def get_bucket_starts(period, periods, today=None):
+        """
+        Fechas de inicio (ascendentes) de los últimos N periodos y el último
+        día del periodo actual. Las semanas empiezan en lunes.
+        """
+        if today is None:
+            today = date.today()
+        
+        if period == 'week':
+            current_start = today - timedelta(days=today.weekday())
+            starts = [
+                current_start - timedelta(weeks=offset)
+                for offset in range(periods - 1, -1, -1)
+            ]
+            return starts, current_start + timedelta(days=6)
+        
+        if period == 'month':
+            starts = []
+            for offset in range(periods - 1, -1, -1):
+                month_index = today.year * 12 + today.month - 1 - offset
+                starts.append(date(month_index // 12, month_index % 12 + 1, 1))
+            next_month = (today.replace(day=28) + timedelta(days=4)).replace(day=1)
+            return starts, next_month - timedelta(days=1)
+        
+        raise ValueError(f"Unsupported period: {period}")
+    
+    @staticmethod
+    def get_progress_series(user, period='week', periods=4, today=None):
+        """
+        Serie temporal por periodos (semana o mes) de hábitos completados,
+        entrenamientos y calorías quemadas.
+        
+        Agrupa con TruncWeek/TruncMonth en una consulta por tabla y rellena
+        con ceros los periodos sin datos.
+        """
+        if periods <= 0:
+            return []
+        
+        trunc = {'week': TruncWeek, 'month': TruncMonth}.get(period)
+        if trunc is None:
+            raise ValueError(f"Unsupported period: {period}")
+        
+        starts, range_end = StatsService.get_bucket_starts(period, periods, today)
+        date_range = [starts[0], range_end]
+        
+        habit_rows = (
+            HabitProgress.objects.filter(user=user, date__range=date_range)
+            .annotate(bucket=trunc('date'))
+            .order_by()
+            .values('bucket')
+            .annotate(habits_completed=Count('id', filter=Q(completed=True)))
+        )
+        workout_rows = (
+            Workout.objects.filter(user=user, date__range=date_range)
+            .annotate(bucket=trunc('date'))
+            .order_by()
+            .values('bucket')
+            .annotate(workouts_count=Count('id'), calories_burned=Sum('calories'))
+        )
+        
+        buckets = {
+            start: {
+                'start': start,
+                'habits_completed': 0,
+                'workouts_count': 0,
+                'calories_burned': 0,
+            }
+            for start in starts
+        }
+        for row in habit_rows:
+            buckets[_as_date(row['bucket'])]['habits_completed'] = (
+                row['habits_completed']
+            )
+        for row in workout_rows:
+            bucket = buckets[_as_date(row['bucket'])]
+            bucket['workouts_count'] = row['workouts_count']
+            bucket['calories_burned'] = row['calories_burned'] or 0
+        
+        return [buckets[start] for start in starts]
 
 
 class HabitProgressService:
@@ -163,24 +594,84 @@ class HabitProgressService:
         if actual_value is None:
             actual_value = habit.target_value
         
-        progress, created = HabitProgress.objects.get_or_create(
-            habit=habit,
-            date=date_completed,
-            defaults={
-                'actual_value': actual_value,
-                'completed': True,
-            }
+        with transaction.atomic():
+            # Un UPDATE condicional dice si la fila existía sin completar;
+            # el upsert la crea si no existía (y bloquea la fila en ambos
+            # casos hasta aplicar el cambio a las estadísticas)
+            reopened = HabitProgress.objects.filter(
+                habit=habit, date=date_completed, completed=False
+            ).update(completed=True, value=actual_value)
+            progress, created = HabitProgress.objects.upsert(
+                habit, date_completed, completed=True, value=actual_value
+            )
+            
+            # Actualizar estadísticas del usuario a partir del cambio
+            stats_cache.invalidate(habit.user_id)
+            StatsService.record_progress_change(
+                progress, was_completed=not (reopened or created)
+            )
+        HeatmapService.record_progress(progress, habit)
+        
+        return progress
+    
+    @staticmethod
+    def bulk_check_in(user, check_ins):
+        """
+        Registra muchos progresos de hábitos del usuario de una vez.
+        
+        check_ins son dicts con habit_id, date, value (None usa el objetivo
+        del hábito al completar) y completed. La propiedad de los hábitos se
+        valida con una consulta, los progresos se insertan o actualizan con
+        un único bulk_create y las estadísticas se recalculan una sola vez.
+        Si se repite (habit_id, date) gana el último registro.
+        Lanza Habit.DoesNotExist si algún hábito no es del usuario.
+        """
+        # Deduplicar: un upsert no puede tocar la misma fila dos veces
+        latest = {
+            (check_in['habit_id'], check_in['date']): check_in
+            for check_in in check_ins
+        }
+        
+        habit_ids = {habit_id for habit_id, _ in latest}
+        targets = dict(
+            Habit.objects.filter(user=user, pk__in=habit_ids)
+            .values_list('pk', 'target_value')
         )
+        missing = habit_ids - targets.keys()
+        if missing:
+            raise Habit.DoesNotExist(
+                f"Habits not found: {', '.join(map(str, sorted(missing)))}"
+            )
         
-        if not created:
-            progress.actual_value = actual_value
-            progress.completed = True
-            progress.save()
+        progresses = []
+        for (habit_id, day), check_in in latest.items():
+            completed = check_in.get('completed', True)
+            value = check_in.get('value')
+            if value is None:
+                value = targets[habit_id] if completed else 0.0
+            # bulk_create no llama a save(): el usuario se asigna aquí
+            progresses.append(HabitProgress(
+                habit_id=habit_id,
+                user=user,
+                date=day,
+                completed=completed,
+                value=value,
+            ))
         
-        # Actualizar estadísticas del usuario
-        StatsService.update_user_stats(habit.user)
+        with transaction.atomic():
+            HabitProgress.objects.bulk_create(
+                progresses,
+                update_conflicts=True,
+                unique_fields=_conflict_target('habit', 'date'),
+                update_fields=['completed', 'value'],
+            )
+            # bulk_create no envía señales; esto también invalida la caché
+            StatsService.schedule_recompute([user.pk])
+            HeatmapService.rebuild(
+                habit_ids, years={day.year for _, day in latest}
+            )
         
-        return progress
+        return len(progresses)
     
     @staticmethod
     def mark_habit_incomplete(habit, date_incomplete=None):
@@ -194,10 +685,8 @@ class HabitProgressService:
                 date=date_incomplete
             )
             progress.completed = False
-            progress.save()
-            
-            # Actualizar estadísticas del usuario
-            StatsService.update_user_stats(habit.user)
+            # Las señales de HabitProgress actualizan las estadísticas
+            progress.save(update_fields=['completed'])
             
             return progress
         except HabitProgress.DoesNotExist:
@@ -205,25 +694,80 @@ class HabitProgressService:
     
     @staticmethod
     def get_habit_completion_rate(habit, days_back=30):
-        """Calcula la tasa de completación de un hábito"""
+        """
+        Calcula la tasa de completación de un hábito por periodos de su
+        tipo (días, semanas o meses) con su calendario cacheado
+        """
         today = date.today()
         start_date = today - timedelta(days=days_back)
         
-        total_days = HabitProgress.objects.filter(
-            habit=habit,
-            date__range=[start_date, today]
-        ).count()
-        
-        completed_days = HabitProgress.objects.filter(
-            habit=habit,
-            date__range=[start_date, today],
-            completed=True
-        ).count()
-        
+        met, recorded = get_habit_calendar(habit, today).counts(start_date, today)
+        return HabitProgressService.completion_rate(met, recorded)
+    
+    @staticmethod
+    def get_habit_streaks(habit, today=None):
+        """Rachas actual y más larga del hábito en periodos de su tipo"""
+        calendar = get_habit_calendar(habit, today)
+        current_streak, longest_streak = calendar.streaks(today)
+        return {
+            'period': calendar.period,
+            'current_streak': current_streak,
+            'longest_streak': longest_streak,
+        }
+    
+    @staticmethod
+    def completion_rate(completed_days, total_days):
+        """Porcentaje de periodos completados sobre periodos registrados"""
         if total_days == 0:
             return 0.0
         
         return (completed_days / total_days) * 100
+    
+    @staticmethod
+    def get_habit_history(habit, days=HISTORY_DEFAULT_DAYS, today=None):
+        """
+        Historial denso de los últimos N días (hasta hoy incluido) y tasa de
+        completación, ambos a partir de una sola consulta.
+        """
+        if not 1 <= days <= HISTORY_MAX_DAYS:
+            raise ValueError(
+                f"days must be between 1 and {HISTORY_MAX_DAYS}"
+            )
+        
+        if today is None:
+            today = date.today()
+        start_date = today - timedelta(days=days - 1)
+        
+        rows = {
+            row['date']: row
+            for row in HabitProgress.objects.filter(
+                habit=habit, date__range=[start_date, today]
+            ).values('date', 'completed', 'value')
+        }
+        
+        progress_data = []
+        for offset in range(days):
+            check_date = start_date + timedelta(days=offset)
+            row = rows.get(check_date)
+            progress_data.append({
+                'date': check_date.isoformat(),
+                'completed': row['completed'] if row else False,
+                'actual_value': row['value'] if row else 0,
+            })
+        
+        # La tasa se mide en periodos del tipo del hábito
+        calendar = HabitCalendar.from_rows(
+            habit.kind,
+            habit.target_value,
+            ((row['date'], row['completed'], row['value']) for row in rows.values()),
+        )
+        
+        return {
+            'completion_rate': HabitProgressService.completion_rate(
+                *calendar.counts(start_date, today)
+            ),
+            'progress_data': progress_data,
+        }
 
 
 class NutritionStatsService:
@@ -234,58 +778,531 @@ class NutritionStatsService:
         """Obtiene resumen nutricional diario"""
         if target_date is None:
             target_date = date.today()
-        
-        nutrition_entries = Nutrition.objects.filter(
+
+        return NutritionStatsService.get_nutrition_summaries(
+            user, target_date, target_date
+        )[0]
+
+    @staticmethod
+    def get_nutrition_summaries(user, start_date, end_date):
+        """
+        Resumen nutricional de cada día del rango (incluidos los días sin
+        entradas) con una sola consulta. Los macros se suman con Decimal y
+        solo se convierten a float en la respuesta. Lanza ValueError si el
+        rango está invertido o supera HISTORY_MAX_DAYS.
+        """
+        days = (end_date - start_date).days + 1
+        if not 1 <= days <= HISTORY_MAX_DAYS:
+            raise ValueError(
+                f"range must span between 1 and {HISTORY_MAX_DAYS} days"
+            )
+
+        entries_by_day = {}
+        for entry in Nutrition.objects.filter(
             user=user,
-            date=target_date
+            date__range=[start_date, end_date]
+        ).values('id', 'date', 'name', 'calories', 'protein_g', 'carbs_g', 'fat_g'):
+            entries_by_day.setdefault(entry['date'], []).append(entry)
+
+        summaries = []
+        for offset in range(days):
+            day = start_date + timedelta(days=offset)
+            entries = entries_by_day.get(day, [])
+            summaries.append({
+                'date': day.isoformat(),
+                'total_calories': sum(entry['calories'] for entry in entries),
+                'total_protein_g': float(sum(
+                    (entry['protein_g'] for entry in entries), Decimal(0)
+                )),
+                'total_carbs_g': float(sum(
+                    (entry['carbs_g'] for entry in entries), Decimal(0)
+                )),
+                'total_fat_g': float(sum(
+                    (entry['fat_g'] for entry in entries), Decimal(0)
+                )),
+                'entry_count': len(entries),
+                'entries': [
+                    {
+                        'id': entry['id'],
+                        'name': entry['name'],
+                        'calories': entry['calories'],
+                    }
+                    for entry in entries
+                ],
+            })
+        return summaries
+    
+    @staticmethod
+    def get_weekly_nutrition_average(user, weeks_back=4, today=None):
+        """
+        Promedio nutricional semanal por día registrado: primero se suma
+        cada día y luego se promedian los días con entradas de la semana,
+        así muchas entradas pequeñas no bajan el promedio. Una sola
+        consulta agrupada con TruncWeek para cualquier weeks_back (hasta
+        NUTRITION_MAX_WEEKS); lanza ValueError por encima.
+        """
+        if weeks_back <= 0:
+            return []
+        if weeks_back > NUTRITION_MAX_WEEKS:
+            raise ValueError(f"weeks_back must be at most {NUTRITION_MAX_WEEKS}")
+        
+        starts, range_end = StatsService.get_bucket_starts('week', weeks_back, today)
+        
+        # Suma de la semana / días distintos = media de los totales diarios
+        rows = (
+            Nutrition.objects.filter(user=user, date__range=[starts[0], range_end])
+            .annotate(week=TruncWeek('date'))
+            .order_by()
+            .values('week')
+            .annotate(
+                total_calories=Sum('calories'),
+                total_protein=Sum('protein_g'),
+                total_carbs=Sum('carbs_g'),
+                total_fat=Sum('fat_g'),
+                total_entries=Count('id'),
+                logged_days=Count('date', distinct=True),
+            )
         )
+        weeks = {_as_date(row['week']): row for row in rows}
+        
+        weekly_averages = []
+        for week_start in starts:
+            row = weeks.get(week_start)
+            logged_days = row['logged_days'] if row else 0
+            
+            def average(field):
+                if not logged_days:
+                    return 0.0
+                return round(float(Decimal(row[field] or 0) / logged_days), 1)
+            
+            weekly_averages.append({
+                'week': week_start.strftime('%Y-%m-%d'),
+                'avg_calories': average('total_calories'),
+                'avg_protein_g': average('total_protein'),
+                'avg_carbs_g': average('total_carbs'),
+                'avg_fat_g': average('total_fat'),
+                'total_entries': row['total_entries'] if row else 0,
+                'logged_days': logged_days,
+            })
+        
+        return weekly_averages
+
+
+class RollupService:
+    """
+    Mantiene las tablas diarias WorkoutStats y NutritionStats a partir de
+    las escrituras en Workout y Nutrition.
+    
+    Cada cambio se aplica como un delta sobre la fila (usuario, fecha)
+    con expresiones F, de modo que escrituras concurrentes no se pisan.
+    Las escrituras masivas (update(), bulk_create) no disparan señales:
+    las entradas nutricionales creadas en bloque se suman con
+    add_nutrition_entries y el comando rebuild_rollups reconstruye las
+    tablas desde cero.
+    """
+    
+    # Campo de la fuente -> campo de la tabla diaria
+    WORKOUT_FIELDS = {
+        'duration_min': 'total_duration',
+        'calories': 'total_calories_burned',
+    }
+    NUTRITION_FIELDS = {
+        'calories': 'total_calories',
+        'protein_g': 'total_protein',
+        'carbs_g': 'total_carbs',
+        'fat_g': 'total_fat',
+    }
+    
+    @staticmethod
+    def workout_snapshot(workout):
+        """Valores de un entrenamiento que alimentan WorkoutStats"""
+        return {
+            'user_id': workout.user_id,
+            'date': workout.date,
+            'duration_min': workout.duration_min,
+            'calories': workout.calories,
+        }
+    
+    @staticmethod
+    def nutrition_snapshot(entry):
+        """Valores de una entrada nutricional que alimentan NutritionStats"""
+        return {
+            'user_id': entry.user_id,
+            'date': entry.date,
+            'calories': entry.calories,
+            'protein_g': entry.protein_g,
+            'carbs_g': entry.carbs_g,
+            'fat_g': entry.fat_g,
+        }
+    
+    @staticmethod
+    def apply_workout_change(previous, current):
+        """Aplica el cambio de un entrenamiento (None = no existía / borrado)"""
+        RollupService._apply_change(
+            WorkoutStats, 'workout_count', RollupService.WORKOUT_FIELDS,
+            previous, current,
+        )
+    
+    @staticmethod
+    def apply_nutrition_change(previous, current):
+        """Aplica el cambio de una entrada nutricional"""
+        RollupService._apply_change(
+            NutritionStats, 'meal_count', RollupService.NUTRITION_FIELDS,
+            previous, current,
+        )
+    
+    @staticmethod
+    def add_nutrition_entries(entries):
+        """
+        Suma a NutritionStats entradas nutricionales creadas con
+        bulk_create, con un solo delta por (usuario, fecha)
+        """
+        days = {}
+        for entry in entries:
+            snapshot = RollupService.nutrition_snapshot(entry)
+            key = (snapshot['user_id'], snapshot['date'])
+            if key not in days:
+                days[key] = ({**snapshot}, 1)
+                continue
+            total, count = days[key]
+            for field in RollupService.NUTRITION_FIELDS:
+                total[field] = (total[field] or 0) + (snapshot[field] or 0)
+            days[key] = (total, count + 1)
         
-        summary = nutrition_entries.aggregate(
-            total_calories=Sum('calories'),
-            total_protein=Sum('protein_g'),
-            total_carbs=Sum('carbs_g'),
-            total_fat=Sum('fat_g'),
-            entry_count=Count('id')
+        with transaction.atomic():
+            for total, count in days.values():
+                RollupService._apply_delta(
+                    NutritionStats, 'meal_count', RollupService.NUTRITION_FIELDS,
+                    total, sign=1, count=count,
+                )
+    
+    @staticmethod
+    def _apply_change(model, count_field, fields, previous, current):
+        if previous == current:
+            return
+        
+        with transaction.atomic():
+            if previous is not None:
+                RollupService._apply_delta(
+                    model, count_field, fields, previous, sign=-1
+                )
+            if current is not None:
+                RollupService._apply_delta(
+                    model, count_field, fields, current, sign=1
+                )
+    
+    @staticmethod
+    def _apply_delta(model, count_field, fields, snapshot, sign, count=1):
+        """
+        Upsert de la fila (usuario, fecha) sumando el delta con F(); count
+        es el número de registros que suma el snapshot
+        """
+        updates = {count_field: F(count_field) + sign * count}
+        for source_field, rollup_field in fields.items():
+            value = float(snapshot[source_field] or 0)
+            updates[rollup_field] = F(rollup_field) + sign * value
+        
+        rows = model.objects.filter(
+            user_id=snapshot['user_id'], date=snapshot['date']
         )
         
+        if sign > 0:
+            model.objects.get_or_create(
+                user_id=snapshot['user_id'], date=snapshot['date']
+            )
+            rows.update(**updates)
+            return
+        
+        # Un borrado nunca crea filas (p. ej. en cascada al borrar el
+        # usuario) y un día sin entradas no deja una fila a cero
+        if rows.update(**updates):
+            rows.filter(**{f'{count_field}__lte': 0}).delete()
+    
+    @staticmethod
+    def rebuild(users=None, batch_size=1000):
+        """
+        Reconstruye WorkoutStats y NutritionStats desde las tablas fuente.
+        
+        users limita la reconstrucción a esos usuarios; devuelve el número
+        de filas diarias creadas por tabla.
+        """
+        workouts = Workout.objects.all()
+        nutrition = Nutrition.objects.all()
+        workout_stats = WorkoutStats.objects.all()
+        nutrition_stats = NutritionStats.objects.all()
+        if users is not None:
+            workouts = workouts.filter(user__in=users)
+            nutrition = nutrition.filter(user__in=users)
+            workout_stats = workout_stats.filter(user__in=users)
+            nutrition_stats = nutrition_stats.filter(user__in=users)
+        
+        workout_rows = [
+            WorkoutStats(
+                user_id=row['user_id'],
+                date=row['date'],
+                total_duration=row['total_duration'] or 0,
+                total_calories_burned=float(row['total_calories_burned'] or 0),
+                workout_count=row['workout_count'],
+            )
+            for row in workouts.order_by().values('user_id', 'date').annotate(
+                total_duration=Sum('duration_min'),
+                total_calories_burned=Sum('calories'),
+                workout_count=Count('id'),
+            )
+        ]
+        nutrition_rows = [
+            NutritionStats(
+                user_id=row['user_id'],
+                date=row['date'],
+                total_calories=float(row['total_calories'] or 0),
+                total_protein=float(row['total_protein'] or 0),
+                total_carbs=float(row['total_carbs'] or 0),
+                total_fat=float(row['total_fat'] or 0),
+                meal_count=row['meal_count'],
+            )
+            for row in nutrition.order_by().values('user_id', 'date').annotate(
+                total_calories=Sum('calories'),
+                total_protein=Sum('protein_g'),
+                total_carbs=Sum('carbs_g'),
+                total_fat=Sum('fat_g'),
+                meal_count=Count('id'),
+            )
+        ]
+        
+        affected_users = {row.user_id for row in workout_rows + nutrition_rows}
+        affected_users.update(workout_stats.values_list('user_id', flat=True))
+        affected_users.update(nutrition_stats.values_list('user_id', flat=True))
+        
+        with transaction.atomic():
+            workout_stats.delete()
+            nutrition_stats.delete()
+            WorkoutStats.objects.bulk_create(workout_rows, batch_size=batch_size)
+            NutritionStats.objects.bulk_create(nutrition_rows, batch_size=batch_size)
+            stats_cache.invalidate(*affected_users)
+        
         return {
-            'date': target_date.isoformat(),
-            'total_calories': summary['total_calories'] or 0,
-            'total_protein_g': float(summary['total_protein'] or 0),
-            'total_carbs_g': float(summary['total_carbs'] or 0),
-            'total_fat_g': float(summary['total_fat'] or 0),
-            'entry_count': summary['entry_count'],
-            'entries': list(nutrition_entries.values('id', 'name', 'calories'))
+            'workout_stats': len(workout_rows),
+            'nutrition_stats': len(nutrition_rows),
         }
+
+
+class StatsJobService:
+    """
+    Cola en base de datos para recalcular estadísticas fuera de la petición.
+    
+    El worker (run_stats_worker) reclama trabajos con una concesión: si
+    muere, la concesión vence y otro worker los vuelve a tomar.
+    """
     
     @staticmethod
-    def get_weekly_nutrition_average(user, weeks_back=4):
-        """Obtiene promedio nutricional semanal"""
-        today = date.today()
-        weekly_averages = []
+    def enqueue(*user_ids, delay=None):
+        """
+        Pide el recálculo de los usuarios en una sola consulta.
         
-        for week in range(weeks_back):
-            week_start = today - timedelta(weeks=week, days=today.weekday())
-            week_end = week_start + timedelta(days=6)
-            
-            weekly_stats = Nutrition.objects.filter(
-                user=user,
-                date__range=[week_start, week_end]
-            ).aggregate(
-                avg_calories=Avg('calories'),
-                avg_protein=Avg('protein_g'),
-                avg_carbs=Avg('carbs_g'),
-                avg_fat=Avg('fat_g'),
-                total_entries=Count('id')
+        Si el usuario ya tiene un trabajo solo se actualiza requested_at:
+        las escrituras dentro de la ventana de STATS_JOB_DELAY segundos se
+        agrupan en un recálculo.
+        """
+        if delay is None:
+            delay = settings.STATS_JOB_DELAY
+        
+        now = timezone.now()
+        StatsJob.objects.bulk_create(
+            [
+                StatsJob(
+                    user_id=user_id,
+                    requested_at=now,
+                    available_at=now + timedelta(seconds=delay),
+                )
+                for user_id in set(user_ids)
+                if user_id is not None
+            ],
+            update_conflicts=True,
+            unique_fields=_conflict_target('user'),
+            update_fields=['requested_at'],
+        )
+    
+    @staticmethod
+    def claim(batch_size=100, lease=None):
+        """
+        Reclama hasta batch_size trabajos vencidos y los oculta a otros
+        workers durante STATS_JOB_LEASE segundos. Devuelve tuplas
+        (pk, user_id, requested_at).
+        """
+        if lease is None:
+            lease = settings.STATS_JOB_LEASE
+        
+        now = timezone.now()
+        with transaction.atomic():
+            jobs = list(
+                StatsJob.objects.select_for_update(skip_locked=True)
+                .filter(available_at__lte=now)
+                .order_by('available_at')
+                .values_list('pk', 'user_id', 'requested_at')[:batch_size]
             )
-            
-            weekly_averages.append({
-                'week': week_start.strftime('%Y-%m-%d'),
-                'avg_calories': round(weekly_stats['avg_calories'] or 0, 1),
-                'avg_protein_g': round(float(weekly_stats['avg_protein'] or 0), 1),
-                'avg_carbs_g': round(float(weekly_stats['avg_carbs'] or 0), 1),
-                'avg_fat_g': round(float(weekly_stats['avg_fat'] or 0), 1),
-                'total_entries': weekly_stats['total_entries']
-            })
+            if jobs:
+                StatsJob.objects.filter(pk__in=[pk for pk, _, _ in jobs]).update(
+                    available_at=now + timedelta(seconds=lease),
+                    attempts=F('attempts') + 1,
+                )
+        return jobs
+    
+    @staticmethod
+    def run_pending(batch_size=100, lease=None):
+        """
+        Reclama y recalcula un lote con un único recompute_user_stats.
+        Devuelve el número de usuarios recalculados.
+        """
+        jobs = StatsJobService.claim(batch_size, lease)
+        if not jobs:
+            return 0
+        
+        pks = [pk for pk, _, _ in jobs]
+        try:
+            StatsService.recompute_user_stats([user_id for _, user_id, _ in jobs])
+        except Exception as e:
+            # Se reintenta cuando vence la concesión
+            StatsJob.objects.filter(pk__in=pks).update(last_error=str(e))
+            raise
+        
+        # Solo se borran los trabajos sin escrituras durante el recálculo
+        done = Q()
+        for pk, _, requested_at in jobs:
+            done |= Q(pk=pk, requested_at=requested_at)
+        StatsJob.objects.filter(done).delete()
+        
+        # Los demás vuelven a la cola tras su ventana de agrupación
+        StatsJob.objects.filter(pk__in=pks).update(
+            available_at=(
+                F('requested_at') + timedelta(seconds=settings.STATS_JOB_DELAY)
+            ),
+            last_error='',
+        )
+        return len(jobs)
+
+
+class HeatmapService:
+    """
+    Heatmap anual de cada hábito a partir de HabitYearBitmap.
+    
+    Un día está activo si su progreso cumple el hábito según su tipo
+    (periods.is_met). Las señales de HabitProgress mantienen los bitsets;
+    las escrituras masivas que no envían señales llaman a rebuild().
+    """
+    
+    ENCODINGS = ('base64', 'rle')
+    
+    @staticmethod
+    def _bit(day):
+        """(byte, máscara) del día dentro del bitset de su año"""
+        byte, bit = divmod(day.timetuple().tm_yday - 1, 8)
+        return byte, 1 << bit
+    
+    @staticmethod
+    def set_day(habit, day, met):
+        """Activa o limpia el día en el bitset del hábito"""
+        byte, mask = HeatmapService._bit(day)
         
-        return list(reversed(weekly_averages))
+        with transaction.atomic():
+            bitmap, created = (
+                HabitYearBitmap.objects.select_for_update().get_or_create(
+                    habit=habit, year=day.year,
+                    defaults={'bits': bytes(BITMAP_BYTES)},
+                )
+            )
+            bits = bytearray(bitmap.bits)
+            value = bits[byte] | mask if met else bits[byte] & ~mask
+            if value != bits[byte]:
+                bits[byte] = value
+                bitmap.bits = bytes(bits)
+                bitmap.save(update_fields=['bits'])
+    
+    @staticmethod
+    def record_progress(progress, habit=None):
+        """Refleja un progreso guardado en el bitset de su hábito"""
+        habit = habit or progress.habit
+        HeatmapService.set_day(
+            habit,
+            progress.date,
+            is_met(habit.kind, habit.target_value, progress.completed, progress.value),
+        )
+    
+    @staticmethod
+    def rebuild(habit_ids, years=None):
+        """
+        Reconstruye los bitsets de los hábitos (solo de esos años si se dan)
+        a partir de HabitProgress con una consulta de lectura. Devuelve el
+        número de bitsets escritos.
+        """
+        habits = {
+            habit['id']: habit
+            for habit in Habit.objects.filter(pk__in=habit_ids)
+            .values('id', 'kind', 'target_value')
+        }
+        progress = HabitProgress.objects.filter(habit_id__in=habits).order_by()
+        bitmaps = HabitYearBitmap.objects.filter(habit_id__in=habits)
+        if years is not None:
+            progress = progress.filter(date__year__in=years)
+            bitmaps = bitmaps.filter(year__in=years)
+        
+        bitsets = {}
+        for habit_id, day, completed, value in progress.values_list(
+            'habit_id', 'date', 'completed', 'value'
+        ):
+            habit = habits[habit_id]
+            bits = bitsets.setdefault(
+                (habit_id, day.year), bytearray(BITMAP_BYTES)
+            )
+            if is_met(habit['kind'], habit['target_value'], completed, value):
+                byte, mask = HeatmapService._bit(day)
+                bits[byte] |= mask
+        
+        with transaction.atomic():
+            bitmaps.delete()
+            HabitYearBitmap.objects.bulk_create(
+                HabitYearBitmap(habit_id=habit_id, year=year, bits=bytes(bits))
+                for (habit_id, year), bits in bitsets.items()
+            )
+        return len(bitsets)
+    
+    @staticmethod
+    def run_length_segments(bits, days):
+        """Tramos de días activos como [primer día del año, longitud]"""
+        segments = []
+        start = None
+        for index in range(days + 1):
+            active = index < days and bits[index // 8] & (1 << index % 8)
+            if active and start is None:
+                start = index
+            elif not active and start is not None:
+                segments.append([start + 1, index - start])
+                start = None
+        return segments
+    
+    @staticmethod
+    def get_heatmap(habit, year, encoding='base64'):
+        """Heatmap del año del hábito codificado en base64 o por tramos"""
+        if encoding not in HeatmapService.ENCODINGS:
+            raise ValueError(
+                f"encoding must be one of {', '.join(HeatmapService.ENCODINGS)}"
+            )
+        
+        stored = (
+            HabitYearBitmap.objects.filter(habit=habit, year=year)
+            .values_list('bits', flat=True)
+            .first()
+        )
+        bits = bytes(stored) if stored is not None else bytes(BITMAP_BYTES)
+        days = (date(year, 12, 31) - date(year, 1, 1)).days + 1
+        
+        heatmap = {
+            'habit_id': habit.pk,
+            'year': year,
+            'days': days,
+            'encoding': encoding,
+        }
+        if encoding == 'base64':
+            heatmap['bitmap'] = base64.b64encode(bits).decode('ascii')
+        else:
+            heatmap['segments'] = HeatmapService.run_length_segments(bits, days)
+        return heatmap
@@ -0,0 +1,201 @@
+"""
+Señales que mantienen las tablas diarias de estadísticas, los heatmaps
+anuales de hábitos y la caché
+"""
+from django.db.models import Model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from apps.habits.models import Habit
+from apps.nutrition.models import Nutrition
+from apps.workouts.models import Workout
+
+from . import cache as stats_cache
+from .models import HabitProgress, NutritionStats, UserStats, WorkoutStats
+from .services import HeatmapService, RollupService, StatsService
+
+
+def _previous_snapshot(sender, instance, snapshot):
+    """Guarda en la instancia los valores persistidos antes de guardar"""
+    previous = None
+    if instance.pk is not None:
+        stored = sender.objects.filter(pk=instance.pk).first()
+        if stored is not None:
+            previous = snapshot(stored)
+    instance._rollup_previous = previous
+
+
+@receiver(pre_save, sender=Workout)
+def workout_pre_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    _previous_snapshot(sender, instance, RollupService.workout_snapshot)
+
+
+@receiver(post_save, sender=Workout)
+def workout_post_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    RollupService.apply_workout_change(
+        getattr(instance, '_rollup_previous', None),
+        RollupService.workout_snapshot(instance),
+    )
+
+
+@receiver(post_delete, sender=Workout)
+def workout_post_delete(sender, instance, **kwargs):
+    RollupService.apply_workout_change(
+        RollupService.workout_snapshot(instance), None
+    )
+
+
+@receiver(pre_save, sender=Nutrition)
+def nutrition_pre_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    _previous_snapshot(sender, instance, RollupService.nutrition_snapshot)
+
+
+@receiver(post_save, sender=Nutrition)
+def nutrition_post_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    RollupService.apply_nutrition_change(
+        getattr(instance, '_rollup_previous', None),
+        RollupService.nutrition_snapshot(instance),
+    )
+
+
+@receiver(post_delete, sender=Nutrition)
+def nutrition_post_delete(sender, instance, **kwargs):
+    RollupService.apply_nutrition_change(
+        RollupService.nutrition_snapshot(instance), None
+    )
+
+
+def _origin_model(origin):
+    """Modelo desde el que se lanzó un borrado (instancia o queryset)"""
+    if isinstance(origin, Model):
+        return type(origin)
+    return getattr(origin, 'model', None)
+
+
+@receiver(pre_save, sender=HabitProgress)
+def habit_progress_pre_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._progress_previous = None
+    # Solo un cambio de hábito, fecha o estado cambia rachas y totales
+    if raw or instance.pk is None:
+        return
+    tracked = {'habit', 'date', 'completed'}
+    if update_fields is not None and not tracked & set(update_fields):
+        return
+    instance._progress_previous = (
+        sender.objects.filter(pk=instance.pk)
+        .values_list('habit_id', 'user_id', 'date', 'completed')
+        .first()
+    )
+
+
+@receiver(post_save, sender=HabitProgress)
+def habit_progress_post_save(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_progress_previous', None)
+    if created:
+        StatsService.record_progress_change(instance, was_completed=False)
+    elif previous is not None:
+        previous_habit_id, previous_user_id, previous_date, was_completed = previous
+        if (previous_user_id, previous_date) == (instance.user_id, instance.date):
+            StatsService.record_progress_change(instance, was_completed)
+        else:
+            # Mover un progreso cambia dos días: se recalcula
+            StatsService.schedule_recompute({previous_user_id, instance.user_id})
+        if (previous_habit_id, previous_date) != (instance.habit_id, instance.date):
+            HeatmapService.set_day(
+                Habit(pk=previous_habit_id), previous_date, False
+            )
+    HeatmapService.record_progress(instance)
+
+
+@receiver(post_delete, sender=HabitProgress)
+def habit_progress_post_delete(sender, instance, origin=None, **kwargs):
+    # Al borrar el hábito o el usuario los bitsets se borran en cascada y
+    # las estadísticas se recalculan una vez (habit_post_delete)
+    if _origin_model(origin) not in (None, HabitProgress):
+        return
+    StatsService.record_progress_change(
+        instance, instance.completed, completed=False
+    )
+    HeatmapService.set_day(instance.habit, instance.date, False)
+
+
+@receiver(pre_save, sender=Habit)
+def habit_pre_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._heatmap_previous = None
+    # kind y target_value deciden qué días cuentan como cumplidos
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and not {'kind', 'target_value'} & set(update_fields):
+        return
+    instance._heatmap_previous = (
+        sender.objects.filter(pk=instance.pk)
+        .values_list('kind', 'target_value')
+        .first()
+    )
+
+
+@receiver(post_save, sender=Habit)
+def habit_post_save(sender, instance, created=False, raw=False, **kwargs):
+    previous = getattr(instance, '_heatmap_previous', None)
+    if created or raw or previous is None:
+        return
+    if previous != (instance.kind, float(instance.target_value)):
+        HeatmapService.rebuild([instance.pk])
+
+
+@receiver(post_delete, sender=Habit)
+def habit_post_delete(sender, instance, origin=None, **kwargs):
+    # Sus progresos ya se han borrado sin tocar las estadísticas; al borrar
+    # el usuario sus estadísticas se borran con él
+    if _origin_model(origin) is Habit:
+        StatsService.schedule_recompute([instance.user_id])
+
+
+@receiver(post_save, sender=Workout)
+@receiver(post_delete, sender=Workout)
+@receiver(post_save, sender=Nutrition)
+@receiver(post_delete, sender=Nutrition)
+@receiver(post_save, sender=WorkoutStats)
+@receiver(post_delete, sender=WorkoutStats)
+@receiver(post_save, sender=NutritionStats)
+@receiver(post_delete, sender=NutritionStats)
+def invalidate_user_stats_cache(sender, instance, **kwargs):
+    user_ids = {instance.user_id}
+    previous = getattr(instance, '_rollup_previous', None)
+    if previous is not None:
+        user_ids.add(previous['user_id'])
+    stats_cache.invalidate(*user_ids)
+
+
+@receiver(post_save, sender=UserStats)
+def invalidate_user_stats_row_cache(sender, instance, created=False, **kwargs):
+    # Crear la fila vacía (get_or_create al leer) no cambia ningún dato
+    if not created:
+        stats_cache.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=HabitProgress)
+@receiver(post_delete, sender=HabitProgress)
+def invalidate_habit_progress_cache(sender, instance, origin=None, **kwargs):
+    # En un borrado en cascada desde el hábito o el usuario invalida el
+    # handler del hábito una sola vez, no una por fila
+    if isinstance(origin, Model) and not isinstance(origin, HabitProgress):
+        return
+    stats_cache.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=Habit)
+@receiver(post_delete, sender=Habit)
+def invalidate_habit_cache(sender, instance, **kwargs):
+    # Cambiar kind o target_value cambia el calendario del hábito
+    stats_cache.invalidate(instance.user_id)
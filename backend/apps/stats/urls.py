@@ -44,10 +44,14 @@ urlpatterns = [
         api_views.NutritionStatsDetailView.as_view(),
         name="nutrition_stats_detail",
     ),
+    path("nutrition/summary/", api_views.nutrition_summary_view, name="nutrition_summary"),
     # Resumen de estadísticas
     path("summary/", api_views.stats_summary, name="stats_summary"),
+    path("cache/metrics/", api_views.cache_metrics, name="cache_metrics"),
     # Dashboard
     path("dashboard/", api_views.dashboard_view, name="dashboard"),
+    # Analítica de todos los hábitos
+    path("habits/overview/", api_views.habits_overview_view, name="habits_overview"),
     # Progreso de hábitos específicos
     path("habits/<int:habit_id>/progress/", api_views.habit_progress_view, name="habit_progress_detail"),
     path("habits/<int:habit_id>/complete/", api_views.mark_habit_completed_view, name="mark_habit_completed"),
@@ -21,7 +21,7 @@ class WorkoutListCreateView(generics.ListCreateAPIView):
         return WorkoutSerializer
     
     def get_queryset(self):
-        return Workout.objects.filter(habit__user=self.request.user)
+        return Workout.objects.filter(user=self.request.user)
 
 
 class WorkoutDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -30,4 +30,4 @@ class WorkoutDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return Workout.objects.filter(habit__user=self.request.user)
\ No newline at end of file
+        return Workout.objects.filter(user=self.request.user)
\ No newline at end of file
@@ -0,0 +1,26 @@
+# Generated by Django 5.0.2 on 2026-10-18 19:58
+
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_workout_user(apps, schema_editor):
+    """Copia habit.user en workout.user para los entrenamientos existentes"""
+    Workout = apps.get_model('workouts', 'Workout')
+    Habit = apps.get_model('habits', 'Habit')
+    Workout.objects.filter(user__isnull=True).update(
+        user=Subquery(
+            Habit.objects.filter(pk=OuterRef('habit_id')).values('user_id')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workouts', '0007_workout_user'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_workout_user, migrations.RunPython.noop),
+    ]
@@ -2,6 +2,7 @@ from django.db import models
 from decimal import Decimal
 from django.core.validators import MinValueValidator
 
+from apps.accounts.models import User
 from apps.habits.models import Habit
 
 
@@ -17,6 +18,13 @@ class Workout(models.Model):
     
     id = models.AutoField(primary_key=True)
     habit = models.ForeignKey(Habit, on_delete=models.CASCADE, related_name='workouts')
+    # Desnormalizado desde habit.user para agregados por usuario sin join
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='workouts',
+        editable=False,
+    )
     date = models.DateField()
     duration_min = models.PositiveIntegerField(
         validators=[MinValueValidator(1)],
@@ -52,11 +60,20 @@ class Workout(models.Model):
             models.Index(fields=['habit', '-date']),
             models.Index(fields=['date']),
             models.Index(fields=['status']),
+            models.Index(fields=['user', 'date']),
         ]
     
     def __str__(self):
         return f"{self.habit.title} - {self.date} ({self.status})"
     
+    def save(self, *args, **kwargs):
+        """Mantiene el usuario sincronizado con el hábito"""
+        self.user_id = self.habit.user_id
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'habit' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'user'}
+        super().save(*args, **kwargs)
+    
     @property
     def calories_per_minute(self):
         """Calcula calorías por minuto"""
@@ -88,9 +88,42 @@ DATABASES = {
         "PASSWORD": config("DB_PASSWORD", default=""),
         "HOST": config("DB_HOST", default=""),
         "PORT": config("DB_PORT", default=""),
+        # Seconds to keep connections open (also the dashboard pool threads)
+        "CONN_MAX_AGE": config("DB_CONN_MAX_AGE", default=60, cast=int),
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
+# Cache - Redis when REDIS_URL is set (production), local memory otherwise
+REDIS_URL = config("REDIS_URL", default="")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "fittracker",
+        }
+    }
+
+# Seconds a cached stats response lives (writes invalidate it earlier)
+STATS_CACHE_TIMEOUT = config("STATS_CACHE_TIMEOUT", default=3600, cast=int)
+
+# Recompute stats in the run_stats_worker command instead of the request
+STATS_DEFERRED = config("STATS_DEFERRED", default=False, cast=bool)
+# Seconds writes for the same user are coalesced into one recompute
+STATS_JOB_DELAY = config("STATS_JOB_DELAY", default=5, cast=int)
+# Seconds a claimed job stays hidden before another worker may retry it
+STATS_JOB_LEASE = config("STATS_JOB_LEASE", default=300, cast=int)
+
+# Threads used to compute cache-missing dashboard sections in parallel
+STATS_DASHBOARD_WORKERS = config("STATS_DASHBOARD_WORKERS", default=4, cast=int)
+
 # Configuration to use custom user model
 AUTH_USER_MODEL = "accounts.User"
 
@@ -157,6 +190,23 @@ API_NINJA_KEY = config(
 API_NINJA_BASE_URL = config(
     "API_NINJA_BASE_URL", default="https://api.api-ninjas.com/v1"
 )
+# Timeouts (segundos) y circuit breaker del cliente de API Ninja
+API_NINJA_CONNECT_TIMEOUT = config("API_NINJA_CONNECT_TIMEOUT", default=0.3, cast=float)
+API_NINJA_READ_TIMEOUT = config("API_NINJA_READ_TIMEOUT", default=0.8, cast=float)
+API_NINJA_FAILURE_THRESHOLD = config("API_NINJA_FAILURE_THRESHOLD", default=5, cast=int)
+API_NINJA_RESET_TIMEOUT = config("API_NINJA_RESET_TIMEOUT", default=30, cast=int)
+
+# Caché de enriquecimiento (segundos): frescas, "no encontrado" y obsoletas
+# servidas mientras se revalidan; entradas en la LRU de cada proceso
+ENRICHMENT_CACHE_TTL = config("ENRICHMENT_CACHE_TTL", default=86400, cast=int)
+ENRICHMENT_NEGATIVE_TTL = config("ENRICHMENT_NEGATIVE_TTL", default=3600, cast=int)
+ENRICHMENT_STALE_TTL = config("ENRICHMENT_STALE_TTL", default=604800, cast=int)
+ENRICHMENT_LOCAL_SIZE = config("ENRICHMENT_LOCAL_SIZE", default=1024, cast=int)
+
+# Catálogo binario de alimentos (python manage.py load_food_catalogue)
+FOOD_CATALOGUE_PATH = config(
+    "FOOD_CATALOGUE_PATH", default=str(BASE_DIR / "data" / "food_catalogue.bin")
+)
 
 # CORS configuration (for frontend)
 CORS_ALLOWED_ORIGINS = config(
@@ -1,10 +1,12 @@
 import requests
 from apps.accounts.models import User
+from core import api_ninja, enrichment_cache
+from django.conf import settings
 from django.contrib import admin
 from django.http import JsonResponse
 from django.urls import include, path
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import (
@@ -45,6 +47,8 @@ def api_home(request):
                     "list": "GET/POST /api/nutrition/",
                     "detail": "GET/PUT/DELETE /api/nutrition/<id>/",
                     "enrich": "POST /api/nutrition/enrich/",
+                    "enrich_batch": "POST /api/nutrition/enrich/batch/",
+                    "search_foods": "GET /api/nutrition/foods/search/",
                 },
                 "workouts": {
                     "list": "GET/POST /api/workouts/",
@@ -112,80 +116,47 @@ def register_user(request):
         return Response({"error": str(e)}, status=400)
 
 
+def _api_ninja_get(endpoint, params):
+    """GET to API Ninja; raises on errors so they are not cached"""
+    return api_ninja.get_client().get(endpoint, params)
+
+
+def _fetch_exercise(exercise_name):
+    """Exercise data from API Ninja, None if missing"""
+    data = _api_ninja_get("exercises", {"name": exercise_name})
+    if not data:
+        return None
+    enriched = data[0]
+    return {
+        "name": enriched.get("name", exercise_name),
+        "type": enriched.get("type", ""),
+        "muscle": enriched.get("muscle", ""),
+        "equipment": enriched.get("equipment", ""),
+        "difficulty": enriched.get("difficulty", ""),
+        "instructions": enriched.get("instructions", ""),
+    }
+
+
 @api_view(["POST"])
 @permission_classes([AllowAny])
 def enrich_nutrition(request):
     """Enrich nutritional data with API Ninja or local database"""
     try:
-        from apps.nutrition.nutrition_data import search_nutrition_data
-        from django.conf import settings
+        from apps.nutrition.enrichment import enrich_food
 
         food_name = request.data.get("name", "")
         if not food_name:
             return Response({"error": "Food name required"}, status=400)
 
-        # First try with API Ninja (only if configured)
-        if settings.API_NINJA_KEY and settings.API_NINJA_KEY != "demo-key-for-testing":
-            try:
-                headers = {"X-Api-Key": settings.API_NINJA_KEY}
-                response = requests.get(
-                    f"{settings.API_NINJA_BASE_URL}/nutrition",
-                    headers=headers,
-                    params={"query": food_name},
-                    timeout=10,
-                )
-
-                if response.status_code == 200:
-                    data = response.json()
-                    if data:
-                        enriched = data[0]
-                        # Check if data is complete (not premium)
-                        calories = enriched.get("calories", 0)
-                        protein = enriched.get("protein_g", 0)
-
-                        # If data is complete, use API Ninja
-                        if (
-                            calories != "Only available for premium subscribers"
-                            and protein != "Only available for premium subscribers"
-                        ):
-                            return Response(
-                                {
-                                    "success": True,
-                                    "message": f"✨ Nutritional data for: {food_name}",
-                                    "data": {
-                                        "name": enriched.get("name", food_name),
-                                        "calories": enriched.get("calories", 0),
-                                        "protein_g": enriched.get("protein_g", 0),
-                                        "carbs_g": enriched.get(
-                                            "carbohydrates_total_g", 0
-                                        ),
-                                        "fat_g": enriched.get("fat_total_g", 0),
-                                        "sugar_g": enriched.get("sugar_g", 0),
-                                        "fiber_g": enriched.get("fiber_g", 0),
-                                    },
-                                    "source": "API Ninja",
-                                }
-                            )
-            except Exception:
-                pass  # Continue with local database
-
-        # Fallback: use local database
-        local_data = search_nutrition_data(food_name)
-        if local_data:
+        # Local database, enrichment cache and API Ninja
+        result = enrich_food(food_name)
+        if result["found"]:
             return Response(
                 {
                     "success": True,
                     "message": f"✨ Nutritional data for: {food_name}",
-                    "data": {
-                        "name": local_data["name"],
-                        "calories": local_data["calories"],
-                        "protein_g": local_data["protein_g"],
-                        "carbs_g": local_data["carbs_g"],
-                        "fat_g": local_data["fat_g"],
-                        "sugar_g": local_data["sugar_g"],
-                        "fiber_g": local_data["fiber_g"],
-                    },
-                    "source": "Local database",
+                    "data": result["data"],
+                    "source": result["source"],
                 }
             )
 
@@ -201,46 +172,30 @@ def enrich_nutrition(request):
 def enrich_exercise(request):
     """Enrich exercise data with API Ninja or local database"""
     try:
-        from django.conf import settings
         from apps.workouts.exercise_data import search_exercise_data
 
         exercise_name = request.data.get("name", "")
         if not exercise_name:
             return Response({"error": "Exercise name required"}, status=400)
 
-        # First try with API Ninja (only if configured)
-        if (settings.API_NINJA_KEY and 
-            settings.API_NINJA_KEY != "demo-key-for-testing"):
+        # First try with API Ninja (only if configured), through the cache
+        if api_ninja.is_configured():
             try:
-                headers = {"X-Api-Key": settings.API_NINJA_KEY}
-                response = requests.get(
-                    f"{settings.API_NINJA_BASE_URL}/exercises",
-                    headers=headers,
-                    params={"name": exercise_name},
-                    timeout=10,
+                data, _ = enrichment_cache.get_or_fetch(
+                    "exercise", exercise_name, lambda: _fetch_exercise(exercise_name)
                 )
-
-                if response.status_code == 200:
-                    data = response.json()
-                    if data:
-                        enriched = data[0]
-                        return Response(
-                            {
-                                "success": True,
-                                "message": f"✨ Exercise data for: {exercise_name}",
-                                "data": {
-                                    "name": enriched.get("name", exercise_name),
-                                    "type": enriched.get("type", ""),
-                                    "muscle": enriched.get("muscle", ""),
-                                    "equipment": enriched.get("equipment", ""),
-                                    "difficulty": enriched.get("difficulty", ""),
-                                    "instructions": enriched.get("instructions", ""),
-                                },
-                                "source": "API Ninja",
-                            }
-                        )
             except Exception:
-                pass  # Continue with local database
+                data = None  # Continue with local database
+
+            if data:
+                return Response(
+                    {
+                        "success": True,
+                        "message": f"✨ Exercise data for: {exercise_name}",
+                        "data": data,
+                        "source": "API Ninja",
+                    }
+                )
 
         # Fallback: use local database
         local_data = search_exercise_data(exercise_name)
@@ -266,8 +221,6 @@ def enrich_exercise(request):
 def search_exercises(request):
     """Search exercises with API Ninja"""
     try:
-        from django.conf import settings
-
         exercise_name = request.GET.get("name", "")
         if not exercise_name:
             return Response({"error": "Name parameter required"}, status=400)
@@ -275,16 +228,14 @@ def search_exercises(request):
         if not settings.API_NINJA_KEY:
             return Response({"error": "API Ninja not configured"}, status=503)
 
-        headers = {"X-Api-Key": settings.API_NINJA_KEY}
-        response = requests.get(
-            f"{settings.API_NINJA_BASE_URL}/exercises",
-            headers=headers,
-            params={"name": exercise_name},
-            timeout=10,
-        )
+        try:
+            data = _api_ninja_get("exercises", {"name": exercise_name})
+        except api_ninja.CircuitOpenError:
+            return Response({"error": "API Ninja unavailable"}, status=503)
+        except requests.RequestException:
+            data = None
 
-        if response.status_code == 200:
-            data = response.json()
+        if data is not None:
             return Response(
                 {
                     "success": True,
@@ -302,6 +253,18 @@ def search_exercises(request):
         return Response({"error": f"Error: {str(e)}"}, status=500)
 
 
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def integration_metrics(request):
+    """API Ninja client and enrichment cache metrics for this process"""
+    return Response(
+        {
+            "api_ninja": api_ninja.get_client().get_metrics(),
+            "enrichment_cache": enrichment_cache.get_metrics(),
+        }
+    )
+
+
 urlpatterns = [
     # Admin
     path("admin/", admin.site.urls),
@@ -321,6 +284,7 @@ urlpatterns = [
     path("api/nutrition/enrich/", enrich_nutrition, name="enrich_nutrition"),
     path("api/workouts/exercises/enrich/", enrich_exercise, name="enrich_exercise"),
     path("api/workouts/exercises/search/", search_exercises, name="search_exercises"),
+    path("api/integrations/metrics/", integration_metrics, name="integration_metrics"),
     # Swagger/OpenAPI Documentation
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
     path("api/docs/", SpectacularSwaggerView.as_view(url_name="schema"), name="swagger-ui"),
@@ -0,0 +1,219 @@
+"""
+Cliente HTTP compartido para API Ninja
+
+Cada proceso usa una sola requests.Session con conexiones keep-alive, así
+que solo la primera llamada paga el handshake TCP+TLS. Los timeouts son
+de cientos de milisegundos y un circuit breaker deja de llamar a la API
+tras API_NINJA_FAILURE_THRESHOLD fallos seguidos: durante
+API_NINJA_RESET_TIMEOUT segundos las llamadas fallan al instante con
+CircuitOpenError (las vistas pasan a la base de datos local) y después se
+deja pasar una llamada de prueba. Se guardan métricas de latencia y
+errores por endpoint.
+"""
+import threading
+import time
+from collections import defaultdict, deque
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Latencias guardadas por endpoint para los percentiles
+LATENCY_SAMPLES = 256
+
+
+class CircuitOpenError(Exception):
+    """La API se da por caída y no se llama"""
+
+
+class CircuitBreaker:
+    """Circuit breaker cerrado / abierto / semiabierto (thread-safe)"""
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def allow(self):
+        """Si se puede llamar; en semiabierto solo pasa una llamada de prueba"""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self.probing:
+                return False
+            self.probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+
+class APINinjaClient:
+    """Cliente de API Ninja con sesión persistente, timeouts y breaker"""
+
+    def __init__(
+        self,
+        base_url,
+        api_key,
+        connect_timeout=0.3,
+        read_timeout=0.8,
+        failure_threshold=5,
+        reset_timeout=30,
+        pool_size=10,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+        self.session = requests.Session()
+        self.session.headers["X-Api-Key"] = api_key
+        # Un reintento rápido para fallos de conexión y 502/503/504
+        retry = Retry(
+            total=1,
+            read=False,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=("GET",),
+            backoff_factor=0.05,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._metrics_lock = threading.Lock()
+        self._metrics = defaultdict(
+            lambda: {
+                "requests": 0,
+                "errors": 0,
+                "rejected": 0,
+                "latencies": deque(maxlen=LATENCY_SAMPLES),
+            }
+        )
+
+    def _record(self, endpoint, started=None, error=False, rejected=False):
+        with self._metrics_lock:
+            metrics = self._metrics[endpoint]
+            if rejected:
+                metrics["rejected"] += 1
+                return
+            metrics["requests"] += 1
+            metrics["errors"] += error
+            metrics["latencies"].append((time.perf_counter() - started) * 1000)
+
+    def get(self, endpoint, params=None):
+        """
+        JSON de GET /endpoint. Lanza CircuitOpenError si el breaker está
+        abierto y requests.RequestException ante errores; solo los fallos
+        de red y los 5xx cuentan para el breaker.
+        """
+        if not self.breaker.allow():
+            self._record(endpoint, rejected=True)
+            raise CircuitOpenError(f"API Ninja circuit open ({endpoint})")
+
+        started = time.perf_counter()
+        try:
+            response = self.session.get(
+                f"{self.base_url}/{endpoint}", params=params, timeout=self.timeout
+            )
+            response.raise_for_status()
+            data = response.json()
+        except requests.RequestException as e:
+            self._record(endpoint, started, error=True)
+            status = getattr(e.response, "status_code", None)
+            if status is not None and status < 500:
+                # La API respondió: no está caída
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+            raise
+        except ValueError:
+            # Respuesta que no es JSON
+            self._record(endpoint, started, error=True)
+            self.breaker.record_failure()
+            raise
+
+        self._record(endpoint, started)
+        self.breaker.record_success()
+        return data
+
+    def get_metrics(self):
+        """Peticiones, errores, rechazos y latencias (ms) por endpoint"""
+        with self._metrics_lock:
+            endpoints = {}
+            for endpoint, metrics in self._metrics.items():
+                latencies = sorted(metrics["latencies"])
+
+                def percentile(fraction):
+                    if not latencies:
+                        return None
+                    return round(latencies[int(fraction * (len(latencies) - 1))], 2)
+
+                endpoints[endpoint] = {
+                    "requests": metrics["requests"],
+                    "errors": metrics["errors"],
+                    "rejected": metrics["rejected"],
+                    "latency_ms": {
+                        "p50": percentile(0.5),
+                        "p95": percentile(0.95),
+                        "max": round(latencies[-1], 2) if latencies else None,
+                    },
+                }
+        return {"circuit": self.breaker.state, "endpoints": endpoints}
+
+    def close(self):
+        self.session.close()
+
+
+def is_configured():
+    """Si hay una clave real de API Ninja"""
+    return bool(settings.API_NINJA_KEY) and settings.API_NINJA_KEY != "demo-key-for-testing"
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def _client_settings():
+    return (
+        settings.API_NINJA_BASE_URL,
+        settings.API_NINJA_KEY,
+        settings.API_NINJA_CONNECT_TIMEOUT,
+        settings.API_NINJA_READ_TIMEOUT,
+        settings.API_NINJA_FAILURE_THRESHOLD,
+        settings.API_NINJA_RESET_TIMEOUT,
+    )
+
+
+def get_client():
+    """Cliente del proceso, creado de nuevo si cambia la configuración"""
+    global _client
+    config = _client_settings()
+    with _client_lock:
+        if _client is None or _client[0] != config:
+            if _client is not None:
+                _client[1].close()
+            _client = (config, APINinjaClient(*config))
+        return _client[1]
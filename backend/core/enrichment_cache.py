@@ -0,0 +1,172 @@
+"""
+Caché de las consultas de enriquecimiento a API Ninja
+
+Las respuestas se guardan por tipo y consulta normalizada en la caché de
+Django (compartida entre workers con Redis) y en una LRU pequeña del
+proceso, así que las consultas populares no salen del proceso. Cada
+entrada es fresca durante ENRICHMENT_CACHE_TTL segundos (los "no
+encontrado" durante ENRICHMENT_NEGATIVE_TTL) y después se sirve como
+obsoleta durante ENRICHMENT_STALE_TTL mientras un solo worker la vuelve a
+pedir en segundo plano. Los errores de la API no se cachean.
+"""
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Segundos que un worker tiene reservada la revalidación de una entrada
+REVALIDATE_LOCK_TIMEOUT = 30
+
+_metrics_lock = threading.Lock()
+_metrics = defaultdict(
+    lambda: {"hits": 0, "stale": 0, "misses": 0, "negative": 0, "errors": 0}
+)
+
+_local_lock = threading.Lock()
+_local = OrderedDict()
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="enrichment")
+_pending = set()
+
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_query(query):
+    """Minúsculas, sin acentos y con los espacios colapsados"""
+    decomposed = unicodedata.normalize("NFKD", query.lower())
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return _SPACES.sub(" ", stripped).strip()
+
+
+def _entry_key(kind, query):
+    digest = hashlib.sha1(normalize_query(query).encode("utf-8")).hexdigest()
+    return f"enrichment:{kind}:{digest}"
+
+
+def _record(kind, outcome):
+    with _metrics_lock:
+        _metrics[kind][outcome] += 1
+
+
+def _local_get(key):
+    with _local_lock:
+        entry = _local.get(key)
+        if entry is not None:
+            _local.move_to_end(key)
+        return entry
+
+
+def _local_set(key, entry):
+    with _local_lock:
+        _local[key] = entry
+        _local.move_to_end(key)
+        while len(_local) > settings.ENRICHMENT_LOCAL_SIZE:
+            _local.popitem(last=False)
+
+
+def _store(key, data):
+    """Guarda data (None = no encontrado) como entrada fresca"""
+    if data is not None:
+        ttl = settings.ENRICHMENT_CACHE_TTL
+    else:
+        ttl = settings.ENRICHMENT_NEGATIVE_TTL
+    now = time.time()
+    entry = {
+        "data": data,
+        "fresh_until": now + ttl,
+        "stale_until": now + ttl + settings.ENRICHMENT_STALE_TTL,
+    }
+    cache.set(key, entry, ttl + settings.ENRICHMENT_STALE_TTL)
+    _local_set(key, entry)
+    return entry
+
+
+def _revalidate(kind, key, fetch):
+    try:
+        _store(key, fetch())
+    except Exception:
+        # Se sigue sirviendo la entrada obsoleta hasta que caduque
+        _record(kind, "errors")
+    finally:
+        cache.delete(f"{key}:revalidating")
+
+
+def _schedule_revalidation(kind, key, fetch):
+    # Solo un worker revalida cada entrada
+    if not cache.add(f"{key}:revalidating", True, REVALIDATE_LOCK_TIMEOUT):
+        return
+    future = _executor.submit(_revalidate, kind, key, fetch)
+    _pending.add(future)
+    future.add_done_callback(_pending.discard)
+
+
+def peek(kind, query, fetch):
+    """
+    Entrada en caché de query como (datos, estado) con estado "hit" o
+    "stale", o None si no hay. Una entrada obsoleta se revalida en segundo
+    plano con fetch().
+    """
+    key = _entry_key(kind, query)
+    now = time.time()
+    entry = _local_get(key)
+    if entry is None or entry["fresh_until"] <= now:
+        # Otro worker puede haberla revalidado ya
+        shared = cache.get(key)
+        if shared is not None:
+            entry = shared
+            _local_set(key, entry)
+
+    if entry is None or entry["stale_until"] <= now:
+        return None
+    if entry["fresh_until"] > now:
+        # Cada consulta cuenta en una sola métrica
+        _record(kind, "hits" if entry["data"] is not None else "negative")
+        return entry["data"], "hit"
+    _record(kind, "stale")
+    _schedule_revalidation(kind, key, fetch)
+    return entry["data"], "stale"
+
+
+def get_or_fetch(kind, query, fetch):
+    """
+    Datos de enriquecimiento de query o None si la API no lo encontró.
+
+    fetch() pide los datos a la API: devuelve None si no existen y lanza
+    una excepción ante errores, que se propaga si no hay nada en caché.
+    Devuelve (datos, estado) con estado "hit", "stale" o "miss".
+    """
+    cached = peek(kind, query, fetch)
+    if cached is not None:
+        return cached
+
+    _record(kind, "misses")
+    try:
+        data = fetch()
+    except Exception:
+        _record(kind, "errors")
+        raise
+    _store(_entry_key(kind, query), data)
+    return data, "miss"
+
+
+def clear_local():
+    """Vacía la LRU del proceso (la caché compartida no cambia)"""
+    with _local_lock:
+        _local.clear()
+
+
+def drain(timeout=None):
+    """Espera a las revalidaciones en curso"""
+    wait(list(_pending), timeout=timeout)
+
+
+def get_metrics():
+    """Contadores por tipo de consulta (por proceso)"""
+    with _metrics_lock:
+        return {kind: dict(counts) for kind, counts in _metrics.items()}
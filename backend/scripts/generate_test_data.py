@@ -335,46 +335,15 @@ def create_user_stats(users):
     return stats
 
 def create_workout_stats(users):
-    """Create 50 workout stats entries"""
-    workout_stats = []
-    
-    for i in range(50):
-        user = random.choice(users)
-        random_date = date.today() - timedelta(days=random.randint(0, 30))
-        
-        stat = WorkoutStats.objects.create(
-            user=user,
-            date=random_date,
-            total_duration=random.randint(30, 180),
-            total_calories_burned=random.uniform(100, 800),
-            workout_count=random.randint(1, 5)
-        )
-        workout_stats.append(stat)
-        print(f"Created workout stats for: {stat.user.username}")
-    
+    """Workout stats are rolled up automatically from workouts"""
+    workout_stats = list(WorkoutStats.objects.filter(user__in=users))
+    print(f"Workout stats rolled up from workouts: {len(workout_stats)} days")
     return workout_stats
 
 def create_nutrition_stats(users):
-    """Create 50 nutrition stats entries"""
-    nutrition_stats = []
-    
-    for i in range(50):
-        user = random.choice(users)
-        random_date = date.today() - timedelta(days=random.randint(0, 30))
-        
-        stat = NutritionStats.objects.create(
-            user=user,
-            date=random_date,
-            total_calories=random.uniform(800, 2500),
-            total_protein=random.uniform(50, 200),
-            total_carbs=random.uniform(100, 400),
-            total_fat=random.uniform(30, 100),
-            total_fiber=random.uniform(10, 50),
-            meal_count=random.randint(1, 6)
-        )
-        nutrition_stats.append(stat)
-        print(f"Created nutrition stats for: {stat.user.username}")
-    
+    """Nutrition stats are rolled up automatically from nutrition entries"""
+    nutrition_stats = list(NutritionStats.objects.filter(user__in=users))
+    print(f"Nutrition stats rolled up from entries: {len(nutrition_stats)} days")
     return nutrition_stats
 
 def main():
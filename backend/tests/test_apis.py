@@ -2,15 +2,19 @@
 Tests para las APIs de FitTracker
 """
 
-from datetime import date
+from datetime import date, timedelta
 from decimal import Decimal
+from unittest import mock
 
 from apps.habits.models import Habit
 from apps.nutrition.models import Nutrition
+from apps.stats.models import HabitProgress, NutritionStats, UserStats
 from apps.workouts.models import Workout
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient
 
@@ -113,6 +117,88 @@ class HabitsAPITest(BaseTestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data["title"], "Ejercicio actualizado")
 
+    def test_habit_progress_history(self):
+        """Test historial denso de progreso con ventana configurable"""
+        habit = Habit.objects.create(user=self.user, **self.habit_data)
+        HabitProgress.objects.create(habit=habit, date=date.today(), completed=True)
+        HabitProgress.objects.create(
+            habit=habit, date=date.today() - timedelta(days=1), completed=False
+        )
+
+        url = reverse("habits:habit_progress", kwargs={"pk": habit.pk})
+        response = self.client.get(url, {"days": 365})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["progress_data"]), 365)
+        self.assertEqual(response.data["progress_data"][-1]["date"], date.today().isoformat())
+        self.assertTrue(response.data["progress_data"][-1]["completed"])
+        self.assertEqual(response.data["completion_rate"], 50.0)
+
+        response = self.client.get(url, {"days": "abc"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_check_in(self):
+        """Test check-in masivo con upsert y un único recálculo"""
+        habit = Habit.objects.create(user=self.user, **self.habit_data)
+        other = Habit.objects.create(user=self.user, **self.habit_data)
+        today = date.today()
+        HabitProgress.objects.create(
+            habit=habit, date=today, completed=False, notes="Nota"
+        )
+
+        url = reverse("habits:habit_bulk_check_in")
+        check_ins = [
+            {"habit_id": habit.pk, "date": (today - timedelta(days=offset)).isoformat()}
+            for offset in range(3)
+        ] + [
+            {"habit_id": other.pk, "date": today.isoformat(), "value": 10},
+            {"habit_id": other.pk, "date": today.isoformat(), "value": 12},
+        ]
+        response = self.client.post(url, {"check_ins": check_ins}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 4)
+        self.assertEqual(response.data["stats"]["total_habits_completed"], 4)
+        self.assertEqual(response.data["stats"]["current_streak"], 3)
+
+        updated = HabitProgress.objects.get(habit=habit, date=today)
+        self.assertTrue(updated.completed)
+        self.assertEqual(updated.value, 30.0)
+        self.assertEqual(updated.notes, "Nota")
+        self.assertEqual(updated.user, self.user)
+        self.assertEqual(HabitProgress.objects.get(habit=other).value, 12)
+
+    def test_bulk_check_in_rejects_foreign_habits(self):
+        """Test check-in masivo con hábitos de otro usuario"""
+        other_user = User.objects.create_user(
+            username="otheruser", email="other@example.com", password="testpass123"
+        )
+        foreign = Habit.objects.create(user=other_user, **self.habit_data)
+
+        url = reverse("habits:habit_bulk_check_in")
+        data = {"check_ins": [{"habit_id": foreign.pk, "date": "2025-01-01"}]}
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(HabitProgress.objects.exists())
+
+        response = self.client.post(url, {"check_ins": []}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_habit_heatmap(self):
+        """Test heatmap anual en base64 y por tramos"""
+        habit = Habit.objects.create(user=self.user, **self.habit_data)
+        HabitProgress.objects.create(habit=habit, date=date(2025, 1, 2), completed=True)
+
+        url = reverse("habits:habit_heatmap", kwargs={"pk": habit.pk})
+        response = self.client.get(url, {"year": 2025})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["days"], 365)
+        self.assertEqual(response.data["bitmap"], "Ag" + "A" * 60 + "==")
+
+        response = self.client.get(url, {"year": 2025, "encoding": "rle"})
+        self.assertEqual(response.data["segments"], [[2, 1]])
+
+        response = self.client.get(url, {"encoding": "png"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_delete_habit(self):
         """Test eliminar hábito"""
         habit = Habit.objects.create(user=self.user, **self.habit_data)
@@ -161,6 +247,103 @@ class NutritionAPITest(BaseTestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data["results"]), 1)
 
+    def test_create_nutrition_with_enrichment(self):
+        """Test crear con solo nombre y cantidad completa los macros"""
+        url = reverse("nutrition:nutrition_list")
+        data = {"name": "Manzana", "date": date.today().isoformat(), "quantity": "2"}
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["calories"], 190)
+        self.assertEqual(response.data["carbs_g"], "50.00")
+        self.assertNotIn("quantity", response.data)
+
+    @override_settings(API_NINJA_KEY="demo-key-for-testing")
+    def test_create_nutrition_rejects_loose_matches(self):
+        """Test no se completan macros con una coincidencia aproximada"""
+        url = reverse("nutrition:nutrition_list")
+        for name in ("de", "a", "arr", "chiken"):
+            with self.subTest(name=name):
+                data = {"name": name, "date": date.today().isoformat()}
+                response = self.client.post(url, data, format="json")
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn("name", response.data)
+        self.assertFalse(Nutrition.objects.exists())
+
+    def test_bulk_create_nutrition(self):
+        """Test crear varias entradas en una petición"""
+        today = date.today().isoformat()
+        url = reverse("nutrition:nutrition_list")
+        entries = [
+            self.nutrition_data,
+            {"name": "arroz", "date": today},
+            {"name": "pollo", "date": today, "quantity": "1.5", "fat_g": "2.00"},
+        ]
+        response = self.client.post(url, entries, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([entry["calories"] for entry in response.data], [95, 130, 248])
+        self.assertEqual(response.data[2]["protein_g"], "46.50")
+        self.assertEqual(response.data[2]["fat_g"], "2.00")
+        self.assertEqual(Nutrition.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(
+            [entry["id"] for entry in response.data],
+            list(
+                Nutrition.objects.filter(user=self.user)
+                .order_by("calories")
+                .values_list("id", flat=True)
+            ),
+        )
+
+        # Las tablas diarias se actualizan aunque bulk_create no dispare señales
+        stats = NutritionStats.objects.get(user=self.user, date=date.today())
+        self.assertEqual((stats.meal_count, stats.total_calories), (3, 473.0))
+
+    def test_bulk_create_nutrition_without_bulk_returning(self):
+        """Test la creación en bloque devuelve ids también en MySQL"""
+        url = reverse("nutrition:nutrition_list")
+        entries = [
+            {"name": "arroz", "date": date.today().isoformat()},
+            {"name": "pollo", "date": date.today().isoformat()},
+        ]
+        with mock.patch.object(
+            type(connection.features), "can_return_rows_from_bulk_insert", False
+        ):
+            response = self.client.post(url, entries, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        ids = [entry["id"] for entry in response.data]
+        self.assertNotIn(None, ids)
+        self.assertEqual(
+            set(Nutrition.objects.filter(user=self.user).values_list("id", flat=True)),
+            set(ids),
+        )
+
+        stats = NutritionStats.objects.get(user=self.user, date=date.today())
+        self.assertEqual((stats.meal_count, stats.total_calories), (2, 295.0))
+
+    @override_settings(API_NINJA_KEY="demo-key-for-testing")
+    def test_bulk_create_nutrition_unknown_food(self):
+        """Test un alimento sin datos rechaza todo el bloque"""
+        url = reverse("nutrition:nutrition_list")
+        entries = [
+            {"name": "arroz", "date": date.today().isoformat()},
+            {"name": "zzqx", "date": date.today().isoformat()},
+        ]
+        response = self.client.post(url, entries, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertIn("name", response.data[1])
+        self.assertFalse(Nutrition.objects.exists())
+
+    def test_search_foods(self):
+        """Test búsqueda ordenada de alimentos locales"""
+        url = reverse("nutrition:food_search")
+        response = self.client.get(url, {"q": "platano", "limit": 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"][0]["name"], "Banana")
+        self.assertEqual(response.data["results"][0]["score"], 1.0)
+
+        response = self.client.get(url, {"q": "apple", "limit": 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
 
 class WorkoutsAPITest(BaseTestCase):
     """Tests para API de entrenamientos"""
@@ -218,6 +401,23 @@ class StatsAPITest(BaseTestCase):
         self.assertIn("total_workouts", response.data)
         self.assertIn("total_habits_completed", response.data)
 
+    def test_user_stats_streak_expires(self):
+        """Test la racha de una actividad antigua no sigue vigente"""
+        UserStats.objects.create(
+            user=self.user,
+            current_streak=5,
+            longest_streak=5,
+            last_activity_date=date.today() - timedelta(days=14),
+        )
+        url = reverse("stats:user_stats")
+        response = self.client.get(url)
+        self.assertEqual(response.data["current_streak"], 0)
+        self.assertEqual(response.data["longest_streak"], 5)
+
+        UserStats.objects.filter(user=self.user).update(last_activity_date=date.today())
+        response = self.client.get(url)
+        self.assertEqual(response.data["current_streak"], 5)
+
     def test_get_stats_summary(self):
         """Test obtener resumen de estadísticas"""
         url = reverse("stats:stats_summary")
@@ -227,6 +427,130 @@ class StatsAPITest(BaseTestCase):
         self.assertIn("weekly_progress", response.data)
         self.assertIn("monthly_progress", response.data)
 
+    def test_stats_summary_is_cached_until_write(self):
+        """Test el resumen se cachea y se invalida al escribir"""
+        url = reverse("stats:stats_summary")
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(url)
+        self.assertEqual(cached.data, first.data)
+
+        habit = Habit.objects.create(
+            user=self.user,
+            title="Correr",
+            kind="daily",
+            target_value=5,
+            color_hex="#FF5733",
+        )
+        Workout.objects.create(
+            habit=habit, date=date.today(), duration_min=30, calories=250
+        )
+        response = self.client.get(url)
+        self.assertEqual(
+            response.data["monthly_progress"]["workouts"]["workout_count"], 1
+        )
+
+    def test_cache_metrics_requires_admin(self):
+        """Test métricas de caché solo para administradores"""
+        url = reverse("stats:cache_metrics")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        self.client.get(reverse("stats:stats_summary"))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreaterEqual(response.data["summary"]["misses"], 1)
+
+    def test_get_dashboard(self):
+        """Test obtener dashboard con progreso semanal"""
+        url = reverse("stats:dashboard")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["weekly_progress"]), 4)
+        self.assertIn("today_nutrition", response.data)
+
+    def test_get_dashboard_selected_sections_cached(self):
+        """Test dashboard con secciones seleccionadas y cacheadas"""
+        url = reverse("stats:dashboard")
+        response = self.client.get(url, {"sections": "stats,weekly"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("stats", response.data)
+        self.assertIn("weekly_progress", response.data)
+        self.assertNotIn("today_nutrition", response.data)
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(url, {"sections": "stats,weekly"})
+        self.assertEqual(cached.data, response.data)
+
+        # Una escritura invalida las secciones del usuario
+        Nutrition.objects.create(
+            user=self.user,
+            name="Manzana",
+            date=timezone.now().date(),
+            calories=95,
+            protein_g=Decimal("0.50"),
+            carbs_g=Decimal("25.00"),
+            fat_g=Decimal("0.30"),
+        )
+        response = self.client.get(url, {"sections": "nutrition"})
+        self.assertEqual(response.data["today_nutrition"]["entry_count"], 1)
+
+    def test_get_habits_overview(self):
+        """Test analítica de todos los hábitos"""
+        Habit.objects.create(
+            user=self.user,
+            title="Ejercicio diario",
+            kind="daily",
+            target_value=30.0,
+            color_hex="#FF5733",
+        )
+        url = reverse("stats:habits_overview")
+        response = self.client.get(url, {"days": 14})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["habits"]), 1)
+        self.assertEqual(len(response.data["habits"][0]["rolling_7d"]), 14)
+
+        response = self.client.get(url, {"days": 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_get_nutrition_summary_range(self):
+        """Test resúmenes nutricionales de un rango de días"""
+        today = timezone.now().date()
+        Nutrition.objects.create(
+            user=self.user,
+            name="Manzana",
+            date=today,
+            calories=95,
+            protein_g=Decimal("0.50"),
+            carbs_g=Decimal("25.00"),
+            fat_g=Decimal("0.30"),
+        )
+        url = reverse("stats:nutrition_summary")
+        start = (today - timedelta(days=6)).isoformat()
+        response = self.client.get(url, {"start": start, "end": today.isoformat()})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["days"]), 7)
+        self.assertEqual(response.data["days"][-1]["total_calories"], 95)
+
+        response = self.client.get(url, {"start": today.isoformat(), "end": start})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_get_dashboard_invalid_section(self):
+        """Test dashboard con una sección desconocida"""
+        url = reverse("stats:dashboard")
+        response = self.client.get(url, {"sections": "stats,unknown"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("available_sections", response.data)
+        self.assertIn("unknown", response.data["error"])
+
+        response = self.client.get(url, {"sections": ","})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["error"], "No se ha indicado ninguna sección")
+
 
 class APINinjaTest(BaseTestCase):
     """Tests para integración con API Ninja"""
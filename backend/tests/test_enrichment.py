@@ -0,0 +1,295 @@
+"""
+Tests para el enriquecimiento con API Ninja de FitTracker
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from core import enrichment_cache
+from core.api_ninja import APINinjaClient, CircuitOpenError
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+
+class FakeFetch:
+    """fetch() que cuenta llamadas y devuelve (o lanza) lo indicado"""
+
+    def __init__(self, result):
+        self.result = result
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+class EnrichmentCacheTest(SimpleTestCase):
+    """Tests para la caché de enriquecimiento"""
+
+    def setUp(self):
+        cache.clear()
+        enrichment_cache.clear_local()
+
+    def test_hits_are_shared_by_normalized_query(self):
+        """Test la consulta normalizada solo va a la API una vez"""
+        fetch = FakeFetch({"name": "banana"})
+        self.assertEqual(
+            enrichment_cache.get_or_fetch("nutrition", "Plátano", fetch),
+            ({"name": "banana"}, "miss"),
+        )
+        self.assertEqual(
+            enrichment_cache.get_or_fetch("nutrition", "  platano ", fetch)[1], "hit"
+        )
+
+        # Otro proceso: la LRU está vacía pero la caché compartida no
+        enrichment_cache.clear_local()
+        self.assertEqual(
+            enrichment_cache.get_or_fetch("nutrition", "PLATANO", fetch)[1], "hit"
+        )
+        self.assertEqual(enrichment_cache.get_or_fetch("exercise", "platano", fetch)[1], "miss")
+        self.assertEqual(fetch.calls, 2)
+
+    def test_misses_are_cached_and_errors_are_not(self):
+        """Test "no encontrado" se cachea y los errores se propagan"""
+        fetch = FakeFetch(None)
+        enrichment_cache.get_or_fetch("nutrition", "xyz", fetch)
+        before = enrichment_cache.get_metrics()["nutrition"]
+        self.assertEqual(enrichment_cache.get_or_fetch("nutrition", "xyz", fetch), (None, "hit"))
+        self.assertEqual(fetch.calls, 1)
+        # Un "no encontrado" en caché cuenta como negativo, no como acierto
+        after = enrichment_cache.get_metrics()["nutrition"]
+        self.assertEqual(after["negative"], before["negative"] + 1)
+        self.assertEqual(after["hits"], before["hits"])
+
+        failing = FakeFetch(ConnectionError("down"))
+        errors = enrichment_cache.get_metrics()["nutrition"]["errors"]
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                enrichment_cache.get_or_fetch("nutrition", "apple", failing)
+        self.assertEqual(failing.calls, 2)
+        self.assertEqual(enrichment_cache.get_metrics()["nutrition"]["errors"], errors + 2)
+
+    @override_settings(ENRICHMENT_CACHE_TTL=0)
+    def test_stale_entries_are_served_while_revalidating(self):
+        """Test una entrada caducada se sirve y se revalida en segundo plano"""
+        enrichment_cache.get_or_fetch("nutrition", "apple", FakeFetch({"calories": 95}))
+
+        fetch = FakeFetch({"calories": 52})
+        self.assertEqual(
+            enrichment_cache.get_or_fetch("nutrition", "apple", fetch),
+            ({"calories": 95}, "stale"),
+        )
+        enrichment_cache.drain()
+        self.assertEqual(fetch.calls, 1)
+
+        # Si la revalidación falla se sigue sirviendo la entrada obsoleta
+        failing = FakeFetch(ConnectionError("down"))
+        errors = enrichment_cache.get_metrics()["nutrition"]["errors"]
+        for _ in range(2):
+            self.assertEqual(
+                enrichment_cache.get_or_fetch("nutrition", "apple", failing),
+                ({"calories": 52}, "stale"),
+            )
+            enrichment_cache.drain()
+        self.assertEqual(failing.calls, 2)
+        self.assertEqual(enrichment_cache.get_metrics()["nutrition"]["errors"], errors + 2)
+
+
+class StubAPINinja(BaseHTTPRequestHandler):
+    """API Ninja local: /nutrition, /exercises, /slow y /error"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        server.requests.append(url.path)
+        server.connections.add(self.client_address)
+
+        if url.path == "/slow":
+            time.sleep(0.5)
+        if url.path == "/error" or server.failing:
+            self.respond(500, {"error": "down"})
+        elif url.path == "/nutrition" and not query["query"][0].startswith("unknown"):
+            name = query["query"][0]
+            self.respond(200, [{"name": name, "calories": 95, "protein_g": 0.5}])
+        else:
+            self.respond(200, [])
+
+    def respond(self, status_code, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServerMixin:
+    """Levanta StubAPINinja en un puerto libre durante cada test"""
+
+    def setUp(self):
+        super().setUp()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubAPINinja)
+        self.server.daemon_threads = True
+        self.server.requests = []
+        self.server.connections = set()
+        self.server.failing = False
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def make_client(self, **options):
+        client = APINinjaClient(self.base_url, "test-key", **options)
+        self.addCleanup(client.close)
+        return client
+
+
+class APINinjaClientTest(StubServerMixin, SimpleTestCase):
+    """Tests para el cliente de API Ninja contra un servidor local"""
+
+    def test_reuses_connection_and_records_metrics(self):
+        """Test las llamadas reutilizan la conexión keep-alive"""
+        client = self.make_client()
+        for name in ("apple", "banana"):
+            self.assertEqual(client.get("nutrition", {"query": name})[0]["name"], name)
+
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(len(self.server.connections), 1)
+        metrics = client.get_metrics()
+        self.assertEqual(metrics["circuit"], "closed")
+        self.assertEqual(metrics["endpoints"]["nutrition"]["requests"], 2)
+        self.assertIsNotNone(metrics["endpoints"]["nutrition"]["latency_ms"]["p95"])
+
+    def test_read_timeout(self):
+        """Test una respuesta lenta corta en el timeout de lectura"""
+        client = self.make_client(read_timeout=0.1)
+        started = time.perf_counter()
+        with self.assertRaises(requests.Timeout):
+            client.get("slow")
+        self.assertLess(time.perf_counter() - started, 0.45)
+        self.assertEqual(client.get_metrics()["endpoints"]["slow"]["errors"], 1)
+
+    def test_circuit_opens_after_failures(self):
+        """Test tras varios fallos no se llama a la API hasta el reintento"""
+        client = self.make_client(failure_threshold=2, reset_timeout=60)
+        for _ in range(2):
+            with self.assertRaises(requests.HTTPError):
+                client.get("error")
+        with self.assertRaises(CircuitOpenError):
+            client.get("nutrition", {"query": "apple"})
+
+        self.assertEqual(len(self.server.requests), 2)
+        metrics = client.get_metrics()
+        self.assertEqual(metrics["circuit"], "open")
+        self.assertEqual(metrics["endpoints"]["nutrition"]["rejected"], 1)
+
+    def test_half_open_probe_closes_circuit(self):
+        """Test una llamada de prueba correcta cierra el circuito"""
+        client = self.make_client(failure_threshold=1, reset_timeout=0)
+        with self.assertRaises(requests.HTTPError):
+            client.get("error")
+        self.assertEqual(client.breaker.state, "half-open")
+
+        client.get("nutrition", {"query": "apple"})
+        self.assertEqual(client.breaker.state, "closed")
+
+
+class EnrichmentAPITest(StubServerMixin, TestCase):
+    """Tests para los endpoints de enriquecimiento contra un servidor local"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        enrichment_cache.clear_local()
+        settings_override = override_settings(
+            API_NINJA_BASE_URL=self.base_url,
+            API_NINJA_KEY="test-key",
+            API_NINJA_FAILURE_THRESHOLD=1,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.api = APIClient()
+
+    def test_enrich_nutrition_uses_cache_and_falls_back(self):
+        """Test la API se llama una vez y con la API caída se usa la base local"""
+        url = reverse("enrich_nutrition")
+        for _ in range(2):
+            response = self.api.post(url, {"name": "quinoa"})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data["source"], "API Ninja")
+        # Las coincidencias exactas locales no salen a la API
+        response = self.api.post(url, {"name": "manzana"})
+        self.assertEqual(response.data["source"], "Local database")
+        self.assertEqual(self.server.requests, ["/nutrition"])
+
+        self.server.failing = True
+        response = self.api.post(url, {"name": "grilled chicken"})
+        self.assertEqual(response.data["data"]["name"], "Chicken Breast")
+        self.assertEqual(response.data["source"], "Local database")
+        # Circuito abierto: ya no se llama a la API
+        response = self.api.post(url, {"name": "pollo asado"})
+        self.assertEqual(response.data["source"], "Local database")
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_enrich_batch(self):
+        """Test lote con repetidos, aciertos locales y fallos en orden"""
+        user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.api.force_authenticate(user=user)
+        url = reverse("nutrition:enrich_batch")
+        names = ["Quinoa", "manzana", "QUINOA", "lentejas", "unknown food"]
+
+        response = self.api.post(url, {"names": names}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data["results"]
+        self.assertEqual([result["query"] for result in results], names)
+        self.assertEqual(
+            [result["source"] for result in results],
+            ["API Ninja", "Local database", "API Ninja", "API Ninja", None],
+        )
+        self.assertEqual(results[1]["data"]["name"], "Apple")
+        self.assertEqual(response.data["found"], 4)
+        self.assertEqual(len(self.server.requests), 3)
+
+        # Todo sale de la caché (incluido el "no encontrado")
+        response = self.api.post(url, {"names": names}, format="json")
+        self.assertEqual(
+            [result["cache"] for result in response.data["results"]],
+            ["hit", None, "hit", "hit", "hit"],
+        )
+        self.assertEqual(len(self.server.requests), 3)
+
+        response = self.api.post(url, {"names": []}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_integration_metrics_requires_admin(self):
+        """Test las métricas de integración solo para administradores"""
+        url = reverse("integration_metrics")
+        admin = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="testpass123"
+        )
+        self.assertEqual(self.api.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.api.force_authenticate(user=admin)
+        response = self.api.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["api_ninja"]["circuit"], "closed")
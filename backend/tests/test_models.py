@@ -141,6 +141,26 @@ class WorkoutModelTest(TestCase):
         workout = Workout.objects.create(**self.workout_data)
         self.assertEqual(workout.calories_per_minute, 5.0)
 
+    def test_workout_user_follows_habit(self):
+        """Test el usuario del entrenamiento se sincroniza con el hábito"""
+        workout = Workout.objects.create(**self.workout_data)
+        self.assertEqual(workout.user, self.user)
+
+        other_user = User.objects.create_user(
+            username="otheruser", email="other@example.com", password="testpass123"
+        )
+        other_habit = Habit.objects.create(
+            user=other_user,
+            title="Correr",
+            kind="daily",
+            target_value=5,
+            color_hex="#00FF00",
+        )
+        workout.habit = other_habit
+        workout.save(update_fields=["habit"])
+        workout.refresh_from_db()
+        self.assertEqual(workout.user, other_user)
+
 
 class StatsModelTest(TestCase):
     """Tests para los modelos de estadísticas"""
@@ -175,6 +195,7 @@ class StatsModelTest(TestCase):
             habit=self.habit, date=date.today(), completed=True, value=30.0
         )
         self.assertEqual(progress.habit, self.habit)
+        self.assertEqual(progress.user, self.user)
         self.assertTrue(progress.completed)
         self.assertEqual(progress.value, 30.0)
 
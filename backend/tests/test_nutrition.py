@@ -0,0 +1,153 @@
+"""
+Tests para la base de datos local de alimentos de FitTracker
+"""
+
+import json
+import os
+import tempfile
+from io import StringIO
+
+from apps.nutrition.catalogue import (
+    FoodCatalogue,
+    get_food_catalogue,
+    write_catalogue,
+)
+from apps.nutrition.food_index import FoodIndex, normalize
+from apps.nutrition.nutrition_data import search_foods, search_nutrition_data
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+
+class FoodIndexTest(SimpleTestCase):
+    """Tests para el índice de búsqueda de alimentos"""
+
+    def test_normalize_strips_accents_and_symbols(self):
+        """Test normalizar ignora mayúsculas, acentos y signos"""
+        self.assertEqual(normalize("  Plátano-Maduro, AÑEJO "), "platano maduro anejo")
+
+    def test_ranked_results(self):
+        """Test resultados ordenados: exacto, prefijo y con errores"""
+        index = FoodIndex(
+            [
+                (["chicken breast"], "breast"),
+                (["chicken"], "chicken"),
+                (["chickpeas"], "chickpeas"),
+                (["rice"], "rice"),
+            ]
+        )
+        results = index.search("chicken", limit=3)
+        self.assertEqual(results, [(1.0, "chicken"), (0.9, "breast")])
+
+        results = index.search("chick", limit=3)
+        self.assertEqual([data for _, data in results], ["chicken", "chickpeas", "breast"])
+        self.assertGreater(results[1][0], results[2][0])
+
+        self.assertEqual(index.search("chiken", limit=1)[0][1], "chicken")
+        self.assertEqual(index.search("xyz"), [])
+
+    def test_local_database_search(self):
+        """Test búsqueda en español, sin acentos y con errores de escritura"""
+        self.assertEqual(search_nutrition_data("Plátano")["name"], "Banana")
+        self.assertEqual(search_nutrition_data("brócolli")["name"], "Broccoli")
+        self.assertEqual(search_nutrition_data("grilled chicken breast")["name"], "Chicken Breast")
+        self.assertIsNone(search_nutrition_data("xyz"))
+        self.assertEqual(search_foods("manzana")[0]["calories"], 95)
+
+    def test_junk_queries_match_nothing(self):
+        """Test palabras vacías y prefijos muy cortos no devuelven alimentos"""
+        for query in ("de", "a", "de la", "x", "ap", "pa", "eg"):
+            with self.subTest(query=query):
+                self.assertIsNone(search_nutrition_data(query))
+                self.assertEqual(search_foods(query), [])
+        self.assertEqual(
+            search_nutrition_data("pechuga de pollo")["name"], "Chicken Breast"
+        )
+        self.assertEqual(search_nutrition_data("arr")["name"], "White Rice")
+
+
+class FoodCatalogueTest(SimpleTestCase):
+    """Tests para el catálogo binario de alimentos"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.path = os.path.join(self.directory, "foods.bin")
+
+    def load(self, foods):
+        source = os.path.join(self.directory, "foods.json")
+        with open(source, "w", encoding="utf-8") as output:
+            json.dump(foods, output)
+        call_command("load_food_catalogue", source, "--output", self.path, stdout=StringIO())
+
+    def test_load_csv_and_search(self):
+        """Test cargar un CSV y buscar por nombre, token y prefijo"""
+        source = os.path.join(self.directory, "foods.csv")
+        with open(source, "w", encoding="utf-8") as output:
+            output.write(
+                "name,calories,protein_g,carbohydrates_total_g,fat_total_g\n"
+                "Quinoa cocida,120,4.4,21.3,1.9\n"
+                "Quinoa,368,14.1,64.2,6.1\n"
+                "QUINOA,1,1,1,1\n"
+                "Yuca hervida,112,0.9,27,0.3\n"
+            )
+        out = StringIO()
+        call_command("load_food_catalogue", source, "--output", self.path, stdout=out)
+        self.assertIn("Wrote 3 foods", out.getvalue())
+
+        catalogue = FoodCatalogue(self.path)
+        self.addCleanup(catalogue.close)
+        self.assertEqual(len(catalogue), 3)
+
+        results = catalogue.search("quinoa")
+        self.assertEqual([data["name"] for _, data in results], ["Quinoa", "Quinoa cocida"])
+        self.assertEqual(results[0][0], 1.0)
+        self.assertEqual(results[0][1]["calories"], 368.0)
+        self.assertEqual(results[1][1]["carbs_g"], 21.3)
+        self.assertEqual(catalogue.search("hervi")[0][1]["name"], "Yuca hervida")
+        self.assertEqual(catalogue.search("arepa"), [])
+        self.assertEqual(catalogue.search("qu"), [])
+
+    def test_search_uses_catalogue_and_reloads(self):
+        """Test la búsqueda local usa el catálogo y lo reabre al reemplazarlo"""
+        self.load([{"name": "Mangú", "calories": 180, "carbs_g": 40}])
+        with override_settings(FOOD_CATALOGUE_PATH=self.path):
+            self.assertEqual(search_nutrition_data("mangu")["name"], "Mangú")
+            # El índice integrado sigue respondiendo
+            self.assertEqual(search_nutrition_data("manzana")["name"], "Apple")
+
+            self.load({"Tostones": {"calories": 250, "fat_g": 12}})
+            self.assertIsNone(search_nutrition_data("mangu"))
+            self.assertEqual(search_nutrition_data("tostones")["fat_g"], 12.0)
+
+        self.assertIsNone(search_nutrition_data("tostones"))
+
+    def test_reload_closes_previous_catalogue(self):
+        """Test reabrir el catálogo cierra el mmap anterior"""
+        self.load([{"name": "Mangú"}])
+        with override_settings(FOOD_CATALOGUE_PATH=self.path):
+            previous = get_food_catalogue()
+            self.load([{"name": "Tostones"}])
+            self.assertIsNot(get_food_catalogue(), previous)
+            self.assertTrue(previous.buffer.closed)
+
+    def test_catalogue_is_world_readable(self):
+        """Test el catálogo se puede leer con otro usuario"""
+        self.load([{"name": "Mangú"}])
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o644)
+
+    def test_failed_write_removes_temp_file(self):
+        """Test un error al reemplazar el catálogo no deja ficheros"""
+        os.mkdir(self.path)
+        with self.assertRaises(OSError):
+            write_catalogue(self.path, [{"name": "Mangú"}])
+        self.assertEqual(os.listdir(self.directory), ["foods.bin"])
+
+    def test_unreadable_catalogue_is_ignored(self):
+        """Test un catálogo corrupto se ignora y la búsqueda sigue"""
+        with open(self.path, "wb") as output:
+            output.write(b"not a catalogue")
+        with override_settings(FOOD_CATALOGUE_PATH=self.path):
+            with self.assertLogs("apps.nutrition.catalogue", "ERROR"):
+                self.assertIsNone(get_food_catalogue())
+            self.assertEqual(search_nutrition_data("manzana")["name"], "Apple")
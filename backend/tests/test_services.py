@@ -0,0 +1,945 @@
+"""
+Tests para los servicios de estadísticas de FitTracker
+"""
+
+import base64
+import random
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from apps.habits.models import Habit
+from apps.nutrition.models import Nutrition
+from apps.stats import cache as stats_cache
+from apps.stats.analytics import habits_overview
+from apps.stats.models import (
+    HabitProgress,
+    NutritionStats,
+    StatsJob,
+    UserStats,
+    WorkoutStats,
+)
+from apps.stats.periods import get_habit_calendar
+from apps.stats.services import (
+    HabitProgressService,
+    HeatmapService,
+    NutritionStatsService,
+    StatsJobService,
+    StatsService,
+)
+from apps.workouts.models import Workout
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import OperationalError, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+User = get_user_model()
+
+
+class BaseServiceTestCase(TestCase):
+    """Clase base para tests de servicios"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.habit = Habit.objects.create(
+            user=self.user,
+            title="Ejercicio diario",
+            kind="daily",
+            target_value=30.0,
+            color_hex="#FF5733",
+        )
+        self.today = date.today()
+
+    def complete_days(self, *offsets, habit=None):
+        """Marca como completados los días today - offset"""
+        for offset in offsets:
+            HabitProgress.objects.create(
+                habit=habit or self.habit,
+                date=self.today - timedelta(days=offset),
+                completed=True,
+                value=30.0,
+            )
+
+
+class StreakServiceTest(BaseServiceTestCase):
+    """Tests para el cálculo de rachas"""
+
+    def test_compute_streaks_empty(self):
+        """Test rachas sin fechas completadas"""
+        self.assertEqual(StatsService.compute_streaks([], self.today), (0, 0))
+
+    def test_compute_streaks_current_and_longest(self):
+        """Test racha actual y racha más larga en una sola pasada"""
+        days = [self.today - timedelta(days=offset) for offset in (9, 8, 7, 6, 1, 0)]
+        self.assertEqual(StatsService.compute_streaks(days, self.today), (2, 4))
+
+    def test_current_streak_requires_today(self):
+        """Test la racha actual se rompe si hoy no está completado"""
+        days = [self.today - timedelta(days=offset) for offset in (3, 2, 1)]
+        self.assertEqual(StatsService.compute_streaks(days, self.today), (0, 3))
+
+    def test_streak_is_not_capped(self):
+        """Test las rachas no se limitan a 30 días"""
+        self.complete_days(*range(45))
+        self.assertEqual(StatsService.calculate_streaks(self.user), (45, 45))
+
+    def test_streak_counts_each_day_once(self):
+        """Test varios hábitos el mismo día cuentan como un solo día"""
+        other_habit = Habit.objects.create(
+            user=self.user,
+            title="Leer",
+            kind="daily",
+            target_value=20.0,
+            color_hex="#00FF00",
+        )
+        self.complete_days(0, 1)
+        self.complete_days(0, 1, 2, habit=other_habit)
+        self.assertEqual(StatsService.calculate_streaks(self.user), (3, 3))
+
+    def test_streak_uses_single_query(self):
+        """Test el cálculo de rachas usa una sola consulta"""
+        self.complete_days(*range(10))
+        with self.assertNumQueries(1):
+            StatsService.calculate_streaks(self.user)
+
+
+class IncrementalStreakTest(BaseServiceTestCase):
+    """Tests para el mantenimiento incremental de rachas"""
+
+    def setUp(self):
+        super().setUp()
+        self.other_habit = Habit.objects.create(
+            user=self.user,
+            title="Leer",
+            kind="daily",
+            target_value=20.0,
+            color_hex="#00FF00",
+        )
+
+    def assert_matches_full_recompute(self):
+        stats = UserStats.objects.get(user=self.user)
+        expected = StatsService.refresh_streaks(UserStats(user=self.user))
+        self.assertEqual(
+            (stats.current_streak, stats.longest_streak, stats.last_activity_date),
+            (
+                expected.current_streak,
+                expected.longest_streak,
+                expected.last_activity_date,
+            ),
+        )
+        self.assertEqual(
+            stats.total_habits_completed,
+            HabitProgress.objects.filter(user=self.user, completed=True).count(),
+        )
+
+    def test_extend_and_split_current_run(self):
+        """Test extender y partir la racha actual"""
+        for offset in (4, 3, 2, 1, 0):
+            HabitProgressService.mark_habit_completed(
+                self.habit, self.today - timedelta(days=offset)
+            )
+        stats = UserStats.objects.get(user=self.user)
+        self.assertEqual((stats.current_streak, stats.longest_streak), (5, 5))
+        self.assertEqual(stats.active_streak, 5)
+
+        HabitProgressService.mark_habit_incomplete(
+            self.habit, self.today - timedelta(days=2)
+        )
+        stats.refresh_from_db()
+        self.assertEqual((stats.current_streak, stats.longest_streak), (2, 2))
+        self.assert_matches_full_recompute()
+
+    def test_completion_uses_constant_queries(self):
+        """Test completar un hábito no depende del tamaño del historial"""
+        for offset in range(60, 0, -1):
+            HabitProgressService.mark_habit_completed(
+                self.habit, self.today - timedelta(days=offset)
+            )
+        with self.assertNumQueries(12):
+            HabitProgressService.mark_habit_completed(self.habit, self.today)
+        stats = UserStats.objects.get(user=self.user)
+        self.assertEqual(stats.longest_streak, 61)
+
+        # Volver a completar un día existente tampoco recorre el historial
+        HabitProgressService.mark_habit_incomplete(self.habit, self.today)
+        with self.assertNumQueries(12):
+            HabitProgressService.mark_habit_completed(self.habit, self.today)
+        self.assert_matches_full_recompute()
+        with self.assertNumQueries(7):
+            HabitProgressService.mark_habit_completed(self.habit, self.today)
+        self.assert_matches_full_recompute()
+
+    def test_direct_writes_keep_stats(self):
+        """Test escrituras fuera del servicio mantienen las estadísticas"""
+        self.complete_days(2, 1)
+        HabitProgressService.mark_habit_completed(self.habit, self.today)
+        stats = UserStats.objects.get(user=self.user)
+        self.assertEqual(stats.total_habits_completed, 3)
+        self.assertEqual((stats.current_streak, stats.longest_streak), (3, 3))
+
+        progress = HabitProgress.objects.get(
+            habit=self.habit, date=self.today - timedelta(days=1)
+        )
+        progress.completed = False
+        progress.save()
+        self.assert_matches_full_recompute()
+
+        progress.completed = True
+        progress.date = self.today - timedelta(days=5)
+        progress.save()
+        self.assert_matches_full_recompute()
+
+        HabitProgress.objects.get(habit=self.habit, date=self.today).delete()
+        self.assert_matches_full_recompute()
+
+        self.other_habit.delete()
+        self.habit.delete()
+        self.assert_matches_full_recompute()
+
+    def test_same_day_completions_extend_once(self):
+        """Test dos hábitos completados a la vez el mismo día"""
+        self.complete_days(1)
+        # Ambos upserts se confirman antes de aplicar las estadísticas
+        first, _ = HabitProgress.objects.upsert(self.habit, self.today)
+        second, _ = HabitProgress.objects.upsert(self.other_habit, self.today)
+        StatsService.apply_progress_change(first, was_completed=False)
+        StatsService.apply_progress_change(second, was_completed=False)
+
+        stats = UserStats.objects.get(user=self.user)
+        self.assertEqual((stats.current_streak, stats.longest_streak), (2, 2))
+        self.assert_matches_full_recompute()
+
+    def test_random_writes_match_full_recompute(self):
+        """Test secuencias aleatorias coinciden con el recálculo completo"""
+        rng = random.Random(7)
+        habits = [self.habit, self.other_habit]
+        for _ in range(80):
+            habit = rng.choice(habits)
+            day = self.today - timedelta(days=rng.randrange(12))
+            if rng.random() < 0.65:
+                HabitProgressService.mark_habit_completed(habit, day)
+            else:
+                HabitProgressService.mark_habit_incomplete(habit, day)
+            if UserStats.objects.filter(user=self.user).exists():
+                self.assert_matches_full_recompute()
+
+
+class HabitHistoryTest(BaseServiceTestCase):
+    """Tests para el historial denso de un hábito"""
+
+    def test_history_uses_single_query(self):
+        """Test historial de un año con una sola consulta"""
+        self.complete_days(0, 3, 400)
+        with self.assertNumQueries(1):
+            history = HabitProgressService.get_habit_history(self.habit, 365)
+        self.assertEqual(len(history["progress_data"]), 365)
+        self.assertEqual(
+            sum(day["completed"] for day in history["progress_data"]), 2
+        )
+        self.assertEqual(history["completion_rate"], 100.0)
+
+    def test_history_rejects_invalid_window(self):
+        """Test ventanas fuera de rango"""
+        with self.assertRaises(ValueError):
+            HabitProgressService.get_habit_history(self.habit, 0)
+        with self.assertRaises(ValueError):
+            HabitProgressService.get_habit_history(self.habit, 367)
+
+
+class HabitsOverviewTest(BaseServiceTestCase):
+    """Tests para la analítica de todos los hábitos"""
+
+    def test_overview_from_one_progress_query(self):
+        """Test tasas y rachas de todos los hábitos con una carga"""
+        other_habit = Habit.objects.create(
+            user=self.user,
+            title="Leer",
+            kind="daily",
+            target_value=1,
+            color_hex="#00FF00",
+        )
+        self.complete_days(0, 1, 2, 5, 10, 11, 12, 13, 14)
+        HabitProgress.objects.create(
+            habit=self.habit,
+            date=self.today - timedelta(days=3),
+            completed=False,
+        )
+
+        with self.assertNumQueries(2):
+            overview = habits_overview(self.user, 7, self.today)
+
+        habit, other = overview["habits"]
+        self.assertEqual(overview["end_date"], self.today.isoformat())
+        self.assertEqual((habit["completed_days"], habit["recorded_days"]), (4, 5))
+        self.assertEqual(habit["completion_rate"], 80.0)
+        self.assertEqual(len(habit["rolling_7d"]), 7)
+        self.assertEqual(habit["rolling_7d"][-1], 80.0)
+        self.assertEqual(habit["rolling_30d"][-1], round(9 / 10 * 100, 2))
+        self.assertEqual(habit["weekday_rates"][self.today.weekday()], 100.0)
+        self.assertEqual(habit["current_streak"], 3)
+        # La racha más larga queda antes de la ventana, en los días cargados
+        self.assertEqual(habit["longest_streak"], 5)
+
+        self.assertEqual(other["id"], other_habit.id)
+        self.assertEqual(other["completion_rate"], 0.0)
+        self.assertEqual(other["rolling_7d"], [0.0] * 7)
+        self.assertEqual((other["current_streak"], other["longest_streak"]), (0, 0))
+
+    def test_overview_rejects_invalid_window(self):
+        """Test ventanas fuera de rango"""
+        with self.assertRaises(ValueError):
+            habits_overview(self.user, 0)
+
+
+class HabitPeriodsTest(BaseServiceTestCase):
+    """Tests para el calendario de periodos según el tipo de hábito"""
+
+    def create_habit(self, kind, target_value=1):
+        return Habit.objects.create(
+            user=self.user,
+            title=f"Hábito {kind}",
+            kind=kind,
+            target_value=target_value,
+            color_hex="#00FF00",
+        )
+
+    def test_calendar_metrics_use_one_label(self):
+        """Test las métricas del calendario no crecen con cada hábito"""
+        habits = [self.create_habit("daily") for _ in range(3)]
+        metrics = stats_cache.get_metrics()
+        before = metrics.get("habit_calendar", {}).get("misses", 0)
+        for habit in habits:
+            get_habit_calendar(habit, self.today)
+
+        metrics = stats_cache.get_metrics()
+        self.assertEqual(metrics["habit_calendar"]["misses"], before + 3)
+        self.assertNotIn(f"habit_calendar:{habits[0].pk}", metrics)
+
+    def test_weekly_habit_streaks_by_week(self):
+        """Test un hábito semanal encadena semanas y no días"""
+        weekly = self.create_habit("weekly")
+        monday = self.today - timedelta(days=self.today.weekday())
+        # Una vez en cada una de las tres semanas anteriores
+        for weeks in (1, 2, 3):
+            HabitProgress.objects.create(
+                habit=weekly,
+                date=monday - timedelta(weeks=weeks) + timedelta(days=2),
+                completed=True,
+            )
+
+        streaks = HabitProgressService.get_habit_streaks(weekly, self.today)
+        # La semana en curso sigue abierta
+        self.assertEqual(
+            streaks, {"period": "week", "current_streak": 3, "longest_streak": 3}
+        )
+
+        HabitProgress.objects.create(habit=weekly, date=monday, completed=False)
+        self.assertEqual(
+            HabitProgressService.get_habit_completion_rate(weekly, 28), 75.0
+        )
+
+    def test_counter_habit_uses_value_against_target(self):
+        """Test un contador solo se cumple al alcanzar target_value"""
+        counter = self.create_habit("counter", target_value=8)
+        for offset, value in ((0, 8), (1, 10), (2, 3)):
+            HabitProgress.objects.create(
+                habit=counter,
+                date=self.today - timedelta(days=offset),
+                completed=True,
+                value=value,
+            )
+
+        streaks = HabitProgressService.get_habit_streaks(counter, self.today)
+        self.assertEqual((streaks["current_streak"], streaks["longest_streak"]), (2, 2))
+        self.assertAlmostEqual(
+            HabitProgressService.get_habit_completion_rate(counter), 200 / 3
+        )
+
+        overview = habits_overview(self.user, 7, self.today)
+        row = next(row for row in overview["habits"] if row["id"] == counter.id)
+        self.assertEqual((row["completed_days"], row["recorded_days"]), (2, 3))
+        self.assertEqual(row["current_streak"], 2)
+
+    def test_calendar_is_cached_until_habit_edit(self):
+        """Test el calendario se cachea y se invalida al editar el hábito"""
+        counter = self.create_habit("counter", target_value=8)
+        HabitProgress.objects.create(
+            habit=counter, date=self.today, completed=True, value=5
+        )
+        self.assertEqual(HabitProgressService.get_habit_completion_rate(counter), 0.0)
+        with self.assertNumQueries(0):
+            HabitProgressService.get_habit_completion_rate(counter)
+
+        counter.target_value = 5
+        counter.save()
+        self.assertEqual(HabitProgressService.get_habit_completion_rate(counter), 100.0)
+
+    def test_overview_measures_weekly_habits_in_weeks(self):
+        """Test la analítica mide los hábitos semanales por semanas"""
+        weekly = self.create_habit("weekly")
+        monday = self.today - timedelta(days=self.today.weekday())
+        for weeks in (0, 1, 2):
+            HabitProgress.objects.create(
+                habit=weekly, date=monday - timedelta(weeks=weeks), completed=True
+            )
+
+        overview = habits_overview(self.user, 21, self.today)
+        row = next(row for row in overview["habits"] if row["id"] == weekly.id)
+        self.assertEqual(row["period"], "week")
+        self.assertEqual((row["current_streak"], row["longest_streak"]), (3, 3))
+        self.assertEqual(row["completion_rate"], 100.0)
+
+
+class HeatmapTest(BaseServiceTestCase):
+    """Tests para el heatmap anual de hábitos"""
+
+    def setUp(self):
+        super().setUp()
+        self.year = 2024
+        self.jan_1 = date(self.year, 1, 1)
+
+    def test_progress_writes_maintain_bitmap(self):
+        """Test las escrituras de progreso activan y limpian días"""
+        for offset in (0, 1, 2, 59, 365):
+            HabitProgressService.mark_habit_completed(
+                self.habit, self.jan_1 + timedelta(days=offset)
+            )
+        HabitProgressService.mark_habit_incomplete(
+            self.habit, self.jan_1 + timedelta(days=1)
+        )
+        progress = HabitProgress.objects.get(
+            habit=self.habit, date=self.jan_1 + timedelta(days=59)
+        )
+        progress.date = self.jan_1 + timedelta(days=60)
+        progress.save()
+
+        with self.assertNumQueries(1):
+            heatmap = HeatmapService.get_heatmap(self.habit, self.year, "rle")
+        self.assertEqual(heatmap["days"], 366)
+        self.assertEqual(heatmap["segments"], [[1, 1], [3, 1], [61, 1], [366, 1]])
+
+        bits = base64.b64decode(
+            HeatmapService.get_heatmap(self.habit, self.year)["bitmap"]
+        )
+        self.assertEqual(len(bits), 46)
+        self.assertEqual(bits[0], 0b101)
+
+        incremental = HeatmapService.get_heatmap(self.habit, self.year)
+        HeatmapService.rebuild([self.habit.pk])
+        self.assertEqual(HeatmapService.get_heatmap(self.habit, self.year), incremental)
+
+    def test_counter_days_follow_target(self):
+        """Test un contador solo activa días que alcanzan el objetivo"""
+        self.habit.kind = "counter"
+        self.habit.target_value = 10
+        self.habit.save()
+        HabitProgress.objects.create(habit=self.habit, date=self.jan_1, value=12)
+        HabitProgress.objects.create(
+            habit=self.habit, date=self.jan_1 + timedelta(days=1), value=5
+        )
+        heatmap = HeatmapService.get_heatmap(self.habit, self.year, "rle")
+        self.assertEqual(heatmap["segments"], [[1, 1]])
+
+        # Editar el objetivo reconstruye el bitset
+        self.habit.target_value = 5
+        self.habit.save()
+        heatmap = HeatmapService.get_heatmap(self.habit, self.year, "rle")
+        self.assertEqual(heatmap["segments"], [[1, 2]])
+
+        # Renombrar el hábito no lo reconstruye
+        self.habit.title = "Flexiones"
+        with self.assertNumQueries(2):
+            self.habit.save()
+
+
+class UpdateUserStatsTest(BaseServiceTestCase):
+    """Tests para el recálculo completo de estadísticas"""
+
+    def test_update_user_stats_counts_workouts(self):
+        """Test el recálculo cuenta entrenamientos por usuario"""
+        Workout.objects.create(
+            habit=self.habit,
+            date=self.today,
+            duration_min=30,
+            calories=200,
+            status="done",
+        )
+        self.complete_days(0, 1)
+
+        stats = StatsService.update_user_stats(self.user)
+
+        self.assertEqual(stats.total_workouts, 1)
+        self.assertEqual(stats.total_habits_completed, 2)
+        self.assertEqual((stats.current_streak, stats.longest_streak), (2, 2))
+
+
+class ProgressSeriesTest(BaseServiceTestCase):
+    """Tests para el progreso semanal y mensual agrupado"""
+
+    def setUp(self):
+        super().setUp()
+        self.week_start = self.today - timedelta(days=self.today.weekday())
+
+    def test_weekly_progress_zero_fills_and_groups(self):
+        """Test progreso semanal agrupado con semanas vacías a cero"""
+        HabitProgress.objects.create(habit=self.habit, date=self.week_start, completed=True)
+        HabitProgress.objects.create(
+            habit=self.habit, date=self.week_start - timedelta(days=14), completed=True
+        )
+        HabitProgress.objects.create(
+            habit=self.habit, date=self.week_start - timedelta(days=13), completed=False
+        )
+        Workout.objects.create(
+            habit=self.habit,
+            date=self.week_start,
+            duration_min=30,
+            calories=200,
+            status="done",
+        )
+        Workout.objects.create(
+            habit=self.habit,
+            date=self.week_start + timedelta(days=1),
+            duration_min=45,
+            calories=300,
+            status="done",
+        )
+
+        with self.assertNumQueries(2):
+            weekly = StatsService.get_weekly_progress(self.user, weeks_back=4)
+
+        self.assertEqual(
+            [week["week"] for week in weekly],
+            [
+                (self.week_start - timedelta(weeks=offset)).isoformat()
+                for offset in (3, 2, 1, 0)
+            ],
+        )
+        self.assertEqual([week["habits_completed"] for week in weekly], [0, 1, 0, 1])
+        self.assertEqual([week["workouts_count"] for week in weekly], [0, 0, 0, 2])
+        self.assertEqual(weekly[-1]["calories_burned"], 500)
+
+    def test_monthly_progress_spans_year_boundary(self):
+        """Test progreso mensual con meses de años anteriores"""
+        starts, _ = StatsService.get_bucket_starts("month", 3, date(2025, 2, 10))
+        self.assertEqual(starts, [date(2024, 12, 1), date(2025, 1, 1), date(2025, 2, 1)])
+
+        HabitProgress.objects.create(
+            habit=self.habit, date=self.today.replace(day=1), completed=True
+        )
+        with self.assertNumQueries(2):
+            monthly = StatsService.get_monthly_progress(self.user, months_back=6)
+        self.assertEqual(len(monthly), 6)
+        self.assertEqual(monthly[-1]["month"], self.today.strftime("%Y-%m"))
+        self.assertEqual(monthly[-1]["habits_completed"], 1)
+
+
+class RollupServiceTest(BaseServiceTestCase):
+    """Tests para las tablas diarias WorkoutStats y NutritionStats"""
+
+    def create_workout(self, day, duration_min=30, calories=200):
+        return Workout.objects.create(
+            habit=self.habit,
+            date=day,
+            duration_min=duration_min,
+            calories=calories,
+            status="done",
+        )
+
+    def create_nutrition(self, day, calories=100, protein="10.50"):
+        return Nutrition.objects.create(
+            user=self.user,
+            date=day,
+            name="Manzana",
+            calories=calories,
+            protein_g=Decimal(protein),
+            carbs_g=Decimal("20.00"),
+            fat_g=Decimal("1.25"),
+        )
+
+    def rollup_values(self):
+        workouts = list(
+            WorkoutStats.objects.order_by("date").values_list(
+                "date", "total_duration", "total_calories_burned", "workout_count"
+            )
+        )
+        nutrition = list(
+            NutritionStats.objects.order_by("date").values_list(
+                "date", "total_calories", "total_protein", "total_carbs",
+                "total_fat", "meal_count",
+            )
+        )
+        return workouts, nutrition
+
+    def test_workout_writes_update_daily_rollup(self):
+        """Test crear, mover y borrar entrenamientos actualiza WorkoutStats"""
+        yesterday = self.today - timedelta(days=1)
+        first = self.create_workout(self.today, 30, 200)
+        self.create_workout(self.today, 45, 300)
+
+        stats = WorkoutStats.objects.get(user=self.user, date=self.today)
+        self.assertEqual(
+            (stats.total_duration, stats.total_calories_burned, stats.workout_count),
+            (75, 500.0, 2),
+        )
+
+        first.date = yesterday
+        first.save()
+        self.assertEqual(
+            WorkoutStats.objects.get(user=self.user, date=yesterday).workout_count, 1
+        )
+        self.assertEqual(
+            WorkoutStats.objects.get(user=self.user, date=self.today).total_duration, 45
+        )
+
+        first.delete()
+        self.assertFalse(WorkoutStats.objects.filter(date=yesterday).exists())
+
+    def test_nutrition_writes_update_daily_rollup(self):
+        """Test crear, editar y borrar entradas actualiza NutritionStats"""
+        entry = self.create_nutrition(self.today, 100, "10.50")
+        self.create_nutrition(self.today, 250, "4.00")
+
+        entry.calories = 150
+        entry.save()
+
+        stats = NutritionStats.objects.get(user=self.user, date=self.today)
+        self.assertEqual(stats.total_calories, 400.0)
+        self.assertEqual(stats.total_protein, 14.5)
+        self.assertEqual(stats.meal_count, 2)
+
+        entry.delete()
+        stats.refresh_from_db()
+        self.assertEqual((stats.total_calories, stats.meal_count), (250.0, 1))
+
+    def test_incremental_rollups_match_rebuild(self):
+        """Test las tablas incrementales coinciden con la reconstrucción"""
+        for offset in range(5):
+            day = self.today - timedelta(days=offset)
+            self.create_workout(day, 20 + offset, 100 * offset)
+            self.create_nutrition(day, 300 + offset)
+        self.create_nutrition(self.today, 80).delete()
+
+        incremental = self.rollup_values()
+        call_command("rebuild_rollups", stdout=StringIO())
+        self.assertEqual(self.rollup_values(), incremental)
+
+    def test_deleting_user_cascades_without_recreating_rows(self):
+        """Test borrar el usuario no recrea filas diarias"""
+        self.create_workout(self.today)
+        self.create_nutrition(self.today)
+        self.user.delete()
+        self.assertFalse(WorkoutStats.objects.exists())
+        self.assertFalse(NutritionStats.objects.exists())
+
+
+class StatsSummaryTest(BaseServiceTestCase):
+    """Tests para el resumen de estadísticas"""
+
+    def test_summary_aggregates_week_and_month_per_table(self):
+        """Test semana y mes con una consulta por tabla"""
+        today = date(2025, 3, 1)
+        for day in (date(2025, 2, 27), date(2025, 3, 1), date(2025, 3, 4)):
+            HabitProgress.objects.create(habit=self.habit, date=day, completed=True)
+            Workout.objects.create(
+                habit=self.habit, date=day, duration_min=30, calories=100
+            )
+        HabitProgress.objects.create(
+            habit=self.habit, date=date(2025, 3, 20), completed=False
+        )
+        StatsService.get_user_stats(self.user)
+
+        with self.assertNumQueries(4):
+            summary = StatsService.get_stats_summary(self.user, today)
+
+        weekly = summary["weekly_progress"]
+        monthly = summary["monthly_progress"]
+        self.assertEqual(weekly["workouts"]["workout_count"], 2)
+        self.assertEqual(weekly["workouts"]["total_duration"], 60)
+        self.assertEqual(monthly["workouts"]["workout_count"], 2)
+        self.assertEqual(weekly["habits"], {"completed_count": 2, "total_count": 2})
+        self.assertEqual(monthly["habits"], {"completed_count": 2, "total_count": 3})
+        self.assertIsNone(weekly["nutrition"]["total_calories"])
+
+
+class NutritionSummaryTest(BaseServiceTestCase):
+    """Tests para los resúmenes nutricionales diarios"""
+
+    def create_nutrition(self, day, calories, protein):
+        return Nutrition.objects.create(
+            user=self.user,
+            date=day,
+            name="Manzana",
+            calories=calories,
+            protein_g=Decimal(protein),
+            carbs_g=Decimal("0.10"),
+            fat_g=Decimal("0.20"),
+        )
+
+    def test_range_summaries_with_one_query(self):
+        """Test un resumen por día del rango con una sola consulta"""
+        yesterday = self.today - timedelta(days=1)
+        for _ in range(3):
+            self.create_nutrition(self.today, 100, "0.10")
+        self.create_nutrition(yesterday - timedelta(days=1), 250, "4.00")
+
+        with self.assertNumQueries(1):
+            summaries = NutritionStatsService.get_nutrition_summaries(
+                self.user, yesterday - timedelta(days=1), self.today
+            )
+
+        self.assertEqual([day["entry_count"] for day in summaries], [1, 0, 3])
+        self.assertEqual(summaries[1]["date"], yesterday.isoformat())
+        self.assertEqual(summaries[1]["total_protein_g"], 0.0)
+        today_summary = summaries[2]
+        self.assertEqual(today_summary["total_calories"], 300)
+        # Suma exacta en Decimal: 0.1 + 0.1 + 0.1 en float daría 0.30000000000000004
+        self.assertEqual(today_summary["total_protein_g"], 0.3)
+        self.assertEqual(
+            today_summary,
+            NutritionStatsService.get_daily_nutrition_summary(self.user, self.today),
+        )
+
+    def test_range_limits(self):
+        """Test rangos invertidos o demasiado largos"""
+        with self.assertRaises(ValueError):
+            NutritionStatsService.get_nutrition_summaries(
+                self.user, self.today, self.today - timedelta(days=1)
+            )
+        with self.assertRaises(ValueError):
+            NutritionStatsService.get_nutrition_summaries(
+                self.user, self.today - timedelta(days=366), self.today
+            )
+
+    def test_weekly_average_of_daily_totals(self):
+        """Test el promedio semanal es por día registrado, no por entrada"""
+        today = date(2025, 3, 5)  # miércoles
+        monday = date(2025, 3, 3)
+        for _ in range(4):
+            self.create_nutrition(monday, 100, "1.00")
+        self.create_nutrition(monday + timedelta(days=1), 600, "2.50")
+        self.create_nutrition(monday - timedelta(weeks=2), 350, "3.00")
+
+        with self.assertNumQueries(1):
+            weeks = NutritionStatsService.get_weekly_nutrition_average(
+                self.user, weeks_back=3, today=today
+            )
+
+        self.assertEqual(
+            [week["week"] for week in weeks],
+            ["2025-02-17", "2025-02-24", "2025-03-03"],
+        )
+        current = weeks[-1]
+        self.assertEqual(current["avg_calories"], 500.0)
+        self.assertEqual(current["avg_protein_g"], 3.2)
+        self.assertEqual((current["total_entries"], current["logged_days"]), (5, 2))
+        self.assertEqual(weeks[1]["avg_calories"], 0.0)
+        self.assertEqual(weeks[0]["avg_calories"], 350.0)
+
+        with self.assertRaises(ValueError):
+            NutritionStatsService.get_weekly_nutrition_average(self.user, weeks_back=54)
+
+
+class RecomputeStatsTest(BaseServiceTestCase):
+    """Tests para el recálculo masivo de estadísticas"""
+
+    def test_recompute_matches_per_user_values(self):
+        """Test el recálculo agrupado coincide con los datos de cada usuario"""
+        other_user = User.objects.create_user(
+            username="otheruser", email="other@example.com", password="testpass123"
+        )
+        other_habit = Habit.objects.create(
+            user=other_user,
+            title="Correr",
+            kind="daily",
+            target_value=5,
+            color_hex="#00FF00",
+        )
+        self.complete_days(0, 1, 2, 5, 6, 7, 8)
+        self.complete_days(3, habit=other_habit)
+        Workout.objects.create(
+            habit=self.habit, date=self.today, duration_min=30, calories=250
+        )
+        Nutrition.objects.create(
+            user=other_user,
+            date=self.today,
+            name="Arroz",
+            calories=400,
+            protein_g=Decimal("8.00"),
+            carbs_g=Decimal("80.00"),
+            fat_g=Decimal("1.00"),
+        )
+        # Una fila que falta se crea en el recálculo
+        UserStats.objects.filter(user=other_user).delete()
+
+        with self.assertNumQueries(8):
+            updated = StatsService.recompute_user_stats(
+                [self.user.pk, other_user.pk], today=self.today
+            )
+        self.assertEqual(updated, 2)
+
+        stats = UserStats.objects.get(user=self.user)
+        self.assertEqual(
+            (stats.total_workouts, stats.total_calories_burned), (1, 250.0)
+        )
+        self.assertEqual(stats.total_habits_completed, 7)
+        self.assertEqual((stats.current_streak, stats.longest_streak), (3, 4))
+        self.assertEqual(stats.last_activity_date, self.today)
+
+        other_stats = UserStats.objects.get(user=other_user)
+        self.assertEqual(other_stats.total_calories_consumed, 400.0)
+        self.assertEqual(other_stats.total_habits_completed, 1)
+        self.assertEqual(other_stats.active_streak, 0)
+        self.assertEqual(other_stats.longest_streak, 1)
+
+    def test_recompute_stats_command(self):
+        """Test el comando recompute_stats procesa usuarios por bloques"""
+        for index in range(3):
+            User.objects.create_user(
+                username=f"user{index}",
+                email=f"user{index}@example.com",
+                password="testpass123",
+            )
+        self.complete_days(0)
+
+        out = StringIO()
+        call_command("recompute_stats", "--chunk-size", "2", stdout=out)
+
+        self.assertIn("Recomputed stats for 4 users in 2 chunks", out.getvalue())
+        self.assertEqual(UserStats.objects.count(), 4)
+        self.assertEqual(UserStats.objects.get(user=self.user).current_streak, 1)
+
+
+class HabitProgressUpsertTest(TransactionTestCase):
+    """Tests para el upsert atómico de HabitProgress"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.habit = Habit.objects.create(
+            user=self.user,
+            title="Ejercicio diario",
+            kind="daily",
+            target_value=30.0,
+            color_hex="#FF5733",
+        )
+        self.today = date.today()
+
+    def test_upsert_creates_then_updates(self):
+        """Test el upsert crea la fila y después la actualiza"""
+        progress, created = HabitProgress.objects.upsert(
+            self.habit, self.today, completed=False, value=5
+        )
+        self.assertTrue(created)
+        HabitProgress.objects.filter(pk=progress.pk).update(notes="Nota")
+
+        updated, created = HabitProgress.objects.upsert(
+            self.habit, self.today, completed=True, value=30
+        )
+        self.assertFalse(created)
+        self.assertEqual(updated.pk, progress.pk)
+
+        stored = HabitProgress.objects.get(pk=progress.pk)
+        self.assertEqual((stored.completed, stored.value), (True, 30))
+        self.assertEqual(stored.notes, "Nota")
+        self.assertEqual(stored.user, self.user)
+
+    def test_concurrent_upserts_create_one_row(self):
+        """Test muchos hilos sobre el mismo hábito y día crean una sola fila"""
+        threads_count = 8
+        barrier = threading.Barrier(threads_count)
+        results, errors = [], []
+
+        def check_in(value):
+            try:
+                barrier.wait()
+                for attempt in range(50):
+                    try:
+                        results.append(
+                            HabitProgress.objects.upsert(self.habit, self.today, value=value)
+                        )
+                        break
+                    except OperationalError as e:
+                        # La base SQLite en memoria de los tests no espera
+                        # a los bloqueos: "database table is locked"
+                        if "locked" not in str(e):
+                            raise
+                        time.sleep(0.01)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        threads = [
+            threading.Thread(target=check_in, args=(value,))
+            for value in range(threads_count)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(results), threads_count)
+        self.assertEqual(HabitProgress.objects.count(), 1)
+        self.assertEqual(sum(created for _, created in results), 1)
+        self.assertEqual({progress.pk for progress, _ in results}, {
+            HabitProgress.objects.get().pk
+        })
+
+
+@override_settings(STATS_DEFERRED=True, STATS_JOB_DELAY=0)
+class StatsJobTest(BaseServiceTestCase):
+    """Tests para el recálculo diferido de estadísticas"""
+
+    def test_writes_coalesce_into_one_job(self):
+        """Test varias escrituras del usuario dejan un solo trabajo"""
+        for offset in range(3):
+            HabitProgressService.mark_habit_completed(
+                self.habit, self.today - timedelta(days=offset)
+            )
+
+        self.assertEqual(StatsJob.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(StatsService.get_user_stats(self.user).total_habits_completed, 0)
+
+        out = StringIO()
+        call_command("run_stats_worker", "--once", stdout=out)
+        self.assertIn("Recomputed stats for 1 users", out.getvalue())
+        self.assertFalse(StatsJob.objects.exists())
+
+        stats = StatsService.get_user_stats(self.user)
+        self.assertEqual(stats.total_habits_completed, 3)
+        self.assertEqual(stats.current_streak, 3)
+
+    def test_claimed_jobs_are_leased(self):
+        """Test un trabajo reclamado no se reclama dos veces"""
+        StatsJobService.enqueue(self.user.pk)
+
+        self.assertEqual(len(StatsJobService.claim()), 1)
+        self.assertEqual(StatsJobService.claim(), [])
+        self.assertEqual(StatsJob.objects.get(user=self.user).attempts, 1)
+
+        # Con la concesión vencida vuelve a estar disponible
+        self.assertEqual(len(StatsJobService.claim(lease=0)), 0)
+        StatsJob.objects.update(available_at=timezone.now())
+        self.assertEqual(len(StatsJobService.claim(lease=0)), 1)
+
+
+class ExplainStatsQueriesTest(BaseServiceTestCase):
+    """Tests para el benchmark de consultas de HabitProgress"""
+
+    def test_reports_plans_before_and_after(self):
+        """Test el comando muestra planes con habit__user y con user"""
+        self.complete_days(0, 1, 2)
+        out = StringIO()
+        call_command("explain_stats_queries", "--repeat", "1", stdout=out)
+        output = out.getvalue()
+        for name in ("streak", "weekly", "summary"):
+            self.assertIn(f"{name} (before)", output)
+            self.assertIn(f"{name} (after)", output)
+        self.assertIn("stats_habit_user_id", output)